@@ -0,0 +1,194 @@
+"""Priority admission control for LLM work.
+
+Every piece of work that talks to the LLM server — agent turns, direct
+skills, scheduled jobs — takes a slot from one shared Admission controller
+first. Work is split into three classes, highest priority first:
+
+  interactive   chat messages and quick direct commands
+  long_running  heavy direct commands (/brainstorm, /research, ...)
+  background    scheduled (cron) jobs
+
+The controller enforces a total concurrency limit plus a cap per class.
+When a slot frees up it goes to a waiter of the highest class that is
+under its cap, so a burst of 07:00 cron jobs can never hold every slot
+while a user is waiting. Each class also has a maximum number of waiters;
+beyond it, slot() raises AdmissionFull so callers can push back instead
+of piling up work.
+
+Within a class, waiters are served by weighted fair queuing (start-time
+fair queuing) rather than arrival order. Each item gets
+  start  = max(class virtual time, sender's previous finish)
+  finish = start + cost / weight
+the smallest finish goes next, and virtual time advances to the start of
+whatever was admitted. A sender who queues five heavy requests takes turns
+with everyone else instead of blocking them; weight 2 doubles the share.
+
+An agent turn is admitted as interactive, but the agent may go on to call
+a heavy skill tool. demote() then moves the turn's slot to that skill's
+class, so the interactive slot goes to the next chat message instead of
+being held for the rest of the tool run. The moved slot can put its new
+class over its cap for a while; that class admits nothing new until it
+is back under.
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import tracing
+from metrics import counter, gauge, histogram
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+LONG_RUNNING = "long_running"
+BACKGROUND = "background"
+CLASSES = (INTERACTIVE, LONG_RUNNING, BACKGROUND)  # highest priority first
+
+_running_gauge = gauge("bot_admission_running", "Work items holding an LLM slot")
+_waiting_gauge = gauge("bot_admission_waiting", "Work items waiting for an LLM slot")
+_rejected = counter("bot_admission_rejected_total", "Work items turned away because too many were waiting")
+_wait = histogram("bot_admission_wait_seconds", "Seconds spent waiting for an LLM slot")
+_admitted = counter("bot_admission_admitted_total", "Work items granted an LLM slot")
+
+
+class AdmissionFull(Exception):
+    """Raised when a priority class already has the maximum number of waiters."""
+
+
+class _Held:
+    """The slot held by a running work item."""
+
+    def __init__(self, admission: "Admission", klass: str):
+        self.admission = admission
+        self.klass = klass
+
+
+_held: contextvars.ContextVar[_Held | None] = contextvars.ContextVar("admission_slot", default=None)
+
+
+def demote(klass: str):
+    """Move the current work's slot to a lower-priority class (no-op otherwise)."""
+    held = _held.get()
+    if held is None or klass not in CLASSES or CLASSES.index(klass) <= CLASSES.index(held.klass):
+        return
+    held.admission._move(held, klass)
+
+
+class Admission:
+    """Priority-ordered concurrency limiter with per-class caps."""
+
+    def __init__(self, max_concurrent: int, caps: dict[str, int], max_waiting: int = 20):
+        self.max_concurrent = max(1, max_concurrent)
+        self.caps = {c: max(1, min(caps.get(c, self.max_concurrent), self.max_concurrent)) for c in CLASSES}
+        self.max_waiting = max(0, max_waiting)
+        self._running = {c: 0 for c in CLASSES}
+        # Per class: heap of [finish tag, seq, future, start tag]
+        self._waiters: dict[str, list[list]] = {c: [] for c in CLASSES}
+        self._vtime = {c: 0.0 for c in CLASSES}
+        self._finish: dict[tuple[str, str], float] = {}  # (class, key) → last finish tag
+        self._seq = itertools.count()
+        for c in CLASSES:
+            _running_gauge.set_function(lambda c=c: self._running[c], **{"class": c})
+            _waiting_gauge.set_function(lambda c=c: len(self._waiters[c]), **{"class": c})
+
+    @asynccontextmanager
+    async def slot(self, klass: str, key: str = "", cost: float = 1.0, weight: float = 1.0):
+        """Hold an LLM slot of the given class for the duration of the block.
+
+        key identifies the sender for fair queuing; cost is the work's
+        estimated size (e.g. LLM tokens) and weight the sender's share.
+        Raises AdmissionFull if the class's wait queue is full.
+        """
+        if klass not in CLASSES:
+            raise ValueError(f"Unknown priority class: {klass}")
+
+        started = time.monotonic()
+        if self._can_run(klass) and not self._waiting_ahead(klass):
+            start, _ = self._tag(klass, key, cost, weight)
+            self._vtime[klass] = max(self._vtime[klass], start)
+            self._running[klass] += 1
+        else:
+            if len(self._waiters[klass]) >= self.max_waiting:
+                _rejected.inc(**{"class": klass})
+                raise AdmissionFull(klass)
+            future = asyncio.get_running_loop().create_future()
+            start, finish = self._tag(klass, key, cost, weight)
+            entry = [finish, next(self._seq), future, start]
+            heapq.heappush(self._waiters[klass], entry)
+            try:
+                with tracing.span("admission.wait", **{"class": klass}):
+                    await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self._release(klass)  # granted just as we were cancelled
+                else:
+                    self._waiters[klass].remove(entry)
+                    heapq.heapify(self._waiters[klass])
+                raise
+
+        waited = time.monotonic() - started
+        _admitted.inc(**{"class": klass})
+        _wait.observe(waited, **{"class": klass})
+        if waited >= 1:
+            logger.info("%s work admitted after waiting %.1fs", klass, waited)
+        held = _Held(self, klass)
+        reset = _held.set(held)
+        try:
+            yield
+        finally:
+            _held.reset(reset)
+            self._release(held.klass)
+
+    def waiting(self, klass: str | None = None) -> int:
+        if klass is None:
+            return sum(len(w) for w in self._waiters.values())
+        return len(self._waiters[klass])
+
+    def running(self, klass: str | None = None) -> int:
+        if klass is None:
+            return sum(self._running.values())
+        return self._running[klass]
+
+    def _tag(self, klass: str, key: str, cost: float, weight: float) -> tuple[float, float]:
+        """Assign the virtual (start, finish) times used to order this sender's work."""
+        start = max(self._vtime[klass], self._finish.get((klass, key), 0.0))
+        finish = start + cost / max(weight, 1e-6)
+        self._finish[(klass, key)] = finish
+        if len(self._finish) > 1000:
+            # Senders whose last finish is behind virtual time start fresh anyway
+            self._finish = {k: v for k, v in self._finish.items() if v > self._vtime[k[0]]}
+        return start, finish
+
+    def _can_run(self, klass: str) -> bool:
+        return self.running() < self.max_concurrent and self._running[klass] < self.caps[klass]
+
+    def _waiting_ahead(self, klass: str) -> bool:
+        """True if someone of the same or a higher class is already waiting."""
+        return any(self._waiters[c] for c in CLASSES[: CLASSES.index(klass) + 1])
+
+    def _move(self, held: _Held, klass: str):
+        logger.info("Running %s work moved to %s", held.klass, klass)
+        self._running[held.klass] -= 1
+        self._running[klass] += 1
+        held.klass = klass
+        self._dispatch()
+
+    def _release(self, klass: str):
+        self._running[klass] -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        for klass in CLASSES:
+            waiters = self._waiters[klass]
+            while waiters and self._can_run(klass):
+                _, _, future, start = heapq.heappop(waiters)
+                if future.cancelled():
+                    continue
+                self._vtime[klass] = max(self._vtime[klass], start)
+                self._running[klass] += 1
+                future.set_result(None)
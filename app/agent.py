@@ -1,12 +1,24 @@
-"""Strands Agent configured with an OpenAI-compatible LLM and auto-discovered skills."""
+"""Strands Agents (one session per conversation) configured with an OpenAI-compatible LLM and auto-discovered skills."""
 
 import logging
+import threading
+import time
+from concurrent.futures import Future
 
 import httpx
 from strands import Agent
+from strands.hooks import (AfterModelCallEvent, AfterToolsEvent, BeforeModelCallEvent, BeforeToolCallEvent,
+                           HookProvider)
 from strands.models.openai import OpenAIModel
 from skills import discover_skills, SkillRegistry
+from sessions import SessionManager
+from compaction import CompactingConversationManager
+from llm_pool import get_model
+from llm_metrics import output_rate
+import admission
+import cancellation
 import config
+import llm_router
 
 logger = logging.getLogger(__name__)
 
@@ -27,8 +39,10 @@ Always be direct and helpful. If you're unsure, say so.
 """
 
 # Module-level references so we can swap them at runtime
-_agent: Agent | None = None
+_model: OpenAIModel | None = None
+_model_id: str | None = None
 _registry: SkillRegistry | None = None
+_sessions: SessionManager | None = None
 
 
 def _build_system_prompt(registry: SkillRegistry) -> str:
@@ -38,50 +52,153 @@ def _build_system_prompt(registry: SkillRegistry) -> str:
     return base
 
 
-def create_agent(model_id: str | None = None) -> tuple[Agent, SkillRegistry]:
-    """Create and return a configured Strands Agent.
+def _make_model(model_id: str) -> OpenAIModel:
+    from runtime import state
+
+    max_tok = state.max_tokens or config.llm.max_tokens
+    # The agent loop stops on its cancel_signal, so no checkpoints in the model;
+    # turns run in shaping.pinned(), so each conversation keeps its server slot
+    return get_model(model_id, config.llm.temperature, max_tok, checkpoints=False, pin_slots=True)
+
+
+class ReturnDirect(HookProvider):
+    """Ends a turn with the output of return_direct skills instead of another model call.
+
+    When every tool the model called in a cycle belongs to a skill with
+    `return_direct: true` and succeeded, their output becomes the turn's
+    final assistant message. The estimated cost of the skipped call lands
+    in the result's state as "return_direct" (see /debug): its prompt is
+    the last call's plus the tool output, and it would have taken as long
+    as the last call to start plus the time to restate the output at the
+    model's recent streaming rate.
+    """
+
+    def __init__(self, tools: set[str]):
+        self.tools = tools
+        self._started = 0.0
+        self._last_call = 0.0  # seconds
+
+    def register_hooks(self, registry, **kwargs):
+        registry.add_callback(BeforeModelCallEvent, self._on_model_start)
+        registry.add_callback(AfterModelCallEvent, self._on_model_end)
+        registry.add_callback(AfterToolsEvent, self._on_tools)
+
+    def _on_model_start(self, event: BeforeModelCallEvent):
+        self._started = time.monotonic()
+
+    def _on_model_end(self, event: AfterModelCallEvent):
+        self._last_call = time.monotonic() - self._started
+
+    def _on_tools(self, event: AfterToolsEvent):
+        results = [block["toolResult"] for block in event.message["content"] if "toolResult" in block]
+        if not results or not self.tools:
+            return
+        call = next((m for m in reversed(event.agent.messages) if m["role"] == "assistant"), None)
+        if call is None:
+            return
+        names = {block["toolUse"]["toolUseId"]: block["toolUse"]["name"]
+                 for block in call["content"] if "toolUse" in block}
+        if any(names.get(r["toolUseId"]) not in self.tools or r.get("status") != "success" for r in results):
+            return
+        text = "\n\n".join(block["text"] for r in results for block in r.get("content", []) if "text" in block)
+        if not text.strip():
+            return
+
+        usage = call.get("metadata", {}).get("usage", {})
+        tokens_out = max(1, len(text) // 4)
+        rate = output_rate(event.agent.model.get_config().get("model_id", ""))
+        event.end_turn = text
+        event.invocation_state.setdefault("request_state", {})["return_direct"] = {
+            "tools": sorted({names[r["toolUseId"]] for r in results}),
+            "tokens_in": usage.get("inputTokens", 0) + usage.get("outputTokens", 0) + tokens_out,
+            "tokens_out": tokens_out,
+            "seconds": self._last_call + tokens_out / rate if rate else None,
+        }
+
+
+class SkillLimits(HookProvider):
+    """Gives a turn the deadline and priority class of the skills it calls.
+
+    An agent turn runs under AGENT_TIMEOUT in an interactive admission
+    slot, but a skill tool it calls may be slower than that (brainstorm's
+    graph allows 900 s). When a tool starts, the turn's deadline is pushed
+    out to at least what the skill's direct command would get from then:
+    its `timeout:` or COMMAND_TIMEOUT (0 lifts the deadline). A
+    long_running skill also moves the turn's slot to that class.
+    """
+
+    def __init__(self, skills: dict):
+        self.skills = skills  # tool name → SkillManifest
+
+    def register_hooks(self, registry, **kwargs):
+        registry.add_callback(BeforeToolCallEvent, self._on_tool)
+
+    def _on_tool(self, event: BeforeToolCallEvent):
+        skill = self.skills.get(event.tool_use["name"])
+        if skill is None:
+            return
+        admission.demote(skill.priority)
+        token = cancellation.current()
+        if token is None:
+            return
+        timeout = skill.timeout if skill.timeout is not None else config.worker.command_timeout
+        token.extend(float(timeout))
+
+
+def create_agent(model_id: str | None = None) -> SkillRegistry:
+    """Configure the model and skill registry that all agent sessions share.
+
+    Existing sessions are dropped so the next message in every
+    conversation starts a fresh agent with the new settings.
 
     Args:
         model_id: Override model ID. If None, uses config.llm.model_id.
     """
-    global _agent, _registry
-
-    from runtime import state
+    global _model, _model_id, _registry, _sessions
 
     mid = model_id or config.llm.model_id
-    max_tok = state.max_tokens or config.llm.max_tokens
-
-    model = OpenAIModel(
-        client_args={
-            "base_url": config.llm.base_url,
-            "api_key": config.llm.api_key,
-        },
-        model_id=mid,
-        params={
-            "temperature": config.llm.temperature,
-            "max_tokens": max_tok,
-        },
-    )
+    _model = _make_model(mid)
+    _model_id = mid
 
     if _registry is None:
         _registry = discover_skills()
 
-    system_prompt = _build_system_prompt(_registry)
+    if _sessions is None:
+        _sessions = SessionManager(
+            build_agent,
+            max_sessions=config.session.max_sessions,
+            idle_ttl=config.session.idle_ttl,
+        )
+    else:
+        _sessions.clear()
+
+    return _registry
+
 
-    _agent = Agent(
+def build_agent(model_id: str | None = None, system_prompt: str | None = None) -> Agent:
+    """Build a new Agent with the shared registry and current model settings.
+
+    Args:
+        model_id: Use a different model than the active one.
+        system_prompt: Override the default skill-aware system prompt.
+    """
+    registry = get_registry()
+    model = _model if model_id is None or model_id == _model_id else _make_model(model_id)
+    return Agent(
         model=model,
-        tools=_registry.tools,
-        system_prompt=system_prompt,
+        tools=registry.tools,
+        system_prompt=system_prompt or _build_system_prompt(registry),
+        conversation_manager=CompactingConversationManager(
+            lambda: context_budget(model_id), keep_messages=config.session.keep_messages),
+        hooks=[ReturnDirect(registry.direct_tools), SkillLimits(registry.tool_skills)],
     )
 
-    return _agent, _registry
-
 
-def get_agent() -> Agent:
-    """Return the current agent instance."""
-    if _agent is None:
-        raise RuntimeError("Agent not initialized. Call create_agent() first.")
-    return _agent
+def get_sessions() -> SessionManager:
+    """Return the per-conversation session manager."""
+    if _sessions is None:
+        raise RuntimeError("Sessions not initialized. Call create_agent() first.")
+    return _sessions
 
 
 def get_registry() -> SkillRegistry:
@@ -92,28 +209,89 @@ def get_registry() -> SkillRegistry:
 
 
 def refresh_system_prompt():
-    """Update the agent's system prompt (e.g. after toggling markdown)."""
-    if _agent is not None and _registry is not None:
-        _agent.system_prompt = _build_system_prompt(_registry)
+    """Update every live session's system prompt (e.g. after toggling markdown)."""
+    if _sessions is not None and _registry is not None:
+        prompt = _build_system_prompt(_registry)
+        for agent in _sessions.agents():
+            agent.system_prompt = prompt
+
+
+# ── Server model state ───────────────────────────────────────────────
+# /v1/models is cached for LLM_MODELS_TTL seconds and dropped whenever
+# this process loads or unloads a model. Loads of the same model are
+# single-flighted: concurrent callers wait for the one request in flight.
+
+_models_lock = threading.Lock()
+_models_cache: tuple[float, list[str]] | None = None
+_loads_lock = threading.Lock()
+_loads: dict[str, Future] = {}
+_context_lengths: dict[str, int] = {}  # learned from LM Studio or /context
+
+DEFAULT_CONTEXT_LENGTH = 8192
+
+
+def _server_models() -> list[str]:
+    """Model ids from /v1/models, cached; raises if the server can't be reached."""
+    global _models_cache
+    with _models_lock:
+        if _models_cache is not None and time.monotonic() - _models_cache[0] < config.llm.models_ttl:
+            return _models_cache[1]
+        resp = httpx.get(f"{config.llm.base_url}/models", timeout=10)
+        resp.raise_for_status()
+        models = [m["id"] for m in resp.json().get("data", [])]
+        _models_cache = (time.monotonic(), models)
+        return models
+
+
+def invalidate_models():
+    """Forget the cached model list (after a load or unload)."""
+    global _models_cache
+    with _models_lock:
+        _models_cache = None
 
 
 def list_available_models() -> list[str]:
     """Query the LLM server for available models."""
     try:
-        resp = httpx.get(f"{config.llm.base_url}/models", timeout=10)
-        resp.raise_for_status()
-        data = resp.json().get("data", [])
-        return [m["id"] for m in data]
+        return list(_server_models())
     except Exception as e:
         logger.error("Failed to list models: %s", e)
         return []
 
 
+def get_context_length(model_id: str | None = None) -> int:
+    """Return the context window of the loaded model, in tokens.
+
+    The length set by /context wins, then LLM_CONTEXT_LENGTH, then what
+    LM Studio reports for the loaded model (DEFAULT_CONTEXT_LENGTH if it
+    can't tell).
+    """
+    mid = model_id or get_current_model_id()
+    with _models_lock:
+        if mid in _context_lengths:
+            return _context_lengths[mid]
+    if config.llm.context_length:
+        return config.llm.context_length
+    length = 0
+    try:
+        resp = httpx.get(f"{_lmstudio_api_base()}/api/v0/models/{mid}", timeout=5)
+        resp.raise_for_status()
+        data = resp.json()
+        length = int(data.get("loaded_context_length") or data.get("max_context_length") or 0)
+    except Exception as e:
+        logger.debug("Could not read context length of '%s': %s", mid, e)
+    if not length:
+        logger.warning("Context length of '%s' unknown, assuming %d (set LLM_CONTEXT_LENGTH)",
+                       mid, DEFAULT_CONTEXT_LENGTH)
+        length = DEFAULT_CONTEXT_LENGTH
+    with _models_lock:
+        _context_lengths[mid] = length
+    return length
+
+
 def get_current_model_id() -> str:
-    """Return the model ID the agent is currently using."""
-    if _agent is not None:
-        return _agent.model.config.get("model_id", config.llm.model_id)
-    return config.llm.model_id
+    """Return the model ID new agent sessions use."""
+    return _model_id or config.llm.model_id
 
 
 def get_current_max_tokens() -> int:
@@ -122,6 +300,16 @@ def get_current_max_tokens() -> int:
     return state.max_tokens or config.llm.max_tokens
 
 
+def context_budget(model_id: str | None = None) -> int:
+    """Prompt tokens a session may send before its history is compacted.
+
+    CONTEXT_COMPACT_AT of the context window, minus room for the longest
+    reply; at least a quarter of the window.
+    """
+    length = get_context_length(model_id)
+    return max(length // 4, int(length * config.session.compact_at) - get_current_max_tokens())
+
+
 def _lmstudio_api_base() -> str:
     """Derive the LM Studio management API base from the OpenAI-compat URL.
 
@@ -136,73 +324,107 @@ def _lmstudio_api_base() -> str:
 def ensure_model_loaded(model_id: str | None = None) -> bool:
     """Ensure the model is loaded on the LLM server, loading it if necessary.
 
-    Checks /v1/models for the target model. If missing, triggers a load
-    via LM Studio's management API and waits for it to become available.
+    Checks /v1/models (cached) for the target model. If missing, triggers a
+    load via LM Studio's management API and waits for it to become
+    available; concurrent calls for the same model share that one load.
+    A model another healthy backend (LLM_BACKENDS) serves counts as loaded.
 
     Returns True if the model is ready, False on failure.
     """
     mid = model_id or config.llm.model_id
 
     # Check if already loaded
+    if llm_router.has_model(mid):
+        logger.debug("Model '%s' served by another backend", mid)
+        return True
     try:
-        resp = httpx.get(f"{config.llm.base_url}/models", timeout=10)
-        resp.raise_for_status()
-        loaded = [m["id"] for m in resp.json().get("data", [])]
-        if mid in loaded:
+        if mid in _server_models():
             logger.debug("Model '%s' already loaded", mid)
             return True
     except Exception as e:
         logger.warning("Could not check loaded models: %s", e)
 
+    with _loads_lock:
+        flight = _loads.get(mid)
+        leader = flight is None
+        if leader:
+            flight = _loads[mid] = Future()
+    if not leader:
+        logger.info("Model '%s' is already being loaded, waiting...", mid)
+        return flight.result()
+
+    ok = False
+    try:
+        ok = _load_model(mid)
+    finally:
+        with _loads_lock:
+            del _loads[mid]
+        flight.set_result(ok)
+    return ok
+
+
+def _load_model(mid: str) -> bool:
     # Not loaded — trigger load via LM Studio API
     logger.info("Model '%s' not loaded, triggering load...", mid)
     api = _lmstudio_api_base()
     try:
-        resp = httpx.post(
-            f"{api}/api/v1/models/load",
-            json={"model": mid},
-            timeout=120,
-        )
+        with llm_router.draining(config.llm.base_url):
+            resp = httpx.post(
+                f"{api}/api/v1/models/load",
+                json={"model": mid},
+                timeout=120,
+            )
         resp.raise_for_status()
         logger.info("Model '%s' loaded successfully", mid)
         return True
     except Exception as e:
         logger.error("Failed to load model '%s': %s", mid, e)
         return False
+    finally:
+        invalidate_models()
+        with _models_lock:
+            _context_lengths.pop(mid, None)
 
 
 def server_reload_model(model_id: str, context_length: int) -> str:
     """Unload then reload a model on the LLM server with a new context window.
 
     Uses LM Studio's /api/v1/models/unload and /api/v1/models/load endpoints.
+    Requests go to other backends while it reloads.
     """
     api = _lmstudio_api_base()
 
-    # Unload current model (ignore errors — might not be loaded)
     try:
-        httpx.post(
-            f"{api}/api/v1/models/unload",
-            json={"instance_id": model_id},
-            timeout=30,
-        )
-    except Exception:
-        pass  # model might not be loaded, that's fine
-
-    # Load with new context length
-    resp = httpx.post(
-        f"{api}/api/v1/models/load",
-        json={
-            "model": model_id,
-            "context_length": context_length,
-            "echo_load_config": True,
-        },
-        timeout=120,
-    )
-    resp.raise_for_status()
-    data = resp.json()
+        with llm_router.draining(config.llm.base_url):
+            # Unload current model (ignore errors — might not be loaded)
+            try:
+                httpx.post(
+                    f"{api}/api/v1/models/unload",
+                    json={"instance_id": model_id},
+                    timeout=30,
+                )
+            except Exception:
+                pass  # model might not be loaded, that's fine
+
+            # Load with new context length
+            resp = httpx.post(
+                f"{api}/api/v1/models/load",
+                json={
+                    "model": model_id,
+                    "context_length": context_length,
+                    "echo_load_config": True,
+                },
+                timeout=120,
+            )
+            resp.raise_for_status()
+            data = resp.json()
+    finally:
+        invalidate_models()
 
     load_config = data.get("load_config", {})
     actual_ctx = load_config.get("context_length", context_length)
     load_time = data.get("load_time_seconds", "?")
+    with _models_lock:
+        _context_lengths[model_id] = int(actual_ctx)
 
     return f"Loaded {model_id} with context_length={actual_ctx} in {load_time}s"
@@ -1,56 +1,161 @@
 """Main bot loop: polls Signal for messages and routes them to the agent.
 
-Uses a message queue so the agent processes one request at a time,
-avoiding thread-safety issues with shared conversation state.
-Ack messages fire instantly; the agent work is serialized.
+Everything runs on one asyncio event loop: receiving, dispatch, Signal
+sends and agent turns are coroutines, and blocking work (skills, Whisper,
+LLM server management calls) is pushed to executor threads.
+
+Work is handed to a per-conversation worker pool: messages from one chat
+are processed in order, different chats run in parallel. Ack messages
+fire instantly; only the agent/skill work is queued.
 """
 
-import queue
+import asyncio
 import sys
 import time
 import logging
 import logging.handlers
-import threading
 from pathlib import Path
 
 import config
 from runtime import state
-from signal_client import SignalClient
+from signal_client import AsyncSignalClient
+import metrics
+import llm_cache
+import llm_pool
+import llm_router
+import shaping
 from agent import (
-    create_agent, get_agent, get_registry, refresh_system_prompt,
+    create_agent, get_sessions, get_registry, refresh_system_prompt,
     list_available_models, get_current_model_id, get_current_max_tokens,
     server_reload_model,
 )
 from skills import SkillRegistry
-from transcribe import download_and_transcribe, AUDIO_CONTENT_TYPES
+import transcribe
+from transcribe import transcribe_async, AUDIO_CONTENT_TYPES
 from scheduler import start_scheduler
+from workers import WorkerPool, ShardFullError, detach
+from work_queue import Job, WorkQueue
+from dedup import Deduplicator
+from capture import TrafficCapture
+from coalesce import Coalescer
+from fastpath import FastPath
+from streaming import ReplyStreamer
+from admission import Admission, AdmissionFull, INTERACTIVE
+from ratelimit import RateLimiter, estimate_tokens, DEFER, REJECT
+import cancellation
+import tracing
+from cancellation import CancelToken, Cancelled, DEADLINE, until_cancelled
 
 _LOG_DIR = Path("data/logs")
-_LOG_DIR.mkdir(parents=True, exist_ok=True)
-
 _LOG_FMT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
 
-logging.basicConfig(level=logging.INFO, format=_LOG_FMT)
-
-# File handler — all modules (including skills) inherit this automatically
-_file_handler = logging.handlers.RotatingFileHandler(
-    _LOG_DIR / "bot.log", maxBytes=5_000_000, backupCount=3, encoding="utf-8",
-)
-_file_handler.setFormatter(logging.Formatter(_LOG_FMT))
-logging.getLogger().addHandler(_file_handler)
-
 logger = logging.getLogger("signal-bot")
 
-POLL_INTERVAL = 2
+POLL_INTERVAL = config.signal.poll_interval
 ACK_MESSAGE = "⏳ Got it, working on it..."
+VOICE_ACK_MESSAGE = "🎤 Transcribing voice message..."
+RESUME_MESSAGE = "🔁 Picking up your earlier request..."
+
+QUEUE_FULL_MESSAGE = "🚦 You already have {n} requests waiting. Please wait for them to finish."
+BUSY_MESSAGE = "🚦 I'm swamped right now ({n} requests queued). Please try again in a few minutes."
+RATE_DEFER_MESSAGE = "⏳ You're sending requests faster than your {limit} allowance — I'll start on this in about {wait}."
+RATE_REJECT_MESSAGE = "🚦 Rate limit reached ({limit}). Please try again in {wait}. Send /limits to see your allowance."
+CANCELLED_MESSAGE = "🛑 Cancelled."
+DEADLINE_MESSAGE = "⏱️ Stopped after {wait}: this request hit its {limit} time limit."
+
+CANCEL_GRACE = 5  # seconds a cancelled agent turn gets to stop cleanly before it is abandoned
+
+# Created in main() — the receive loop submits, pool workers process
+_pool: WorkerPool | None = None
+_signal: AsyncSignalClient | None = None
+_coalescer: Coalescer | None = None
+_admission: Admission | None = None
+_limiter: RateLimiter | None = None
+_fastpath: FastPath | None = None
+_inflight: dict[str, CancelToken] = {}  # conversation → token of the job it is running
+_last_trace: dict[str, str] = {}  # conversation → trace id of its last finished job
+
+_queue_wait = metrics.histogram("bot_queue_wait_seconds", "Seconds a job waited in the work queue before starting")
+_request_seconds = metrics.histogram(
+    "bot_request_seconds", "End-to-end seconds from queueing a request to finishing it, by command and outcome")
+_tool_calls = metrics.counter("bot_tool_calls_total", "Agent tool calls by tool and status")
+_tool_seconds = metrics.histogram("bot_tool_duration_seconds", "Seconds per agent tool call (per-turn average)")
+
+
+def _format_wait(seconds: float) -> str:
+    if seconds < 90:
+        return f"{max(1, round(seconds))}s"
+    return f"{round(seconds / 60)} min"
+
+
+async def _check_rate(signal: AsyncSignalClient, reply_to: str, author: str, text: str,
+                      priority: str = INTERACTIVE, ack: str = ACK_MESSAGE) -> tuple[float, str] | None:
+    """Apply per-sender/per-group rate limits before queueing LLM work.
+
+    Returns (delay, ack message) to queue the work with — delay is 0 unless
+    the request was deferred — or None if it was rejected (the user has
+    been told why).
+    """
+    if _limiter is None:
+        return 0.0, ack
+    group = reply_to if reply_to != author else None
+    decision = _limiter.acquire(author, group, estimate_tokens(text, priority))
+    limit = "request" if decision.limit == "requests" else "LLM token"
+    if decision.action == REJECT:
+        signal.send(reply_to, RATE_REJECT_MESSAGE.format(
+            limit=f"{limit}s", wait=_format_wait(decision.delay)))
+        return None
+    if decision.action == DEFER:
+        return decision.delay, RATE_DEFER_MESSAGE.format(limit=limit, wait=_format_wait(decision.delay))
+    return 0.0, ack
+
+
+async def _enqueue(signal: AsyncSignalClient, reply_to: str, kind: str, payload: dict,
+                   show_position: bool = False, ack: str | None = ACK_MESSAGE, delay: float = 0) -> bool:
+    """Persist and ack a work item for a conversation. Returns False if the queue is full.
+
+    A delay (from rate limiting) keeps the item hidden in the queue that long.
+    ack=None skips the acknowledgement (it was sent when the message arrived).
+    """
+    backlog = _pool.pending()
+    if backlog >= config.admission.max_queue:
+        logger.warning("Rejecting %s work for %s: %d requests queued", kind, reply_to, backlog)
+        signal.send(reply_to, BUSY_MESSAGE.format(n=backlog))
+        return False
+    trace = tracing.carrier()
+    if trace:
+        payload = {**payload, "trace": trace}
+    try:
+        position = _pool.submit(reply_to, kind, payload, delay=delay)
+    except ShardFullError:
+        signal.send(reply_to, QUEUE_FULL_MESSAGE.format(n=_pool.max_depth))
+        return False
+
+    # Queued back to back without awaiting, so the outbox packs them into one send
+    if ack:
+        signal.send(reply_to, ack)
+    if show_position and position > 1:
+        signal.send(reply_to, f"📋 Queued (position {position})")
+    return True
 
-# Global message queue — the polling loop enqueues, the worker dequeues
-_work_queue: queue.Queue = queue.Queue()
+
+async def _flush_agent_messages(reply_to: str, texts: list[str]):
+    """Queue a burst of coalesced agent messages as a single turn (acked on arrival)."""
+    try:
+        await _enqueue(_signal, reply_to, "agent", {"text": "\n".join(texts)}, show_position=True, ack=None)
+    except Exception:
+        logger.exception("Failed to queue coalesced messages for %s", reply_to)
 
 # ── Direct skill invocation (bypasses LLM tool selection) ────────────
 
-def handle_direct_skill(cmd: str, args: str, signal: SignalClient, sender: str) -> bool:
-    """Try to handle a direct skill invocation via registry commands. Returns True if handled."""
+async def handle_direct_skill(cmd: str, args: str, signal: AsyncSignalClient, sender: str,
+                              author: str | None = None, fast_path: bool = False) -> bool:
+    """Try to handle a direct skill invocation via registry commands. Returns True if handled.
+
+    sender is the chat to reply to; author is who sent the command (differs in groups).
+    fast_path marks a plain message routed here by FastPath; its exchange is
+    added to the conversation's agent history.
+    """
     registry = get_registry()
     command = cmd.lower()
 
@@ -64,16 +169,27 @@ def handle_direct_skill(cmd: str, args: str, signal: SignalClient, sender: str)
         signal.send(sender, f"Usage: {usage}")
         return True
 
+    admitted = await _check_rate(signal, sender, author or sender, args, dc.priority)
+    if admitted is None:
+        return True
+    delay, ack = admitted
+
     # Ack instantly, queue the work
-    signal.send(sender, ACK_MESSAGE)
-    _work_queue.put(("direct_skill", signal, sender, command, dc, args.strip()))
+    payload = {"command": command, "args": args.strip()}
+    if fast_path:
+        payload["fast_path"] = True
+    await _enqueue(signal, sender, "direct_skill", payload, ack=ack, delay=delay)
     return True
 
 
 # ── Slash command handler ────────────────────────────────────────────
 
-def handle_slash_command(cmd: str, signal: SignalClient, sender: str) -> bool:
-    """Handle a slash command instantly. Returns True if handled."""
+async def handle_slash_command(cmd: str, signal: AsyncSignalClient, sender: str,
+                               author: str | None = None) -> bool:
+    """Handle a slash command instantly. Returns True if handled.
+
+    sender is the chat to reply to; author is who sent the command (differs in groups).
+    """
     parts = cmd.strip().split(None, 2)
     command = parts[0].lower()
     arg1 = parts[1].lower() if len(parts) > 1 else ""
@@ -88,6 +204,7 @@ def handle_slash_command(cmd: str, signal: SignalClient, sender: str) -> bool:
             f"{skill_section}"
             f"Bot controls:\n"
             "  /help  —  Show this message\n"
+            "  /cancel  —  Stop the request currently running in this chat\n"
             "  /model  —  Show current model info\n"
             "  /model list  —  List available models\n"
             "  /model load <name|#>  —  Switch model\n"
@@ -95,12 +212,26 @@ def handle_slash_command(cmd: str, signal: SignalClient, sender: str) -> bool:
             "  /context <n>  —  Reload model with new context window\n"
             "  /skills  —  List loaded skills\n"
             "  /schedules  —  List scheduled jobs\n"
+            "  /stats  —  Show bot metrics and live sessions\n"
+            "  /trace last  —  Show where the time went in your last request\n"
+            "  /limits  —  Show rate limits and your remaining allowance\n"
             "  /md on|off  —  Toggle markdown formatting\n"
             "  /debug on|off  —  Toggle debug metrics\n"
+            "  /stream on|off  —  Toggle streaming replies\n"
             "\nAnything without / is sent to the AI agent."
         ))
         return True
 
+    if command == "/cancel":
+        token = _inflight.get(sender)
+        if token is None:
+            signal.send(sender, "Nothing is running in this chat right now.")
+        else:
+            # The job's worker replies once the work has actually stopped
+            token.cancel()
+            logger.info("Cancel requested for %s", sender)
+        return True
+
     if command == "/model":
         if not arg1:
             signal.send(sender, (
@@ -112,50 +243,11 @@ def handle_slash_command(cmd: str, signal: SignalClient, sender: str) -> bool:
             return True
 
         if arg1 == "list":
-            models = list_available_models()
-            if not models:
-                signal.send(sender, "Could not fetch models from the server.")
-            else:
-                current = get_current_model_id()
-                lines = []
-                for i, m in enumerate(models, 1):
-                    marker = " ◀ active" if m == current else ""
-                    lines.append(f"  [{i}] {m}{marker}")
-                signal.send(sender, f"Available models ({len(models)}):\n\n" + "\n".join(lines))
+            _background(_list_models(signal, sender))
             return True
 
         if arg1 == "load" and arg2:
-            query = arg2.strip()
-            models = list_available_models()
-            try:
-                idx = int(query)
-                if 1 <= idx <= len(models):
-                    resolved = models[idx - 1]
-                else:
-                    signal.send(sender, f"Index {idx} out of range. Use /model list to see 1-{len(models)}.")
-                    return True
-            except ValueError:
-                query_lower = query.lower()
-                matches = [m for m in models if query_lower in m.lower()]
-                if len(matches) == 1:
-                    resolved = matches[0]
-                elif len(matches) > 1:
-                    lines = [f"Multiple matches for \"{query}\":\n"]
-                    for i, m in enumerate(matches, 1):
-                        lines.append(f"  [{i}] {m}")
-                    lines.append("\nBe more specific or use the number from /model list.")
-                    signal.send(sender, "\n".join(lines))
-                    return True
-                else:
-                    signal.send(sender, f"No model matching \"{query}\". Use /model list to see available models.")
-                    return True
-
-            signal.send(sender, f"🔄 Loading model: {resolved}...")
-            try:
-                create_agent(model_id=resolved)
-                signal.send(sender, f"✅ Switched to: {resolved}")
-            except Exception as e:
-                signal.send(sender, f"Failed to load model: {e}")
+            _background(_load_model(signal, sender, arg2.strip()))
             return True
 
     if command == "/skills":
@@ -192,6 +284,88 @@ def handle_slash_command(cmd: str, signal: SignalClient, sender: str) -> bool:
             signal.send(sender, "✅ Debug mode OFF")
             return True
 
+    if command == "/stream":
+        if arg1 == "on":
+            state.stream = True
+            signal.send(sender, "✅ Streaming replies ON — answers arrive paragraph by paragraph")
+            return True
+        elif arg1 == "off":
+            state.stream = False
+            signal.send(sender, "✅ Streaming replies OFF — answers arrive in one piece")
+            return True
+
+    if command == "/limits":
+        cfg = config.ratelimit
+        if _limiter is None:
+            signal.send(sender, "🚦 Rate limiting is off (RATE_LIMIT_ENABLED=false).")
+            return True
+        author = author or sender
+        scopes = _limiter.status(author, sender if sender != author else None)
+        lines = [
+            f"🚦 Rate limits (per sender; groups get {cfg.group_multiplier:g}x):",
+            f"  Requests: burst {cfg.request_burst:g}, refill {cfg.requests_per_minute:g}/min",
+            f"  LLM tokens (estimated): burst {cfg.token_burst:,.0f}, refill {cfg.tokens_per_minute:,.0f}/min",
+            f"  Over the limit: deferred up to {cfg.max_defer:g}s, then rejected",
+        ]
+        for scope, title in (("sender", "You"), ("group", "This group")):
+            if scope not in scopes:
+                continue
+            (req_avail, req_cap), (tok_avail, tok_cap) = scopes[scope]["requests"], scopes[scope]["tokens"]
+            lines += [
+                f"\n{title} right now:",
+                f"  Requests: {max(0, req_avail):.0f}/{req_cap:g}",
+                f"  Tokens: {max(0, tok_avail):,.0f}/{tok_cap:,.0f}",
+            ]
+        lines.append(f"\nFair-share weight of this chat: {cfg.weights.get(sender, 1.0):g}")
+        signal.send(sender, "\n".join(lines))
+        return True
+
+    if command == "/trace":
+        if arg1 != "last":
+            signal.send(sender, "Usage: /trace last")
+            return True
+        trace_id = _last_trace.get(sender)
+        spans = tracing.get_trace(trace_id) if trace_id else []
+        if not spans:
+            signal.send(sender, "No recent trace for this chat.")
+        else:
+            signal.send(sender, _format_trace(trace_id, spans))
+        return True
+
+    if command == "/stats":
+        sessions = get_sessions()
+        sessions.evict_idle()
+        live = sessions.stats()
+        lines = [f"💬 Live sessions: {len(live)}/{sessions.max_sessions}"]
+        for sess in live[:10]:
+            lines.append(
+                f"   {sess['key']}: {sess['messages']} msgs, "
+                f"{sess['turns']} turns, idle {sess['idle'] / 60:.0f}m"
+            )
+        pool = llm_pool.stats()
+        lines.append(f"🔌 LLM pool: {pool['models']} model(s), {pool['clients']} client(s), "
+                     f"{pool['active']} streaming, {pool['connections']} connection(s) opened")
+        backends = llm_router.stats()
+        if len(backends) > 1:
+            for b in backends:
+                state_label = ("draining" if b["draining"] else "up") if b["healthy"] else f"DOWN ({b['error']})"
+                lines.append(f"   {b['name']}: {state_label}, {b['inflight']} in flight, "
+                             f"{b['requests']} requests, ~{b['latency']:.2f}s to first token")
+        if _fastpath is not None:
+            fast = _fastpath.stats()
+            routed = fast["rule"] + fast["classifier"]
+            total = routed + fast["agent"]
+            lines.append(f"⚡ Fast path: {routed}/{total} messages ({routed / max(total, 1):.0%}) skipped the agent "
+                         f"({fast['rule']} by rule, {fast['classifier']} by classifier), ~{fast['saved']:.0f}s saved; "
+                         f"classifier trained on {fast['trained']} turns")
+        if config.cache.enabled:
+            cache = llm_cache.stats()
+            lines.append(f"🗄 LLM cache: {cache['hit']} hit(s), {cache['miss']} miss(es), "
+                         f"{cache['entries']} entries, {cache['bytes'] / 1e6:.1f} MB")
+        lines.append(f"\n📊 Metrics:\n{metrics.format_summary()}")
+        signal.send(sender, "\n".join(lines))
+        return True
+
     if command == "/schedules":
         from scheduler import _load_jobs
         jobs = _load_jobs()
@@ -211,9 +385,7 @@ def handle_slash_command(cmd: str, signal: SignalClient, sender: str) -> bool:
                 signal.send(sender, "Value must be between 128 and 1000000.")
                 return True
             state.max_tokens = tokens
-            model_id = get_current_model_id()
-            create_agent(model_id=model_id)
-            signal.send(sender, f"✅ Max response length set to {tokens} tokens")
+            _background(_rebuild_agent(signal, sender, f"✅ Max response length set to {tokens} tokens"))
         except ValueError:
             signal.send(sender, "Usage: /maxlen <number>  (e.g. /maxlen 8192)")
         return True
@@ -224,20 +396,93 @@ def handle_slash_command(cmd: str, signal: SignalClient, sender: str) -> bool:
             if ctx_size < 512 or ctx_size > 1_000_000:
                 signal.send(sender, "Context window must be between 512 and 1000000.")
                 return True
-            model_id = get_current_model_id()
-            signal.send(sender, f"🔄 Reloading {model_id} with context_length={ctx_size}...")
-            try:
-                result_msg = server_reload_model(model_id, ctx_size)
-                create_agent(model_id=model_id)
-                signal.send(sender, f"✅ {result_msg}")
-            except Exception as e:
-                signal.send(sender, f"Failed to reload model: {e}")
+            _background(_reload_context(signal, sender, ctx_size))
         except ValueError:
             signal.send(sender, "Usage: /context <number>  (e.g. /context 16384)")
         return True
 
     return False
 
+
+# Slow command handlers run as tasks, so the receive loop never waits on
+# the LLM server
+_tasks: set[asyncio.Task] = set()
+
+
+def _background(coro):
+    task = asyncio.create_task(coro)
+    _tasks.add(task)
+    task.add_done_callback(_task_done)
+
+
+def _task_done(task: asyncio.Task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Command handler failed", exc_info=task.exception())
+
+
+async def _list_models(signal: AsyncSignalClient, sender: str):
+    models = await asyncio.to_thread(list_available_models)
+    if not models:
+        signal.send(sender, "Could not fetch models from the server.")
+        return
+    current = get_current_model_id()
+    lines = []
+    for i, m in enumerate(models, 1):
+        marker = " ◀ active" if m == current else ""
+        lines.append(f"  [{i}] {m}{marker}")
+    signal.send(sender, f"Available models ({len(models)}):\n\n" + "\n".join(lines))
+
+
+async def _load_model(signal: AsyncSignalClient, sender: str, query: str):
+    models = await asyncio.to_thread(list_available_models)
+    try:
+        idx = int(query)
+        if 1 <= idx <= len(models):
+            resolved = models[idx - 1]
+        else:
+            signal.send(sender, f"Index {idx} out of range. Use /model list to see 1-{len(models)}.")
+            return
+    except ValueError:
+        query_lower = query.lower()
+        matches = [m for m in models if query_lower in m.lower()]
+        if len(matches) == 1:
+            resolved = matches[0]
+        elif len(matches) > 1:
+            lines = [f"Multiple matches for \"{query}\":\n"]
+            for i, m in enumerate(matches, 1):
+                lines.append(f"  [{i}] {m}")
+            lines.append("\nBe more specific or use the number from /model list.")
+            signal.send(sender, "\n".join(lines))
+            return
+        else:
+            signal.send(sender, f"No model matching \"{query}\". Use /model list to see available models.")
+            return
+
+    signal.send(sender, f"🔄 Loading model: {resolved}...")
+    try:
+        await asyncio.to_thread(create_agent, resolved)
+        signal.send(sender, f"✅ Switched to: {resolved}")
+    except Exception as e:
+        signal.send(sender, f"Failed to load model: {e}")
+
+
+async def _rebuild_agent(signal: AsyncSignalClient, sender: str, done: str):
+    await asyncio.to_thread(create_agent, get_current_model_id())
+    signal.send(sender, done)
+
+
+async def _reload_context(signal: AsyncSignalClient, sender: str, ctx_size: int):
+    model_id = get_current_model_id()
+    signal.send(sender, f"🔄 Reloading {model_id} with context_length={ctx_size}...")
+    try:
+        result_msg = await asyncio.to_thread(server_reload_model, model_id, ctx_size)
+        await asyncio.to_thread(create_agent, model_id)
+        signal.send(sender, f"✅ {result_msg}")
+    except Exception as e:
+        signal.send(sender, f"Failed to reload model: {e}")
+
+
 # ── Message handling ─────────────────────────────────────────────────
 
 def _format_skills_used(result, registry) -> str | None:
@@ -272,8 +517,13 @@ def _format_skills_used(result, registry) -> str | None:
         return None
 
 
-def _format_debug_info(result) -> str:
-    """Extract debug metrics from an AgentResult."""
+def _format_debug_info(result, first_content: float | None = None, context: dict | None = None) -> str:
+    """Extract debug metrics from an AgentResult.
+
+    first_content is the time from the start of the turn until the first
+    reply text reached the user (streaming mode only); context is the
+    session's history compaction report (CompactingConversationManager).
+    """
     try:
         summary = result.metrics.get_summary()
         usage = summary.get("accumulated_usage", {})
@@ -287,27 +537,59 @@ def _format_debug_info(result) -> str:
             f"  Duration: {duration:.1f}s",
             f"  Tokens: {usage.get('inputTokens', '?')} in / {usage.get('outputTokens', '?')} out / {usage.get('totalTokens', '?')} total",
         ]
+        if first_content is not None:
+            lines.append(f"  First content: {first_content:.1f}s")
+        direct = (result.state or {}).get("return_direct")
+        if direct:
+            seconds = f", ~{direct['seconds']:.1f}s" if direct["seconds"] is not None else ""
+            lines.append(f"  Returned directly: {', '.join(direct['tools'])} — skipped a model call "
+                         f"(~{direct['tokens_in']} in / ~{direct['tokens_out']} out tokens{seconds})")
+        if context and context["budget"]:
+            lines.append(f"  Context: ~{context['tokens']} of {context['budget']} prompt tokens before compaction")
+            for event in context["turn"]:
+                lines.append(f"  Compacted {event['messages']} messages: ~{event['before']} → ~{event['after']} tokens "
+                             f"(saved ~{event['saved']})")
+            if context["compactions"]:
+                lines.append(f"  Session: {context['compactions']} compaction(s), ~{context['saved']} tokens saved")
         if tool_usage:
             lines.append("  Tools used:")
-            for tool_name, metrics in tool_usage.items():
-                count = metrics.get("count", "?")
-                avg = metrics.get("average_duration", 0)
+            for tool_name, usage_info in tool_usage.items():
+                stats = usage_info.get("execution_stats", {})
+                count = stats.get("call_count", "?")
+                avg = stats.get("average_time", 0)
                 lines.append(f"    - {tool_name}: {count}x, avg {avg:.1f}s")
         return "\n".join(lines)
     except Exception as e:
         return f"🔍 DEBUG: Could not extract metrics: {e}"
 
 
+_TRACE_DETAIL_KEYS = ("command", "tool", "url", "query", "model", "class", "chars", "attachment")
+
+
+def _format_trace(trace_id: str, spans: list[dict], limit: int = 12) -> str:
+    """The slowest spans of a trace, with their offset from the trace start."""
+    origin = min(sp["start"] for sp in spans)
+    total = max(sp["start"] + sp["duration"] for sp in spans) - origin
+    lines = [f"🧭 Trace {trace_id[:12]} — {len(spans)} spans over {total:.1f}s", "  took   at      span"]
+    for sp in sorted(spans, key=lambda sp: sp["duration"], reverse=True)[:limit]:
+        detail = next((f"{k}={sp['attrs'][k]}" for k in _TRACE_DETAIL_KEYS if sp["attrs"].get(k) is not None), "")
+        status = "" if sp["status"] == "ok" else f" [{sp['status']}]"
+        lines.append(f"  {sp['duration']:5.1f}s +{sp['start'] - origin:5.1f}s  {sp['name']}{status} {detail[:60]}".rstrip())
+    return "\n".join(lines)
+
+
 def extract_messages(raw: list[dict]) -> list[dict]:
     """Extract messages from Signal API response.
 
-    Returns dicts with: sender, text, attachments, group_id (None for 1:1).
+    Returns dicts with: sender, text, attachments, group_id (None for 1:1)
+    and timestamp (the envelope's send time in ms, used for de-duplication).
     """
     messages = []
     for envelope_wrapper in raw:
         envelope = envelope_wrapper.get("envelope", {})
         sender = envelope.get("source", "")
         data = envelope.get("dataMessage", {})
+        timestamp = envelope.get("timestamp") or data.get("timestamp")
         text = data.get("message", "") or ""
         attachments = data.get("attachments", []) or []
 
@@ -321,70 +603,409 @@ def extract_messages(raw: list[dict]) -> list[dict]:
                 "text": text,
                 "attachments": attachments,
                 "group_id": group_id,
+                "timestamp": timestamp,
             })
     return messages
 
 
 # ── Queue worker ─────────────────────────────────────────────────────
 
-def _worker(signal: SignalClient):
-    """Single worker thread that processes queued messages sequentially."""
-    while True:
+def _job_timeout(job: Job) -> float:
+    """Deadline in seconds for a job (0 = none)."""
+    if job.kind == "direct_skill":
+        dc = get_registry().commands.get(job.payload["command"])
+        if dc is not None and dc.timeout is not None:
+            return float(dc.timeout)
+        return config.worker.command_timeout
+    return config.worker.agent_timeout
+
+
+async def _process(job: Job):
+    """Process a single queued work item (runs on a pool worker coroutine).
+
+    The job runs under a CancelToken whose deadline starts once it is
+    admitted, so time queued for a slot doesn't count; /cancel fires the
+    same token. Either way the job is finished (not retried) and the rest
+    of the conversation's queue carries on in order.
+    """
+    sender = job.conversation
+    command = job.payload["command"] if job.kind == "direct_skill" else job.kind
+    _queue_wait.observe(max(0.0, time.time() - job.enqueued_at), kind=job.kind)
+    outcome = "error"
+
+    token = CancelToken(_job_timeout(job), armed=False)
+    _inflight[sender] = token
+    try:
+        with tracing.trace("job", parent=job.payload.get("trace"), kind=job.kind, command=command,
+                           attempt=job.attempts) as span, cancellation.scope(token):
+            if span is not None:
+                _last_trace[sender] = span.trace_id
+            tracing.record("queue.wait", job.enqueued_at, time.time())
+            await _run_job(job, token)
+        outcome = "ok"
+    except Cancelled as e:
+        outcome = e.reason
+        logger.info("%s job %d for %s stopped (%s) after %.1fs",
+                    job.kind, job.id, sender, e.reason, token.elapsed())
+        if e.reason == DEADLINE:
+            limit = token.deadline - token.started
+            await _signal.send(sender, DEADLINE_MESSAGE.format(
+                wait=_format_wait(token.elapsed()), limit=_format_wait(limit)))
+        else:
+            await _signal.send(sender, CANCELLED_MESSAGE)
+    finally:
+        if _inflight.get(sender) is token:
+            del _inflight[sender]
+        _request_seconds.observe(time.time() - job.enqueued_at, command=command, outcome=outcome)
+
+
+async def _run_job(job: Job, token: CancelToken):
+    sender = job.conversation
+
+    if job.attempts > 1:
+        # Interrupted by a restart or a failed attempt — the user was already acked
+        await _signal.send(sender, RESUME_MESSAGE)
+
+    if job.kind == "agent":
+        await _run_agent(sender, job.payload["text"], token)
+
+    elif job.kind == "voice":
+        # Runs in the pool's transcription stage, not on a worker; the transcript
+        # goes back to the queue as an agent turn, so a retry or restart skips Whisper
+        text = await until_cancelled(token, _transcribe_attachments(sender, job.payload["attachments"]))
+        if text:
+            _pool.requeue(job.id, "agent", {"text": text, "trace": job.payload.get("trace")})
+
+    elif job.kind == "direct_skill":
+        command, args = job.payload["command"], job.payload["args"]
+        dc = get_registry().commands.get(command)
+        if dc is None:
+            # Skill was removed since the job was queued (e.g. across a restart)
+            await _signal.send(sender, f"Command {command} is no longer available.")
+            return
         try:
-            item = _work_queue.get()
-            if item is None:
-                break
-
-            msg_type = item[0]
-
-            if msg_type == "agent":
-                _, _signal, sender, text = item
-                try:
-                    agent = get_agent()
-                    result = agent(text)
-                    reply = str(result)
-                except Exception as e:
-                    logger.exception("Agent error for %s", sender)
-                    reply = f"Sorry, I hit an error: {e}"
-                    _signal.send(sender, reply)
-                    _work_queue.task_done()
-                    continue
-
-                # Show which skills were invoked
-                skills_msg = _format_skills_used(result, get_registry())
-                if skills_msg:
-                    _signal.send(sender, skills_msg)
-
-                _signal.send(sender, reply)
-                logger.info("Replied to %s (%d chars)", sender, len(reply))
-
-                if state.debug:
-                    debug_msg = _format_debug_info(result)
-                    _signal.send(sender, debug_msg)
-
-            elif msg_type == "direct_skill":
-                _, _signal, sender, command, dc, args = item
-                try:
-                    if dc.arg_name:
-                        result = dc.func(**{dc.arg_name: args})
-                    else:
-                        result = dc.func()
-                    reply = str(result) if result else "(no output)"
-                except Exception as e:
-                    logger.exception("Direct skill %s failed", command)
-                    reply = f"Error: {e}"
-
-                _signal.send(sender, reply)
-                logger.info("Direct skill %s replied to %s (%d chars)", command, sender, len(reply))
-
-            _work_queue.task_done()
-
-        except Exception:
-            logger.exception("Worker error")
+            result = await until_cancelled(token, _run_direct_skill(dc, sender, args, token))
+            reply = str(result) if result else "(no output)"
+        except AdmissionFull:
+            reply = BUSY_MESSAGE.format(n=_admission.waiting())
+        except Cancelled:
+            raise
+        except Exception as e:
+            logger.exception("Direct skill %s failed", command)
+            reply = f"Error: {e}"
+
+        await _signal.send(sender, reply)
+        logger.info("Direct skill %s replied to %s (%d chars)", command, sender, len(reply))
+        if job.payload.get("fast_path"):
+            _remember(sender, args, reply)
+
+
+def _remember(sender: str, text: str, reply: str):
+    """Add a fast-path exchange to the conversation's history, so follow-ups can refer to it."""
+    with get_sessions().session(sender) as agent:
+        agent.messages.extend([{"role": "user", "content": [{"text": text}]},
+                               {"role": "assistant", "content": [{"text": reply}]}])
+
+
+async def _run_direct_skill(dc, sender: str, args: str, token: CancelToken):
+    """Run a direct command's tool function under an admission slot."""
+    detach()  # admission bounds the work from here, not the worker pool
+    # Skills are blocking functions — run them off the event loop
+    async with _admission.slot(dc.priority, sender, estimate_tokens(args, dc.priority),
+                               config.ratelimit.weights.get(sender, 1.0)):
+        token.arm()
+        with tracing.span("skill", command=dc.command, skill=dc.skill_name):
+            if dc.arg_name:
+                return await asyncio.to_thread(dc.func, **{dc.arg_name: args})
+            return await asyncio.to_thread(dc.func)
+
+
+async def _run_agent(sender: str, text: str, token: CancelToken):
+    """Run one agent turn for a conversation and deliver the reply."""
+    async def _admitted():
+        detach()  # admission bounds the work from here, not the worker pool
+        async with _admission.slot(INTERACTIVE, sender, estimate_tokens(text),
+                                   config.ratelimit.weights.get(sender, 1.0)):
+            token.arm()
+            await _agent_turn(sender, text)
+
+    try:
+        await until_cancelled(token, _admitted(), grace=CANCEL_GRACE)
+    except AdmissionFull:
+        await _signal.send(sender, BUSY_MESSAGE.format(n=_admission.waiting()))
+
+
+def _tool_stats(summary: dict) -> dict[str, tuple[int, int, float]]:
+    """{tool: (calls, errors, total seconds)} from an agent metrics summary."""
+    out = {}
+    for name, usage in summary.get("tool_usage", {}).items():
+        stats = usage.get("execution_stats", {})
+        out[name] = (stats.get("call_count", 0), stats.get("error_count", 0), stats.get("total_time", 0.0))
+    return out
+
+
+def _turn_tools(before: dict, after: dict) -> dict[str, float]:
+    """{tool: seconds} for the tools called during one turn."""
+    return {name: total - before.get(name, (0, 0, 0.0))[2]
+            for name, (calls, _, total) in after.items() if calls > before.get(name, (0, 0, 0.0))[0]}
+
+
+def _record_tools(before: dict, after: dict):
+    """Record the tool calls made during one turn (session metrics are cumulative)."""
+    for name, (calls, errors, total) in after.items():
+        prev_calls, prev_errors, prev_total = before.get(name, (0, 0, 0.0))
+        new_calls = calls - prev_calls
+        if new_calls <= 0:
+            continue
+        new_errors = errors - prev_errors
+        _tool_calls.inc(new_calls - new_errors, tool=name, status="success")
+        if new_errors:
+            _tool_calls.inc(new_errors, tool=name, status="error")
+        average = (total - prev_total) / new_calls
+        for _ in range(new_calls):
+            _tool_seconds.observe(average, tool=name)
+
+
+async def _invoke(sender: str, text: str, stream: bool):
+    """Yield the session agent's events (stream) or its single result.
+
+    The agent watches the current cancel token and stops at its next safe
+    point. If the turn is abandoned before that, the session is dropped so
+    the next message does not inherit a half-finished conversation.
+    """
+    token = cancellation.current()
+    signal = token.event if token else None
+    try:
+        with get_sessions().session(sender) as agent, shaping.pinned(sender), tracing.span("agent.turn", stream=stream):
+            before = _tool_stats(agent.event_loop_metrics.get_summary())
+            started = time.monotonic()
+            if stream:
+                async for event in agent.stream_async(text, cancel_signal=signal):
+                    yield event
+            else:
+                yield {"result": await agent.invoke_async(text, cancel_signal=signal)}
+            after = _tool_stats(agent.event_loop_metrics.get_summary())
+            _record_tools(before, after)
+            if _fastpath is not None:
+                _fastpath.learn(text, _turn_tools(before, after), time.monotonic() - started)
+            report = getattr(agent.conversation_manager, "report", None)
+            if report is not None:
+                yield {"context": report()}
+    except asyncio.CancelledError:
+        get_sessions().clear(sender)
+        raise
+    cancellation.check()
+
+
+async def _agent_turn(sender: str, text: str):
+    """Invoke the conversation's agent and send the reply (caller holds a slot)."""
+    if state.stream:
+        await _process_streaming(sender, text)
+        return
+    context = None
+    try:
+        async for event in _invoke(sender, text, stream=False):
+            if "result" in event:
+                result = event["result"]
+            elif "context" in event:
+                context = event["context"]
+        reply = str(result)
+    except Cancelled:
+        raise
+    except Exception as e:
+        logger.exception("Agent error for %s", sender)
+        await _signal.send(sender, f"Sorry, I hit an error: {e}")
+        return
+
+    # Queue skills-used, reply and debug together so the outbox can pack
+    # them into as few sends as possible; wait until all are delivered.
+    sends = []
+    skills_msg = _format_skills_used(result, get_registry())
+    if skills_msg:
+        sends.append(_signal.send(sender, skills_msg))
+
+    sends.append(_signal.send(sender, reply))
+
+    if state.debug:
+        debug_msg = _format_debug_info(result, context=context)
+        sends.append(_signal.send(sender, debug_msg))
+
+    await asyncio.gather(*sends)
+    logger.info("Replied to %s (%d chars)", sender, len(reply))
+
+
+async def _transcribe_attachments(sender: str, attachment_ids: list[str]) -> str:
+    """Download and transcribe voice attachments in parallel; returns the joined text."""
+    async def _one(att_id: str) -> str:
+        audio = await _signal.download_attachment(att_id)
+        with tracing.span("whisper.transcribe", attachment=att_id, bytes=len(audio)):
+            return await transcribe_async(audio)
+
+    try:
+        texts = await asyncio.gather(*(_one(att_id) for att_id in attachment_ids))
+    except Exception as e:
+        logger.exception("Transcription failed for %s", sender)
+        await _signal.send(sender, f"Failed to transcribe voice message: {e}")
+        return ""
+
+    text = "\n\n".join(t for t in texts if t)
+    if not text:
+        await _signal.send(sender, "🎤 Couldn't make out any speech in that voice message.")
+        return ""
+    await _signal.send(sender, f'📝 Heard: "{text}"')
+    return text
+
+
+async def _process_streaming(sender: str, text: str):
+    """Run an agent turn, sending paragraphs to the user as they are generated."""
+    cfg = config.stream
+    streamer = ReplyStreamer(lambda chunk: _signal.send(sender, chunk),
+                             min_chars=cfg.min_chars, min_interval=cfg.min_interval)
+    result = context = None
+    try:
+        async for event in _invoke(sender, text, stream=True):
+            if "data" in event:
+                streamer.feed(event["data"])
+            elif "message" in event:
+                streamer.end_message()
+            elif "result" in event:
+                result = event["result"]
+            elif "context" in event:
+                context = event["context"]
+        await streamer.finish()
+    except (Cancelled, asyncio.CancelledError):
+        streamer.cancel()
+        raise
+    except Exception as e:
+        streamer.cancel()
+        logger.exception("Agent error for %s", sender)
+        await _signal.send(sender, f"Sorry, I hit an error: {e}")
+        return
+
+    sends = []
+    if result is not None and (not streamer.sends or (result.state or {}).get("return_direct")):
+        # The model produced no streamed text (e.g. a non-streaming backend),
+        # or the turn ended with a skill's output, which is never streamed
+        sends.append(_signal.send(sender, str(result)))
+
+    # Skills are only known once the turn is over, so they follow the reply
+    skills_msg = _format_skills_used(result, get_registry())
+    if skills_msg:
+        sends.append(_signal.send(sender, skills_msg))
+
+    if state.debug and result is not None:
+        sends.append(_signal.send(sender, _format_debug_info(result, streamer.first_content, context)))
+
+    await asyncio.gather(*sends)
+    logger.info("Streamed reply to %s (%d message(s), %d chars, first after %s)",
+                sender, streamer.sends, streamer.chars,
+                f"{streamer.first_content:.1f}s" if streamer.first_content is not None else "-")
+
+
+# ── Incoming messages ────────────────────────────────────────────────
+
+async def _handle_message(msg: dict, signal: AsyncSignalClient, allowed: frozenset[str] | None):
+    """Route one incoming message: filter, transcribe, then dispatch or queue it."""
+    sender = msg["sender"]
+    text = msg["text"]
+    attachments = msg["attachments"]
+    group_id = msg["group_id"]
+
+    # In groups, reply to the group; in 1:1, reply to the sender
+    reply_to = group_id if group_id else sender
+
+    if allowed and sender not in allowed:
+        logger.warning("Ignoring message from unauthorized number: %s", sender)
+        return
+
+    # Group message filtering: only respond to prefix or / commands
+    if group_id:
+        prefix = config.signal.group_prefix.lower()
+        text_lower = text.strip().lower()
+        if text_lower.startswith(prefix):
+            # Strip the prefix and process the rest
+            text = text.strip()[len(prefix):].strip()
+            logger.info("Group %s, from %s (prefix matched): %s", group_id, sender, text[:80])
+        elif text.strip().startswith("/"):
+            # Slash commands work in groups without prefix
+            logger.info("Group %s, from %s (command): %s", group_id, sender, text[:80])
+        else:
+            # Ignore non-prefixed messages in groups
+            return
+
+    # Every message that gets this far starts a trace (see /trace last)
+    with tracing.trace("signal.envelope", sender=sender, group=bool(group_id)):
+        await _route_message(signal, sender, reply_to, text, attachments, group_id)
+
+
+async def _route_message(signal: AsyncSignalClient, sender: str, reply_to: str, text: str,
+                         attachments: list[dict], group_id: str | None):
+    """Dispatch an accepted message: voice, slash command, direct skill or agent."""
+    # Voice messages are transcribed by a queued job, off the receive loop
+    audio_atts = [a for a in attachments if a.get("contentType", "") in AUDIO_CONTENT_TYPES]
+    if audio_atts and not text:
+        att_ids = [a.get("id", a.get("filename", "")) for a in audio_atts]
+        logger.info("Voice message from %s, %d attachment(s): %s", sender, len(att_ids), att_ids)
+        await _coalescer.flush(reply_to)
+        admitted = await _check_rate(signal, reply_to, sender, "", ack=VOICE_ACK_MESSAGE)
+        if admitted is not None:
+            delay, ack = admitted
+            await _enqueue(signal, reply_to, "voice", {"attachments": att_ids}, ack=ack, delay=delay)
+        return
+
+    if not text:
+        return
+
+    if not group_id:
+        logger.info("Message from %s: %s", sender, text[:80])
+
+    # A bare link or a clear-cut request goes straight to the skill's command,
+    # unless it is part of a burst ("summarize this", <link>, "focus on pricing")
+    fast = _fastpath is not None and not text.strip().startswith("/") and not _coalescer.holding(reply_to)
+    match = _fastpath.match(text) if fast else None
+    if match is not None:
+        await _coalescer.flush(reply_to)
+        await handle_direct_skill(match.command, match.args, signal, reply_to, author=sender, fast_path=True)
+        return
+
+    if text.strip().startswith("/"):
+        # Anything already buffered for this chat goes first, to keep order
+        await _coalescer.flush(reply_to)
+
+        # Direct skill invocations (e.g. /summarize, /research)
+        parts = text.strip().split(None, 1)
+        skill_cmd = parts[0]
+        skill_args = parts[1] if len(parts) > 1 else ""
+        if await handle_direct_skill(skill_cmd, skill_args, signal, reply_to, author=sender):
+            return
+
+        # Bot control commands (e.g. /model, /help) — instant, no queue
+        if await handle_slash_command(text, signal, reply_to, author=sender):
+            return
+
+    admitted = await _check_rate(signal, reply_to, sender, text)
+    if admitted is None:
+        return
+    delay, ack = admitted
+
+    # Agent messages — merge rapid-fire bursts, then ack and queue for
+    # in-order processing per chat (deferred messages are queued on their own)
+    if _coalescer.window > 0 and not delay:
+        # Ack the first message of a burst straight away; only the turn waits
+        if not _coalescer.holding(reply_to):
+            signal.send(reply_to, ack)
+        _coalescer.add(reply_to, text)
+    else:
+        await _coalescer.flush(reply_to)
+        await _enqueue(signal, reply_to, "agent", {"text": text}, show_position=True,
+                       ack=ack, delay=delay)
+
 
 # ── Main loop ────────────────────────────────────────────────────────
 
-def main():
+async def _main():
+    global _pool, _signal, _coalescer, _admission, _limiter, _fastpath
+
     cfg_signal = config.signal
 
     if not cfg_signal.number:
@@ -392,9 +1013,9 @@ def main():
         sys.exit(1)
 
     allowed = cfg_signal.allowed_numbers or None
-    signal = SignalClient(cfg_signal.api_url, cfg_signal.number)
+    signal = _signal = AsyncSignalClient(cfg_signal.api_url, cfg_signal.number)
 
-    if not signal.is_healthy():
+    if not await signal.is_healthy():
         logger.error(
             "Cannot reach signal-cli-rest-api at %s. "
             "Make sure Docker is running: docker compose up -d signal-api",
@@ -405,99 +1026,121 @@ def main():
     logger.info("Signal API is healthy at %s", cfg_signal.api_url)
     logger.info("Creating agent with model %s on %s", config.llm.model_id, config.llm.base_url)
 
-    create_agent()
+    await asyncio.to_thread(create_agent)
     registry = get_registry()
 
+    cfg_fast = config.fastpath
+    if cfg_fast.enabled:
+        _fastpath = FastPath(registry.commands, log_path=cfg_fast.log_path or None, max_words=cfg_fast.max_words,
+                             trigger_words=cfg_fast.trigger_words, min_confidence=cfg_fast.min_confidence,
+                             min_examples=cfg_fast.min_examples)
+
     logger.info(
-        "Bot is running with %d skill(s), %d tool(s). Polling every %ds...",
-        len(registry.skills), len(registry.tools), POLL_INTERVAL,
+        "Bot is running with %d skill(s), %d tool(s). Receive mode: %s",
+        len(registry.skills), len(registry.tools), cfg_signal.receive_mode,
     )
 
-    # Start the sequential worker thread
-    worker_thread = threading.Thread(target=_worker, args=(signal,), daemon=True, name="worker")
-    worker_thread.start()
+    # All LLM work (chat, direct skills, scheduled jobs) is admitted by priority
+    cfg_adm = config.admission
+    _admission = Admission(
+        cfg_adm.max_concurrent,
+        {"interactive": cfg_adm.interactive, "long_running": cfg_adm.long_running,
+         "background": cfg_adm.background},
+        max_waiting=cfg_adm.max_waiting,
+    )
 
-    # Start the proactive scheduler
-    start_scheduler(get_agent(), signal)
+    cfg_rate = config.ratelimit
+    if cfg_rate.enabled:
+        _limiter = RateLimiter(
+            cfg_rate.requests_per_minute, cfg_rate.request_burst,
+            cfg_rate.tokens_per_minute, cfg_rate.token_burst,
+            group_multiplier=cfg_rate.group_multiplier, max_defer=cfg_rate.max_defer,
+        )
 
-    while True:
+    # Start the per-conversation worker pool on the durable queue
+    store = WorkQueue(
+        config.worker.queue_path,
+        visibility_timeout=config.worker.visibility_timeout,
+        max_attempts=config.worker.max_attempts,
+    )
+    _pool = WorkerPool(_process, store, size=config.worker.pool_size,
+                       max_depth=config.worker.max_queue_depth, offload={"voice": config.whisper.workers})
+    _pool.start()
+    _coalescer = Coalescer(_flush_agent_messages, window=config.worker.coalesce_window,
+                           max_wait=config.worker.coalesce_max_wait)
+    metrics.gauge("bot_queue_pending", "Unfinished jobs in the work queue").set_function(store.pending)
+    metrics.gauge("bot_queue_dead_letters", "Jobs moved to the dead-letter table").set_function(
+        store.dead_letter_count)
+    metrics.gauge("bot_signal_sends_pending", "Messages waiting in the outbound queue").set_function(
+        signal.pending_sends)
+
+    dedup = Deduplicator(window=cfg_signal.dedup_window, max_memory=cfg_signal.dedup_memory)
+
+    recorder = None
+    if config.capture.path:
+        recorder = TrafficCapture(config.capture.path, anonymize=config.capture.anonymize,
+                                  group_prefix=cfg_signal.group_prefix)
+        logger.info("Capturing received traffic to %s%s", config.capture.path,
+                    " (anonymized)" if config.capture.anonymize else "")
+
+    metrics_server = None
+    if config.metrics.port:
         try:
-            raw = signal.receive()
-            for msg in extract_messages(raw):
-                sender = msg["sender"]
-                text = msg["text"]
-                attachments = msg["attachments"]
-                group_id = msg["group_id"]
-
-                # In groups, reply to the group; in 1:1, reply to the sender
-                reply_to = group_id if group_id else sender
-
-                if allowed and sender not in allowed:
-                    logger.warning("Ignoring message from unauthorized number: %s", sender)
-                    continue
-
-                # Group message filtering: only respond to prefix or / commands
-                if group_id:
-                    prefix = config.signal.group_prefix.lower()
-                    text_lower = text.strip().lower()
-                    if text_lower.startswith(prefix):
-                        # Strip the prefix and process the rest
-                        text = text.strip()[len(prefix):].strip()
-                        logger.info("Group %s, from %s (prefix matched): %s", group_id, sender, text[:80])
-                    elif text.strip().startswith("/"):
-                        # Slash commands work in groups without prefix
-                        logger.info("Group %s, from %s (command): %s", group_id, sender, text[:80])
-                    else:
-                        # Ignore non-prefixed messages in groups
-                        continue
-
-                # Transcribe voice messages
-                audio_atts = [a for a in attachments if a.get("contentType", "") in AUDIO_CONTENT_TYPES]
-                if audio_atts and not text:
-                    att = audio_atts[0]
-                    att_id = att.get("id", att.get("filename", ""))
-                    logger.info("Voice message from %s, attachment: %s", sender, att_id)
-                    signal.send(reply_to, "🎤 Transcribing voice message...")
-                    try:
-                        text = download_and_transcribe(cfg_signal.api_url, att_id)
-                        signal.send(reply_to, f'📝 Heard: "{text}"')
-                    except Exception as e:
-                        logger.exception("Transcription failed")
-                        signal.send(reply_to, f"Failed to transcribe voice message: {e}")
-                        continue
-
-                if not text:
-                    continue
-
-                if not group_id:
-                    logger.info("Message from %s: %s", sender, text[:80])
-
-                if text.strip().startswith("/"):
-                    # Direct skill invocations (e.g. /summarize, /research)
-                    parts = text.strip().split(None, 1)
-                    skill_cmd = parts[0]
-                    skill_args = parts[1] if len(parts) > 1 else ""
-                    if handle_direct_skill(skill_cmd, skill_args, signal, reply_to):
-                        continue
-
-                    # Bot control commands (e.g. /model, /help) — instant, no queue
-                    if handle_slash_command(text, signal, reply_to):
-                        continue
-
-                # Agent messages — ack instantly, queue for sequential processing
-                signal.send(reply_to, ACK_MESSAGE)
-                _work_queue.put(("agent", signal, reply_to, text))
-                pending = _work_queue.qsize()
-                if pending > 1:
-                    signal.send(reply_to, f"📋 Queued (position {pending})")
-
-        except KeyboardInterrupt:
-            logger.info("Shutting down...")
-            break
-        except Exception:
-            logger.exception("Unexpected error in main loop")
-
-        time.sleep(POLL_INTERVAL)
+            metrics_server = await metrics.serve(config.metrics.host, config.metrics.port)
+        except OSError as e:
+            logger.error("Could not start metrics endpoint on %s:%d: %s",
+                         config.metrics.host, config.metrics.port, e)
+
+    # Start the proactive scheduler
+    scheduler_task = start_scheduler(signal, _admission)
+
+    try:
+        while True:
+            try:
+                async for raw in signal.stream(cfg_signal.receive_mode, POLL_INTERVAL):
+                    if recorder:
+                        recorder.record(raw)
+                    for msg in extract_messages(raw):
+                        if dedup.is_duplicate(msg["sender"], msg["timestamp"]):
+                            continue
+                        try:
+                            await _handle_message(msg, signal, allowed)
+                        except Exception:
+                            logger.exception("Unexpected error handling message")
+            except Exception:
+                logger.exception("Unexpected error in receive loop")
+                await asyncio.sleep(POLL_INTERVAL)
+    finally:
+        if scheduler_task is not None:
+            scheduler_task.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+
+
+def _setup_logging():
+    """Log to the console and data/logs/bot.log.
+
+    Done in main() rather than at import: Whisper's spawned worker
+    processes re-import this module and must not open the log file too.
+    """
+    _LOG_DIR.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(level=logging.INFO, format=_LOG_FMT)
+    # File handler — all modules (including skills) inherit this automatically
+    file_handler = logging.handlers.RotatingFileHandler(
+        _LOG_DIR / "bot.log", maxBytes=5_000_000, backupCount=3, encoding="utf-8",
+    )
+    file_handler.setFormatter(logging.Formatter(_LOG_FMT))
+    logging.getLogger().addHandler(file_handler)
+
+
+def main():
+    _setup_logging()
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        logger.info("Shutting down...")
+    finally:
+        transcribe.shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+"""Cooperative cancellation and deadlines for queued work.
+
+Each job the bot processes runs inside a CancelToken scope. The token is
+carried in a context variable, so it follows the work into executor
+threads, skill sub-agents and graph nodes without being passed around.
+Long-running code checks it at natural break points:
+
+  - every LLM call made through config.make_model() (before the request
+    and between streamed chunks — aborting the stream closes the HTTP
+    connection so the server stops generating)
+  - skill helpers before each web fetch or search, with http_timeout()
+    capping the request at the time left before the deadline
+
+A token is cancelled explicitly (/cancel) or when its deadline passes.
+check() then raises Cancelled at the next break point. Work that turns
+out to be slower than its deadline assumed (an agent turn calling a
+skill with its own `timeout:`) can push the deadline out with extend().
+Work that has to queue first (for an admission slot) creates its token
+unarmed and calls arm() once it gets to run, so time spent waiting does
+not count against its deadline.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+CANCELLED = "cancelled"
+DEADLINE = "deadline"
+
+
+class Cancelled(Exception):
+    """Raised at a checkpoint once the current work has been cancelled."""
+
+    def __init__(self, reason: str = CANCELLED):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """Cancellation flag with an optional deadline, safe to share across threads."""
+
+    def __init__(self, timeout: float | None = None, armed: bool = True):
+        self.event = threading.Event()  # also accepted by Strands as cancel_signal
+        self.reason: str | None = None
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout if timeout and armed else None
+        self._callbacks = []
+        self._armed = [] if not armed else None  # wait() timers to start on arm()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self.event.is_set() and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel(DEADLINE)
+        return self.event.is_set()
+
+    def cancel(self, reason: str = CANCELLED):
+        """Cancel the work; the first reason given sticks."""
+        with self._lock:
+            if self.event.is_set():
+                return
+            self.reason = reason
+            self.event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def extend(self, timeout: float):
+        """Allow at least `timeout` more seconds from now (0: lift the deadline)."""
+        with self._lock:
+            if self.deadline is None or self.event.is_set():
+                return
+            self.deadline = max(self.deadline, time.monotonic() + timeout) if timeout else None
+
+    def arm(self):
+        """Start the deadline clock now; a no-op for a token that is already armed."""
+        with self._lock:
+            if self._armed is None:
+                return
+            self.started = time.monotonic()
+            if self.timeout and not self.event.is_set():
+                self.deadline = self.started + self.timeout
+            waiters, self._armed = self._armed, None
+        for waiter in waiters:
+            waiter()
+
+    def remaining(self) -> float | None:
+        """Seconds until the deadline, or None if there is none."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    async def wait(self):
+        """Wait until the token is cancelled (by either means)."""
+        loop = asyncio.get_running_loop()
+        fired = loop.create_future()
+
+        def _wake():
+            loop.call_soon_threadsafe(lambda: fired.done() or fired.set_result(None))
+
+        timer = None
+
+        def _expire():
+            # The deadline may have been extended since the timer was set
+            nonlocal timer
+            if self.cancelled or self.deadline is None:
+                return
+            timer = loop.call_later(self.remaining(), _expire)
+
+        def _arm():
+            loop.call_soon_threadsafe(_expire)
+
+        with self._lock:
+            pending = not self.event.is_set()
+            if pending:
+                self._callbacks.append(_wake)
+                if self._armed is not None:
+                    self._armed.append(_arm)
+        if not pending:
+            return
+        if self.deadline:
+            timer = loop.call_later(self.remaining(), _expire)
+        try:
+            await fired
+        finally:
+            if timer:
+                timer.cancel()
+
+
+_current: contextvars.ContextVar[CancelToken | None] = contextvars.ContextVar("cancel_token", default=None)
+
+
+def current() -> CancelToken | None:
+    """The token of the work running in this context, if any."""
+    return _current.get()
+
+
+@contextmanager
+def scope(token: CancelToken):
+    """Make token the current one for the block (and anything it spawns)."""
+    reset = _current.set(token)
+    try:
+        yield token
+    finally:
+        _current.reset(reset)
+
+
+def check():
+    """Raise Cancelled if the current work has been cancelled or timed out."""
+    token = _current.get()
+    if token is not None and token.cancelled:
+        raise Cancelled(token.reason)
+
+
+async def until_cancelled(token: CancelToken, coro, grace: float = 0):
+    """Await coro unless the token fires first; raise Cancelled if it does.
+
+    grace gives the work that long to stop on its own (e.g. an agent loop
+    watching the token) before it is abandoned. Abandoning it releases
+    anything it holds, like an admission slot, straight away; executor
+    threads it started stop at their next cancellation checkpoint.
+    """
+    task = asyncio.ensure_future(coro)
+    watcher = asyncio.ensure_future(token.wait())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        if not task.done() and grace:
+            await asyncio.wait({task}, timeout=grace)
+        if token.event.is_set():
+            if task.done() and not task.cancelled():
+                task.exception()  # mark retrieved: the outcome no longer matters
+            raise Cancelled(token.reason)
+        return task.result()
+    finally:
+        watcher.cancel()
+        task.cancel()
+
+
+def http_timeout(default: float) -> float:
+    """Cap a request timeout at the time left before the current deadline."""
+    check()
+    token = _current.get()
+    remaining = token.remaining() if token is not None else None
+    if remaining is None:
+        return default
+    return max(1.0, min(default, remaining))
+
+
+def checkpointed(model):
+    """Make every request through a Strands model a cancellation checkpoint."""
+    stream = model.stream
+
+    async def _stream(*args, **kwargs):
+        check()
+        events = stream(*args, **kwargs)
+        try:
+            async for event in events:
+                check()
+                yield event
+        finally:
+            await events.aclose()
+
+    model.stream = _stream
+    return model
@@ -0,0 +1,154 @@
+"""Capture of incoming Signal traffic for replay (bench/replay.py).
+
+When CAPTURE_PATH is set, every non-empty batch the receive loop gets
+from signal-cli is appended to a JSONL file, one line per batch:
+
+    {"t": 1760000000.123, "envelopes": [{"envelope": {...}}, ...]}
+
+Envelopes are reduced to the fields the bot reads (sender, timestamp,
+text, attachment metadata, group id) plus the kind of any non-message
+envelope, so typing indicators and receipts still show up in the burst
+shape without their payload.
+
+With anonymization on (the default), phone numbers and group ids are
+replaced by stable pseudonyms and message text keeps only its shape:
+slash commands, the group prefix and the kind of each URL survive, every
+other word becomes a run of x's of the same length. Pseudonyms are keyed
+by a random salt stored next to the capture (<path>.salt), so the same
+person maps to the same pseudonym across restarts but cannot be looked
+up from it.
+"""
+
+import hashlib
+import hmac
+import json
+import logging
+import re
+import secrets
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+_URL = re.compile(r"https?://\S+")
+_YOUTUBE = re.compile(r"https?://(?:www\.|m\.)?(?:youtube\.com|youtu\.be)/", re.IGNORECASE)
+_WORD = re.compile(r"[^\s]+")
+
+# Non-message envelope kinds, kept as empty markers
+_OTHER_KINDS = ("typingMessage", "receiptMessage", "syncMessage", "callMessage", "editMessage")
+
+
+class TrafficCapture:
+    """Append-only recorder of received envelope batches."""
+
+    def __init__(self, path: str | Path, anonymize: bool = True, group_prefix: str = "@bot"):
+        self.path = Path(path)
+        self.anonymize = anonymize
+        self.group_prefix = group_prefix.lower()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._salt = self._load_salt() if anonymize else b""
+        self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+        self.batches = 0
+
+    def _load_salt(self) -> bytes:
+        salt_path = self.path.with_name(self.path.name + ".salt")
+        if salt_path.exists():
+            return bytes.fromhex(salt_path.read_text().strip())
+        salt = secrets.token_bytes(16)
+        salt_path.write_text(salt.hex())
+        salt_path.chmod(0o600)
+        return salt
+
+    def record(self, batch: list[dict]):
+        """Append one received batch (no-op for empty polls)."""
+        if not batch:
+            return
+        line = {"t": round(time.time(), 3), "envelopes": [self._compact(e) for e in batch]}
+        try:
+            self._file.write(json.dumps(line, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self.batches += 1
+        except OSError as e:
+            logger.warning("Could not write traffic capture: %s", e)
+
+    def close(self):
+        self._file.close()
+
+    # ── Envelope reduction ───────────────────────────────────
+
+    def _compact(self, wrapper: dict) -> dict:
+        envelope = wrapper.get("envelope", {})
+        out = {"source": self._number(envelope.get("source") or envelope.get("sourceNumber") or ""),
+               "timestamp": envelope.get("timestamp")}
+        data = envelope.get("dataMessage")
+        if data:
+            message = {"timestamp": data.get("timestamp")}
+            if data.get("message"):
+                message["message"] = self._text(data["message"])
+            if data.get("attachments"):
+                message["attachments"] = [
+                    {"id": self._token(a.get("id", ""), 20), "contentType": a.get("contentType"),
+                     "size": a.get("size")}
+                    for a in data["attachments"]
+                ]
+            group_id = (data.get("groupInfo") or {}).get("groupId")
+            if group_id:
+                message["groupInfo"] = {"groupId": self._token(group_id, 44)}
+            out["dataMessage"] = message
+        for kind in _OTHER_KINDS:
+            if kind in envelope:
+                out[kind] = {}
+        return {"envelope": out}
+
+    # ── Anonymization ────────────────────────────────────────
+
+    def _digest(self, value: str) -> str:
+        return hmac.new(self._salt, value.encode(), hashlib.sha256).hexdigest()
+
+    def _number(self, number: str) -> str:
+        if not self.anonymize or not number:
+            return number
+        return "+1999" + str(int(self._digest(number)[:12], 16))[-7:].zfill(7)
+
+    def _token(self, value: str, length: int) -> str:
+        if not self.anonymize or not value:
+            return value
+        return self._digest(value)[:length]
+
+    def _text(self, text: str) -> str:
+        if not self.anonymize:
+            return text
+
+        def _replace(match: re.Match) -> str:
+            word = match.group(0)
+            url = _URL.search(word)
+            if url:
+                if _YOUTUBE.match(url.group(0)):
+                    return "https://youtu.be/" + self._digest(url.group(0))[:11]
+                return "https://example.com/" + self._digest(url.group(0))[:12]
+            return "x" * len(word)
+
+        words = text.split(maxsplit=1)
+        keep = ""
+        if words and (words[0].startswith("/") or words[0].lower() == self.group_prefix):
+            keep, text = words[0], words[1] if len(words) > 1 else ""
+            # "@bot /summarize ..." keeps both
+            rest = text.split(maxsplit=1)
+            if keep.lower() == self.group_prefix and rest and rest[0].startswith("/"):
+                keep, text = f"{keep} {rest[0]}", rest[1] if len(rest) > 1 else ""
+        masked = _WORD.sub(_replace, text)
+        return f"{keep} {masked}".strip() if keep else masked
+
+
+def read(path: str | Path):
+    """Yield (epoch time, envelopes) for each batch in a capture file."""
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping unreadable capture line %d", n)
+                continue
+            yield entry["t"], entry["envelopes"]
@@ -0,0 +1,77 @@
+"""Per-conversation message coalescing.
+
+People often send a request in pieces ("summarize this", a URL, then
+"focus on pricing"). Instead of running a full agent turn for each piece,
+agent-bound messages are held for a short debounce window; every message
+that arrives for the same conversation inside the window restarts it, and
+when it expires the burst is flushed as a single prompt.
+
+`max_wait` caps how long a burst can keep growing, so a chatty sender
+still gets a reply. Buffered messages are in memory only — a crash loses
+at most one window's worth, and they were never acked.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+_merged = counter("bot_coalesced_messages_total", "Messages folded into another message's agent turn")
+
+
+@dataclass
+class _Burst:
+    started: float
+    texts: list[str] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+
+
+class Coalescer:
+    """Debounce agent messages per conversation and flush each burst as one."""
+
+    def __init__(self, flush, window: float = 1.5, max_wait: float = 10.0):
+        self._flush = flush  # async def flush(key: str, texts: list[str])
+        self.window = window
+        self.max_wait = max(window, max_wait)
+        self._bursts: dict[str, _Burst] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, key: str, text: str):
+        """Buffer a message and (re)start its conversation's debounce timer."""
+        loop = asyncio.get_running_loop()
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = self._bursts[key] = _Burst(started=loop.time())
+        burst.texts.append(text)
+        if burst.timer:
+            burst.timer.cancel()
+        delay = min(self.window, burst.started + self.max_wait - loop.time())
+        burst.timer = loop.call_later(max(0.0, delay), self._fire, key)
+
+    async def flush(self, key: str):
+        """Flush a conversation's burst now (no-op if nothing is buffered)."""
+        burst = self._bursts.pop(key, None)
+        if burst is None:
+            return
+        if burst.timer:
+            burst.timer.cancel()
+        if len(burst.texts) > 1:
+            _merged.inc(len(burst.texts) - 1)
+            logger.info("Coalesced %d messages for %s", len(burst.texts), key)
+        await self._flush(key, burst.texts)
+
+    def holding(self, key: str) -> bool:
+        """True if a conversation has a burst waiting to be flushed."""
+        return key in self._bursts
+
+    def pending(self) -> int:
+        """Number of conversations with a burst waiting to be flushed."""
+        return len(self._bursts)
+
+    def _fire(self, key: str):
+        task = asyncio.create_task(self.flush(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
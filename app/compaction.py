@@ -0,0 +1,136 @@
+"""Token-aware compaction of agent conversation histories.
+
+Every agent turn re-sends the whole history, so prompt processing grows
+with the conversation until the server rejects the request for exceeding
+its context window. Before each model call, CompactingConversationManager
+estimates the prompt's tokens (Strands' projection from the last reply's
+usage, or the model's per-message estimate) and compares them with
+
+    budget = context length × CONTEXT_COMPACT_AT − max reply tokens
+
+Over budget, the oldest messages are summarized into one digest message:
+enough of them to bring the prompt down to half the budget, while the
+newest CONTEXT_KEEP_MESSAGES stay verbatim and tool calls stay paired
+with their results. The digest rolls forward, since the next compaction
+folds the previous digest into the new one. Should the server still
+report an overflow, Strands' summarizing recovery (the base class) runs.
+"""
+
+import asyncio
+import logging
+import time
+
+from strands.agent.conversation_manager import SummarizingConversationManager
+from strands.agent.conversation_manager.compression.context_compression import (
+    adjust_split_point_for_tool_pairs,
+    generate_summary,
+)
+from strands.hooks import BeforeInvocationEvent, BeforeModelCallEvent
+
+import shaping
+import tracing
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+TARGET_SHARE = 0.5  # a compaction brings the prompt down to this share of the budget
+
+DIGEST_PROMPT = """\
+You keep the running digest of a chat between a user and an AI assistant on
+Signal. Condense the conversation below, which may start with an earlier
+digest, into a new digest that replaces all of it. Keep what later messages
+may rely on: facts about the user and their preferences, decisions, open
+questions and tasks, names, numbers, dates, links and the gist of tool
+results. Drop greetings and small talk. Write terse bullet points in the
+third person, under 300 words, without any preamble.
+"""
+
+_compactions = counter("bot_context_compactions_total", "Conversation histories compacted into a digest")
+_saved = counter("bot_context_tokens_saved_total", "Estimated prompt tokens removed by history compaction")
+
+
+class CompactingConversationManager(SummarizingConversationManager):
+    """Summarizes the oldest turns into a rolling digest once the prompt exceeds a token budget.
+
+    budget() returns the prompt token budget; it is called before every
+    model call, in a thread as it may ask the server. The newest
+    keep_messages messages are never folded into the digest.
+    """
+
+    def __init__(self, budget, keep_messages: int = 6):
+        super().__init__(preserve_recent_messages=keep_messages, summarization_system_prompt=DIGEST_PROMPT)
+        self._budget = budget
+        self.compactions = 0
+        self.tokens_saved = 0
+        self.last_tokens: int | None = None
+        self.last_budget: int | None = None
+        self.turn_events: list[dict] = []
+
+    def register_hooks(self, registry, **kwargs):
+        super().register_hooks(registry, **kwargs)
+        registry.add_callback(BeforeInvocationEvent, self._on_turn_start)
+        registry.add_callback(BeforeModelCallEvent, self._on_before_model_call)
+
+    def _on_turn_start(self, event: BeforeInvocationEvent):
+        self.turn_events = []
+
+    async def _on_before_model_call(self, event: BeforeModelCallEvent):
+        agent = event.agent
+        budget = await asyncio.to_thread(self._budget)
+        tokens = event.projected_input_tokens
+        if tokens is None:
+            tokens = await agent.model.count_tokens(agent.messages, agent.tool_registry.get_all_tool_specs(),
+                                                    agent.system_prompt)
+        self.last_tokens, self.last_budget = tokens, budget
+        if tokens <= budget:
+            return
+        try:
+            await self._compact(agent, tokens, budget)
+        except Exception as e:
+            # Best effort: the request goes out with the full history
+            logger.warning("History compaction failed: %s", e)
+
+    async def _compact(self, agent, tokens: int, budget: int):
+        messages = agent.messages
+        sizes = [await agent.model.count_tokens([m]) for m in messages]
+        excess = tokens - budget * TARGET_SHARE
+        limit = len(messages) - self.preserve_recent_messages
+        split = removed = 0
+        while split < limit and removed < excess:
+            removed += sizes[split]
+            split += 1
+        if split <= 0:
+            return
+        split = adjust_split_point_for_tool_pairs(messages, split)
+        if split >= len(messages) or (split == 1 and messages[0] is self._summary_message):
+            return  # nothing left to fold in
+
+        started = time.time()
+        with shaping.pinned(None):  # a different prompt; keep the conversation's cached prefix on its slot
+            digest = await generate_summary(messages[:split], agent.model, self.summarization_system_prompt)
+        saved = max(0, sum(sizes[:split]) - await agent.model.count_tokens([digest]))
+        tracing.record("context.compact", started, time.time(), messages=split, tokens=tokens,
+                       budget=budget, saved=saved)
+
+        if self._summary_message is not None and messages[0] is self._summary_message:
+            self.removed_message_count -= 1
+        self.removed_message_count += split
+        self._summary_message = digest
+        agent.messages[:] = [digest] + messages[split:]
+        for message in agent.messages:
+            # Usage recorded on older replies would still project the old prompt size
+            message.get("metadata", {}).pop("usage", None)
+
+        self.compactions += 1
+        self.tokens_saved += saved
+        self.last_tokens = tokens - saved
+        self.turn_events.append({"messages": split, "before": tokens, "after": tokens - saved, "saved": saved})
+        _compactions.inc()
+        _saved.inc(saved)
+        logger.info("Compacted %d messages into a digest: ~%d → ~%d prompt tokens (budget %d)",
+                    split, tokens, tokens - saved, budget)
+
+    def report(self) -> dict:
+        """Context usage and compactions, for /debug."""
+        return {"tokens": self.last_tokens, "budget": self.last_budget, "compactions": self.compactions,
+                "saved": self.tokens_saved, "turn": list(self.turn_events)}
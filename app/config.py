@@ -11,6 +11,16 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
+def _parse_pairs(name: str, convert=str) -> dict:
+    """Parse NAME="key=value,key=value" into {key: convert(value)}."""
+    pairs = {}
+    for item in os.getenv(name, "").split(","):
+        key, _, value = item.strip().partition("=")
+        if key and value:
+            pairs[key.strip()] = convert(value.strip())
+    return pairs
+
+
 @dataclass(frozen=True)
 class LLMConfig:
     """LLM server configuration."""
@@ -19,6 +29,27 @@ class LLMConfig:
     model_id: str = field(default_factory=lambda: os.getenv("LLM_MODEL", "qwen2.5-14b-instruct"))
     temperature: float = field(default_factory=lambda: float(os.getenv("LLM_TEMPERATURE", "0.7")))
     max_tokens: int = field(default_factory=lambda: int(os.getenv("LLM_MAX_TOKENS", "4096")))
+    # Shared HTTP connection pool (see llm_pool.py): open connections per server, idle seconds kept
+    pool_connections: int = field(default_factory=lambda: int(os.getenv("LLM_POOL_CONNECTIONS", "16")))
+    pool_keepalive: float = field(default_factory=lambda: float(os.getenv("LLM_POOL_KEEPALIVE", "60")))
+    # Seconds the server's model list (/v1/models) is cached
+    models_ttl: float = field(default_factory=lambda: float(os.getenv("LLM_MODELS_TTL", "30")))
+    # Context window of the loaded model in tokens (0 = ask LM Studio)
+    context_length: int = field(default_factory=lambda: int(os.getenv("LLM_CONTEXT_LENGTH", "0")))
+    # Several servers to spread requests over (see llm_router.py): name=url,...
+    # Empty = LLM_BASE_URL only
+    backends: dict[str, str] = field(default_factory=lambda: _parse_pairs("LLM_BACKENDS"))
+    # Per-backend API keys (default LLM_API_KEY) and the models each may serve
+    # (name=model;model, default any)
+    backend_keys: dict[str, str] = field(default_factory=lambda: _parse_pairs("LLM_BACKEND_KEYS"))
+    backend_models: dict[str, str] = field(default_factory=lambda: _parse_pairs("LLM_BACKEND_MODELS"))
+    # Seconds between backend health checks; failed requests in a row that mark one down
+    health_interval: float = field(default_factory=lambda: float(os.getenv("LLM_HEALTH_INTERVAL", "10")))
+    max_failures: int = field(default_factory=lambda: int(os.getenv("LLM_BACKEND_MAX_FAILURES", "2")))
+    # Server slots to pin conversations to (see shaping.py; llama.cpp --parallel, 0 = off),
+    # and per-backend overrides (name=n)
+    slots: int = field(default_factory=lambda: int(os.getenv("LLM_SLOTS", "0")))
+    backend_slots: dict[str, str] = field(default_factory=lambda: _parse_pairs("LLM_BACKEND_SLOTS"))
 
 
 @dataclass(frozen=True)
@@ -28,6 +59,12 @@ class SignalConfig:
     number: str = field(default_factory=lambda: os.getenv("SIGNAL_NUMBER", ""))
     allowed_numbers: frozenset[str] = field(default_factory=lambda: _parse_allowed())
     group_prefix: str = field(default_factory=lambda: os.getenv("BOT_GROUP_PREFIX", "@bot"))
+    # "poll" (GET /v1/receive) or "websocket" (signal-cli-rest-api in json-rpc mode)
+    receive_mode: str = field(default_factory=lambda: os.getenv("SIGNAL_RECEIVE_MODE", "poll").lower())
+    poll_interval: float = field(default_factory=lambda: float(os.getenv("SIGNAL_POLL_INTERVAL", "2")))
+    # Redelivered envelopes (same source + timestamp) are dropped within this window
+    dedup_window: float = field(default_factory=lambda: float(os.getenv("SIGNAL_DEDUP_WINDOW", "86400")))
+    dedup_memory: int = field(default_factory=lambda: int(os.getenv("SIGNAL_DEDUP_MEMORY", "10000")))
 
 
 @dataclass(frozen=True)
@@ -36,6 +73,8 @@ class WhisperConfig:
     model_size: str = field(default_factory=lambda: os.getenv("WHISPER_MODEL", "base"))
     device: str = field(default_factory=lambda: os.getenv("WHISPER_DEVICE", "cpu"))
     compute_type: str = field(default_factory=lambda: os.getenv("WHISPER_COMPUTE_TYPE", "int8"))
+    # Transcription worker processes, each holding its own copy of the model
+    workers: int = field(default_factory=lambda: int(os.getenv("WHISPER_WORKERS", "1")))
 
 
 @dataclass(frozen=True)
@@ -46,6 +85,128 @@ class FreshRSSConfig:
     api_password: str = field(default_factory=lambda: os.getenv("FRESHRSS_API_PASSWORD", ""))
 
 
+@dataclass(frozen=True)
+class WorkerConfig:
+    """Worker pool and work queue configuration."""
+    pool_size: int = field(default_factory=lambda: int(os.getenv("WORKER_POOL_SIZE", "4")))
+    max_queue_depth: int = field(default_factory=lambda: int(os.getenv("WORKER_QUEUE_DEPTH", "10")))
+    # Durable SQLite queue: pending work survives restarts
+    queue_path: str = field(default_factory=lambda: os.getenv("WORK_QUEUE_PATH", "data/queue.db"))
+    visibility_timeout: float = field(default_factory=lambda: float(os.getenv("WORK_QUEUE_VISIBILITY_TIMEOUT", "600")))
+    max_attempts: int = field(default_factory=lambda: int(os.getenv("WORK_QUEUE_MAX_ATTEMPTS", "3")))
+    # Agent messages arriving within this many seconds of each other are merged
+    # into one prompt (0 disables); a burst is flushed after coalesce_max_wait at most
+    coalesce_window: float = field(default_factory=lambda: float(os.getenv("COALESCE_WINDOW", "1.5")))
+    coalesce_max_wait: float = field(default_factory=lambda: float(os.getenv("COALESCE_MAX_WAIT", "10")))
+    # Deadlines in seconds (0 = none) for one agent turn and one direct command;
+    # a skill.yaml `timeout:` overrides command_timeout for that command
+    agent_timeout: float = field(default_factory=lambda: float(os.getenv("AGENT_TIMEOUT", "300")))
+    command_timeout: float = field(default_factory=lambda: float(os.getenv("COMMAND_TIMEOUT", "600")))
+
+
+@dataclass(frozen=True)
+class SessionConfig:
+    """Per-conversation agent session limits."""
+    max_sessions: int = field(default_factory=lambda: int(os.getenv("SESSION_MAX", "50")))
+    idle_ttl: float = field(default_factory=lambda: float(os.getenv("SESSION_IDLE_TTL", "3600")))
+    # History is compacted into a digest once the prompt would exceed this share
+    # of the context window (minus room for the reply); the newest messages stay verbatim
+    compact_at: float = field(default_factory=lambda: float(os.getenv("CONTEXT_COMPACT_AT", "0.75")))
+    keep_messages: int = field(default_factory=lambda: int(os.getenv("CONTEXT_KEEP_MESSAGES", "6")))
+
+
+@dataclass(frozen=True)
+class AdmissionConfig:
+    """Priority admission control for work that uses the LLM server."""
+    # Total concurrent LLM work items (match your server's parallel slots)
+    max_concurrent: int = field(default_factory=lambda: int(os.getenv("LLM_MAX_CONCURRENT", "4")))
+    # Per-class caps within that total
+    interactive: int = field(default_factory=lambda: int(os.getenv("ADMIT_INTERACTIVE", "4")))
+    long_running: int = field(default_factory=lambda: int(os.getenv("ADMIT_LONG_RUNNING", "2")))
+    background: int = field(default_factory=lambda: int(os.getenv("ADMIT_BACKGROUND", "1")))
+    # Max work items waiting for a slot per class before new ones are turned away
+    max_waiting: int = field(default_factory=lambda: int(os.getenv("ADMIT_MAX_WAITING", "20")))
+    # Max unfinished requests in the work queue across all chats
+    max_queue: int = field(default_factory=lambda: int(os.getenv("ADMIT_MAX_QUEUE", "100")))
+
+
+@dataclass(frozen=True)
+class RateLimitConfig:
+    """Per-sender / per-group token-bucket limits, applied before work is queued."""
+    enabled: bool = field(default_factory=lambda: os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes", "on"))
+    requests_per_minute: float = field(default_factory=lambda: float(os.getenv("RATE_REQUESTS_PER_MINUTE", "6")))
+    request_burst: float = field(default_factory=lambda: float(os.getenv("RATE_REQUEST_BURST", "10")))
+    tokens_per_minute: float = field(default_factory=lambda: float(os.getenv("RATE_TOKENS_PER_MINUTE", "30000")))
+    token_burst: float = field(default_factory=lambda: float(os.getenv("RATE_TOKEN_BURST", "60000")))
+    # Groups get this many times a single sender's allowance
+    group_multiplier: float = field(default_factory=lambda: float(os.getenv("RATE_GROUP_MULTIPLIER", "3")))
+    # Requests that would fit within this many seconds are deferred, later ones rejected
+    max_defer: float = field(default_factory=lambda: float(os.getenv("RATE_MAX_DEFER", "60")))
+    # Fair-share weights per sender or group (default 1)
+    weights: dict[str, float] = field(default_factory=lambda: _parse_pairs("RATE_WEIGHTS", float))
+
+
+@dataclass(frozen=True)
+class StreamConfig:
+    """Streaming delivery of agent replies."""
+    enabled: bool = field(default_factory=lambda: os.getenv("STREAM_REPLIES", "true").lower() in ("1", "true", "yes", "on"))
+    # A chunk is sent once it holds at least this many characters of complete paragraphs
+    min_chars: int = field(default_factory=lambda: int(os.getenv("STREAM_MIN_CHARS", "300")))
+    # Minimum seconds between streamed messages (chunks in between are merged)
+    min_interval: float = field(default_factory=lambda: float(os.getenv("STREAM_MIN_INTERVAL", "2")))
+
+
+@dataclass(frozen=True)
+class MetricsConfig:
+    """Embedded HTTP endpoint serving metrics in the Prometheus text format."""
+    host: str = field(default_factory=lambda: os.getenv("METRICS_HOST", "127.0.0.1"))
+    # 0 disables the endpoint
+    port: int = field(default_factory=lambda: int(os.getenv("METRICS_PORT", "9464")))
+
+
+@dataclass(frozen=True)
+class TraceConfig:
+    """Span tracing of requests, exported as JSONL."""
+    enabled: bool = field(default_factory=lambda: os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes", "on"))
+    path: str = field(default_factory=lambda: os.getenv("TRACE_PATH", "data/traces.jsonl"))
+    # The file is rotated to <path>.1 beyond this size
+    max_bytes: int = field(default_factory=lambda: int(os.getenv("TRACE_MAX_BYTES", "20000000")))
+
+
+@dataclass(frozen=True)
+class CaptureConfig:
+    """Recording of received Signal traffic for replay (see capture.py)."""
+    path: str = field(default_factory=lambda: os.getenv("CAPTURE_PATH", ""))  # empty = off
+    anonymize: bool = field(default_factory=lambda: os.getenv("CAPTURE_ANONYMIZE", "true").lower() in ("1", "true", "yes", "on"))
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    """Exact-match cache of skill LLM responses (see llm_cache.py)."""
+    enabled: bool = field(default_factory=lambda: os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("1", "true", "yes", "on"))
+    path: str = field(default_factory=lambda: os.getenv("LLM_CACHE_PATH", "data/llm_cache.db"))
+    max_mb: float = field(default_factory=lambda: float(os.getenv("LLM_CACHE_MAX_MB", "100")))
+    # Seconds an entry stays valid for skills without a cache_ttl in skill.yaml
+    ttl: float = field(default_factory=lambda: float(os.getenv("LLM_CACHE_TTL", "86400")))
+
+
+@dataclass(frozen=True)
+class FastPathConfig:
+    """Routing of plain messages straight to a skill's direct command (see fastpath.py)."""
+    enabled: bool = field(default_factory=lambda: os.getenv("FAST_PATH_ENABLED", "true").lower() in ("1", "true", "yes", "on"))
+    # Words that may accompany a matched link ("tldr <link>") and still skip the agent
+    trigger_words: frozenset[str] = field(default_factory=lambda: frozenset(
+        w.strip().lower() for w in os.getenv(
+            "FAST_PATH_TRIGGER_WORDS", "tldr,tl,dr,summarize,summarise,summary,please").split(",") if w.strip()))
+    # Other words allowed on top of those (0: a question about a link goes to the agent)
+    max_words: int = field(default_factory=lambda: int(os.getenv("FAST_PATH_MAX_WORDS", "0")))
+    # Labelled agent turns the classifier learns from (empty = no classifier)
+    log_path: str = field(default_factory=lambda: os.getenv("FAST_PATH_LOG", "data/intents.jsonl"))
+    min_confidence: float = field(default_factory=lambda: float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.95")))
+    # Turns of a command (and of plain chat) seen before the classifier routes to it
+    min_examples: int = field(default_factory=lambda: int(os.getenv("FAST_PATH_MIN_EXAMPLES", "20")))
+
+
 def _parse_allowed() -> frozenset[str]:
     raw = os.getenv("ALLOWED_NUMBERS", "").strip()
     if not raw:
@@ -58,22 +219,34 @@ llm = LLMConfig()
 signal = SignalConfig()
 whisper = WhisperConfig()
 freshrss = FreshRSSConfig()
+worker = WorkerConfig()
+session = SessionConfig()
+admission = AdmissionConfig()
+ratelimit = RateLimitConfig()
+stream = StreamConfig()
+metrics = MetricsConfig()
+tracing = TraceConfig()
+capture = CaptureConfig()
+cache = CacheConfig()
+fastpath = FastPathConfig()
 
 
-def make_model():
-    """Create an OpenAIModel instance from the centralized LLM config."""
-    from strands.models.openai import OpenAIModel
-    return OpenAIModel(
-        client_args={
-            "base_url": llm.base_url,
-            "api_key": llm.api_key,
-        },
-        model_id=llm.model_id,
-        params={
-            "temperature": llm.temperature,
-            "max_tokens": llm.max_tokens,
-        },
-    )
+def make_model(model_id: str | None = None, cache: str | None = None):
+    """Return the shared OpenAI-compatible model for the centralized LLM config.
+
+    Models come from a process-wide pool (llm_pool.py), so repeated calls
+    reuse one instance and its keep-alive connections. Every request the
+    model makes is a cancellation checkpoint, so skill sub-agents stop
+    promptly on /cancel or when the job's deadline passes.
+
+    Args:
+        model_id: Use a different model than LLM_MODEL.
+        cache: Skill name whose responses may be served from the response
+            cache (llm_cache.py) when LLM_CACHE_ENABLED is on. Only for
+            calls whose output depends on nothing but the prompt.
+    """
+    from llm_pool import get_model
+    return get_model(model_id or llm.model_id, llm.temperature, llm.max_tokens, cache=cache)
 
 
 def formatting_instruction() -> str:
@@ -0,0 +1,83 @@
+"""Envelope de-duplication.
+
+signal-cli can redeliver an envelope, and a /v1/receive retried after a
+timeout can return messages that were already handed to us. Each message
+is identified by (source, envelope timestamp); the first sighting wins and
+any repeat is dropped before it can trigger a second agent run.
+
+Seen keys are kept in a bounded in-memory LRU for the hot path, backed by
+a small SQLite table so redeliveries across a restart are caught too.
+Rows older than the window are pruned as new keys arrive.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+SEEN_DB = Path("data/seen.db")
+PRUNE_EVERY = 500  # inserts between pruning passes
+
+_duplicates = counter("bot_duplicate_envelopes_total", "Redelivered envelopes dropped before processing")
+
+
+class Deduplicator:
+    """Check-and-record store of (source, timestamp) envelope keys."""
+
+    def __init__(self, path: str | Path = SEEN_DB, window: float = 86400, max_memory: int = 10_000):
+        self.window = window
+        self.max_memory = max(1, max_memory)
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[tuple[str, int], None] = OrderedDict()
+        self._inserts = 0
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " source TEXT NOT NULL, timestamp INTEGER NOT NULL, seen_at REAL NOT NULL,"
+            " PRIMARY KEY (source, timestamp))"
+        )
+
+    def is_duplicate(self, source: str, timestamp: int | None) -> bool:
+        """Record an envelope key; return True if it was already seen.
+
+        Envelopes without a timestamp cannot be identified and always pass.
+        """
+        if not timestamp:
+            return False
+        key = (source, int(timestamp))
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                duplicate = True
+            else:
+                now = time.time()
+                inserted = self._db.execute(
+                    "INSERT OR IGNORE INTO seen (source, timestamp, seen_at) VALUES (?, ?, ?)",
+                    (key[0], key[1], now),
+                ).rowcount
+                duplicate = inserted == 0
+                self._remember(key)
+                if inserted:
+                    self._inserts += 1
+                    if self._inserts % PRUNE_EVERY == 0:
+                        self._db.execute("DELETE FROM seen WHERE seen_at < ?", (now - self.window,))
+
+        if duplicate:
+            _duplicates.inc()
+            logger.info("Dropped duplicate envelope from %s (timestamp %s)", source, timestamp)
+        return duplicate
+
+    def _remember(self, key: tuple[str, int]):
+        self._memory[key] = None
+        while len(self._memory) > self.max_memory:
+            self._memory.popitem(last=False)
@@ -0,0 +1,223 @@
+"""Pre-agent routing of plain messages to skills' direct commands.
+
+A bare YouTube link or article URL sent without a slash command costs a
+full agent turn: one generation to decide on summarize_youtube or
+summarize_content, the skill itself, and a second generation restating
+its output. FastPath sends such messages to the skill's direct command
+instead, the same way /yt or /summarize would.
+
+Two kinds of match count as high-confidence:
+
+- Rules. A skill declares `fast_path: module:REGEX` in skill.yaml (the
+  YouTube and summarize skills use the regexes they already parse links
+  with). A message that matches goes to that skill's command if every
+  other word in it is one of FAST_PATH_TRIGGER_WORDS ("tldr <link>"),
+  apart from at most FAST_PATH_MAX_WORDS others (none by default, so
+  "what is <link>" still reaches the agent). When several rules match,
+  the longest, most specific regex wins.
+- A classifier. Every agent turn is logged to FAST_PATH_LOG with the tool
+  the agent ended up calling alone ("agent" when it called none or
+  several), as word tokens hashed with a random key kept next to the log
+  (<log>.salt), so the log cannot be read back by hashing a word list. A
+  naive Bayes model over those turns routes a message to the command that
+  runs the predicted tool once it is at least FAST_PATH_MIN_CONFIDENCE
+  sure and has seen FAST_PATH_MIN_EXAMPLES turns of both that tool and
+  plain chat. The command gets the whole message as its argument, so only
+  commands that opt in with `classify: true` (free-text argument or none)
+  are routed this way.
+
+The same log keeps how long the agent took on top of its tools, per
+label. Every fast-path hit adds that overhead for its command's tool to
+the estimated time saved (bot_fastpath_saved_seconds_total, /stats) or,
+until the agent has been seen using the command, the overhead of a plain
+chat turn, which is about one generation and so a lower bound.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import re
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+AGENT = "agent"  # label of turns the agent has to handle
+OVERHEAD_ALPHA = 0.2  # weight of the newest turn in the per-command overhead average
+
+_WORD = re.compile(r"[\w']+")
+
+_messages = counter("bot_fastpath_messages_total", "Plain messages by route (rule, classifier or agent)")
+_saved = counter("bot_fastpath_saved_seconds_total", "Estimated agent seconds saved by fast-path routing, by command")
+
+
+@dataclass
+class FastMatch:
+    """A message routed past the agent."""
+    command: str
+    args: str
+    via: str  # "rule" or "classifier"
+    confidence: float = 1.0
+
+
+def _other_words(text: str, match: re.Match) -> list[str]:
+    """Words in text outside the whitespace-delimited token holding the match."""
+    before = re.sub(r"\S*$", "", text[:match.start()])
+    after = re.sub(r"^\S*", "", text[match.end():])
+    return _WORD.findall(before + " " + after)
+
+
+class IntentClassifier:
+    """Multinomial naive Bayes over hashed word tokens."""
+
+    def __init__(self):
+        self.examples: Counter = Counter()  # label → turns
+        self._words: dict[str, Counter] = defaultdict(Counter)  # label → token → count
+        self._totals: Counter = Counter()  # label → tokens
+        self._vocabulary: set[str] = set()
+
+    def add(self, tokens: list[str], label: str):
+        self.examples[label] += 1
+        self._words[label].update(tokens)
+        self._totals[label] += len(tokens)
+        self._vocabulary.update(tokens)
+
+    def predict(self, tokens: list[str]) -> tuple[str | None, float]:
+        """Most likely label and its posterior probability."""
+        total = sum(self.examples.values())
+        if not total or not tokens:
+            return None, 0.0
+        vocabulary = len(self._vocabulary) + 1
+        scores = {}
+        for label, n in self.examples.items():
+            words, size = self._words[label], self._totals[label] + vocabulary
+            scores[label] = math.log(n / total) + sum(math.log((words[t] + 1) / size) for t in tokens)
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1 / norm
+
+
+class FastPath:
+    """Matches plain messages to direct commands before they reach the agent."""
+
+    def __init__(self, commands: dict, log_path: str | Path | None = None, max_words: int = 0,
+                 trigger_words=(), min_confidence: float = 0.95, min_examples: int = 20):
+        self.commands = commands
+        self.max_words = max_words
+        self.trigger_words = {w.lower() for w in trigger_words}
+        self.min_confidence = min_confidence
+        self.min_examples = min_examples
+        # Longest (most specific) pattern first
+        self._rules = sorted(((dc.pattern, cmd) for cmd, dc in commands.items() if dc.pattern is not None),
+                             key=lambda rule: -len(rule[0].pattern))
+        # Tool each command runs, and the opted-in commands the classifier may route to by it
+        self._tool_of = {cmd: getattr(dc.func, "tool_name", getattr(dc.func, "__name__", ""))
+                         for cmd, dc in commands.items()}
+        self._classified = {self._tool_of[cmd]: cmd for cmd, dc in commands.items() if dc.classify}
+        self.classifier = IntentClassifier()
+        self.overhead: dict[str, float] = {}  # label → agent seconds on top of its tools
+        self._lock = threading.Lock()
+        self._log = None
+        self._salt = secrets.token_bytes(16)  # no log: the classifier only lives in memory
+        if log_path:
+            path = Path(log_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._salt = self._load_salt(path)
+            self._load(path)
+            self._log = open(path, "a", encoding="utf-8", buffering=1)
+
+    def _load_salt(self, path: Path) -> bytes:
+        salt_path = path.with_name(path.name + ".salt")
+        if salt_path.exists():
+            return bytes.fromhex(salt_path.read_text().strip())
+        salt = secrets.token_bytes(16)
+        salt_path.write_text(salt.hex())
+        salt_path.chmod(0o600)
+        return salt
+
+    def _load(self, path: Path):
+        if not path.exists():
+            return
+        for line in path.read_text(encoding="utf-8").splitlines():
+            try:
+                entry = json.loads(line)
+                self._learn_locked(entry["tokens"], entry["label"], entry.get("overhead"))
+            except (ValueError, KeyError, TypeError):
+                continue
+        logger.info("Fast path classifier trained on %d turns", sum(self.classifier.examples.values()))
+
+    def _tokens(self, text: str) -> list[str]:
+        tokens = []
+        for pattern, cmd in self._rules:
+            if pattern.search(text):
+                tokens.append(f"<{cmd}>")
+                text = pattern.sub(" ", text)
+        tokens += _WORD.findall(text.lower())
+        return [hashlib.blake2b(t.encode(), key=self._salt, digest_size=6).hexdigest() for t in tokens]
+
+    def match(self, text: str) -> FastMatch | None:
+        """The direct command to run for a plain message, or None for the agent."""
+        text = text.strip()
+        for pattern, cmd in self._rules:
+            m = pattern.search(text)
+            if m is None:
+                continue
+            others = [w for w in _other_words(text, m) if w.lower() not in self.trigger_words]
+            if len(others) <= self.max_words:
+                return self._hit(FastMatch(cmd, text, "rule"))
+
+        with self._lock:
+            label, confidence = self.classifier.predict(self._tokens(text))
+            examples = self.classifier.examples
+            trained = (label in self._classified and examples[label] >= self.min_examples
+                       and examples[AGENT] >= self.min_examples)
+        if trained and confidence >= self.min_confidence:
+            return self._hit(FastMatch(self._classified[label], text, "classifier", confidence))
+        _messages.inc(route=AGENT)
+        return None
+
+    def _hit(self, match: FastMatch) -> FastMatch:
+        _messages.inc(route=match.via)
+        saved = self.overhead.get(self._tool_of[match.command], self.overhead.get(AGENT))
+        if saved:
+            _saved.inc(saved, command=match.command)
+        logger.info("Fast path (%s, %.2f): %s", match.via, match.confidence, match.command)
+        return match
+
+    def learn(self, text: str, tools: dict[str, float], seconds: float):
+        """Record an agent turn: the tools it called ({name: seconds}) and how long it took."""
+        label = next(iter(tools)) if len(tools) == 1 else AGENT
+        overhead = max(0.0, seconds - sum(tools.values()))
+        tokens = self._tokens(text)
+        with self._lock:
+            self._learn_locked(tokens, label, overhead)
+            if self._log is not None:
+                entry = {"t": round(time.time(), 3), "label": label, "tokens": tokens, "overhead": round(overhead, 3)}
+                self._log.write(json.dumps(entry) + "\n")
+
+    def _learn_locked(self, tokens: list[str], label: str, overhead: float | None):
+        self.classifier.add(tokens, label)
+        if overhead is not None:
+            previous = self.overhead.get(label)
+            self.overhead[label] = overhead if previous is None else previous + OVERHEAD_ALPHA * (overhead - previous)
+
+    def stats(self) -> dict:
+        """Routing counts, estimated savings and training size, for /stats."""
+        routes = Counter()
+        for labels, value in _messages.samples():
+            routes[labels.get("route", AGENT)] += int(value)
+        saved = sum(value for _, value in _saved.samples())
+        return {"rule": routes["rule"], "classifier": routes["classifier"], "agent": routes[AGENT],
+                "saved": saved, "trained": sum(self.classifier.examples.values())}
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
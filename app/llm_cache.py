@@ -0,0 +1,198 @@
+"""Exact-match cache of LLM responses for deterministic skill calls.
+
+Skills that summarize or analyze fetched content often see the very same
+input twice: a link shared in two groups, an RSS article that is both in
+the digest and behind a /summarize. With LLM_CACHE_ENABLED on, models made
+with config.make_model(cache="<skill>") look every request up by
+
+    (model_id, sha256(system prompt), sha256(messages + tool specs), temperature, max_tokens)
+
+and replay the stored stream events on a hit, which takes milliseconds
+instead of a full generation. Misses stream from the server as usual and
+are stored once they complete; aborted or failed requests are never
+stored. Multi-turn tool loops cache turn by turn, so a turn whose tool
+results changed simply misses.
+
+Entries live in SQLite (LLM_CACHE_PATH) and expire after the skill's
+cache_ttl from skill.yaml (LLM_CACHE_TTL when unset, 0 = never cache that
+skill). The file is kept under LLM_CACHE_MAX_MB by evicting the least
+recently used entries.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import config
+import tracing
+from metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+PRUNE_TO = 0.9  # eviction frees space down to this share of the size limit
+
+_requests = counter("bot_llm_cache_requests_total", "LLM response cache lookups by skill and result (hit/miss)")
+_evictions = counter("bot_llm_cache_evictions_total", "LLM response cache entries evicted for space")
+_size = gauge("bot_llm_cache_bytes", "Stored size of cached LLM responses")
+
+_ttls: dict[str, float] = {}  # skill name → cache_ttl from skill.yaml
+_lock = threading.Lock()
+_store: "ResponseCache | None" = None
+
+
+class ResponseCache:
+    """SQLite store of recorded model streams, bounded by total size."""
+
+    def __init__(self, path: str | Path, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, skill TEXT NOT NULL, created REAL NOT NULL, expires REAL NOT NULL,"
+            " used REAL NOT NULL, size INTEGER NOT NULL, events BLOB NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used ON responses (used)")
+        self.bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> list[dict] | None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT expires, size, events FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            expires, size, blob = row
+            if expires <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.bytes -= size
+                return None
+            self._db.execute("UPDATE responses SET used = ? WHERE key = ?", (now, key))
+        return json.loads(zlib.decompress(blob))
+
+    def put(self, key: str, skill: str, events: list[dict], ttl: float):
+        blob = zlib.compress(json.dumps(events, default=str).encode())
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (key, skill, now, now + ttl, now, len(blob), blob))
+            self.bytes += len(blob) - (old[0] if old else 0)
+            if self.bytes > self.max_bytes:
+                self._evict(now)
+
+    def _evict(self, now: float):
+        """Drop expired entries, then the least recently used, down to PRUNE_TO of the limit."""
+        self._db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+        self.bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        target = self.max_bytes * PRUNE_TO
+        evicted = 0
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY used").fetchall():
+            if self.bytes <= target:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.bytes -= size
+            evicted += 1
+        if evicted:
+            _evictions.inc(evicted)
+            logger.info("LLM cache evicted %d entries (%d bytes kept)", evicted, self.bytes)
+
+    def entries(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def _cache() -> ResponseCache:
+    global _store
+    with _lock:
+        if _store is None:
+            cfg = config.cache
+            _store = ResponseCache(cfg.path, int(cfg.max_mb * 1024 * 1024))
+        return _store
+
+
+def set_ttl(skill: str, ttl: float):
+    """Register a skill's cache_ttl (called by the skill registry)."""
+    _ttls[skill] = ttl
+
+
+def ttl_for(skill: str) -> float:
+    return _ttls.get(skill, config.cache.ttl)
+
+
+def _digest(value) -> str:
+    data = value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def request_key(model, messages, tool_specs=None, system_prompt=None, **kwargs) -> str:
+    """Cache key for one model request."""
+    cfg = model.get_config()
+    params = cfg.get("params") or {}
+    system = system_prompt if system_prompt is not None else kwargs.get("system_prompt_content")
+    prompt = {"messages": messages, "tools": tool_specs, "tool_choice": kwargs.get("tool_choice")}
+    return _digest([cfg.get("model_id"), _digest(system or ""), _digest(prompt),
+                    params.get("temperature"), params.get("max_tokens")])
+
+
+def cached(model, skill: str):
+    """Serve a Strands model's requests from the response cache when enabled for `skill`."""
+    stream = model.stream
+
+    async def _stream(messages, tool_specs=None, system_prompt=None, **kwargs):
+        ttl = ttl_for(skill)
+        if not config.cache.enabled or ttl <= 0:
+            async for event in stream(messages, tool_specs, system_prompt, **kwargs):
+                yield event
+            return
+
+        started = time.time()
+        key = request_key(model, messages, tool_specs, system_prompt, **kwargs)
+        store = _cache()
+        try:
+            hit = store.get(key)
+        except sqlite3.Error as e:
+            logger.warning("LLM cache lookup failed: %s", e)
+            hit = None
+        if hit is not None:
+            _requests.inc(skill=skill, result="hit")
+            tracing.record("llm.cache", started, time.time(), skill=skill, result="hit")
+            for event in hit:
+                yield event
+            return
+
+        _requests.inc(skill=skill, result="miss")
+        recorded = []
+        async for event in stream(messages, tool_specs, system_prompt, **kwargs):
+            recorded.append(event)
+            yield event
+        if any("messageStop" in event for event in recorded):
+            try:
+                store.put(key, skill, recorded, ttl)
+            except sqlite3.Error as e:
+                logger.warning("LLM cache store failed: %s", e)
+
+    model.stream = _stream
+    return model
+
+
+def stats() -> dict:
+    """Hit/miss counts and store size, for /stats."""
+    counts = {"hit": 0, "miss": 0}
+    for labels, value in _requests.samples():
+        counts[labels.get("result", "miss")] += int(value)
+    store = _store
+    return {**counts, "entries": store.entries() if store else 0, "bytes": store.bytes if store else 0}
+
+
+_size.set_function(lambda: _store.bytes if _store else 0)
@@ -0,0 +1,71 @@
+"""LLM request metrics, recorded at the model boundary.
+
+metered() wraps a Strands model's stream() so every request — from the
+chat agent, skill sub-agents, graph nodes or scheduled jobs — counts its
+tokens, latency and time to first token, whichever agent made it, and
+shows up as an llm.request span in the request's trace.
+"""
+
+import time
+
+import tracing
+from metrics import counter, histogram
+
+_requests = counter("bot_llm_requests_total", "LLM requests by model and outcome")
+_tokens = counter("bot_llm_tokens_total",
+                  "LLM tokens by model and direction (in = prompt, out = completion, cached = prompt tokens "
+                  "the server reused from its prompt cache)")
+_latency = histogram("bot_llm_request_seconds", "Seconds from sending an LLM request to the end of its stream")
+_first_token = histogram("bot_llm_time_to_first_token_seconds", "Seconds until the first streamed token")
+
+RATE_ALPHA = 0.2  # weight of the newest request in the output rate average
+_rates: dict[str, float] = {}  # model → output tokens per second while streaming
+
+
+def output_rate(model_id: str) -> float | None:
+    """Recent streaming speed of a model in output tokens per second, if known."""
+    return _rates.get(model_id)
+
+
+def metered(model):
+    """Record metrics for every request made through a Strands model."""
+    stream = model.stream
+
+    async def _stream(*args, **kwargs):
+        model_id = model.get_config().get("model_id", "unknown")
+        started = time.monotonic()
+        started_at = time.time()
+        first = None
+        tokens = {}
+        status = "error"
+        try:
+            async for event in stream(*args, **kwargs):
+                if first is None and "contentBlockDelta" in event:
+                    first = time.monotonic() - started
+                    _first_token.observe(first, model=model_id)
+                usage = event.get("metadata", {}).get("usage")
+                if usage:
+                    tokens = usage
+                    _tokens.inc(usage.get("inputTokens", 0), model=model_id, direction="in")
+                    _tokens.inc(usage.get("outputTokens", 0), model=model_id, direction="out")
+                    if usage.get("cacheReadInputTokens"):
+                        _tokens.inc(usage["cacheReadInputTokens"], model=model_id, direction="cached")
+                yield event
+            status = "ok"
+            streaming = time.monotonic() - started - (first or 0)
+            if first is not None and tokens.get("outputTokens", 0) > 1 and streaming > 0:
+                rate = (tokens["outputTokens"] - 1) / streaming
+                previous = _rates.get(model_id)
+                _rates[model_id] = rate if previous is None else previous + RATE_ALPHA * (rate - previous)
+        except GeneratorExit:
+            status = "aborted"
+            raise
+        finally:
+            _requests.inc(model=model_id, status=status)
+            _latency.observe(time.monotonic() - started, model=model_id)
+            tracing.record("llm.request", started_at, time.time(), model=model_id, status=status,
+                           first_token=round(first, 3) if first is not None else None,
+                           tokens_in=tokens.get("inputTokens"), tokens_out=tokens.get("outputTokens"))
+
+    model.stream = _stream
+    return model
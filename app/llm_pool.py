@@ -0,0 +1,280 @@
+"""Process-wide pool of LLM clients and models.
+
+Strands' OpenAIModel opens a new OpenAI client — and with it a new HTTP
+connection pool — for every request, because an httpx client cannot be
+shared between event loops and skill sub-agents each run on a loop of
+their own. A pipeline of many short calls (RSS articles, YouTube chunks,
+condensing steps) therefore paid TCP setup on every call.
+
+Here every request runs on one long-lived I/O loop in a background
+thread, through one OpenAI client per (base_url, api_key) whose
+keep-alive connections are reused across calls, agents and loops. The
+caller's loop receives the streamed events through a queue, so metrics,
+tracing and cancellation checkpoints still run in the caller's context.
+Closing the caller's stream (an abort or /cancel) cancels the request on
+the I/O loop, which closes its connection.
+
+The OpenAI SDK stops reading a stream at its final [DONE] event and
+closes the response, which would discard the connection because the end
+of the chunked body was never read. The pool's transport finishes
+reading it first (it normally arrives with [DONE]), so the connection
+goes back to the pool.
+
+Models are cached by (base_url, model_id, params), so repeated
+config.make_model() calls hand back the same instance. Unless a base_url
+is given, a model sends each request to the backend llm_router picks,
+pinned to a server slot when asked to (see shaping.py).
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import httpx
+import openai
+from strands.models.openai import OpenAIModel
+
+import config
+import llm_router
+import shaping
+from metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+MAX_MODELS = 32  # cached model configurations (LRU)
+DRAIN_TIMEOUT = 0.25  # seconds to wait for the rest of a closed response before dropping it
+DRAIN_BYTES = 65536
+
+_connections = counter("bot_llm_connections_opened_total", "TCP connections opened to LLM servers")
+_streams = gauge("bot_llm_streams_active", "LLM requests currently streaming through the shared client")
+
+_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+_clients: dict[tuple[str, str], openai.AsyncOpenAI] = {}
+_models: "OrderedDict[tuple, OpenAIModel]" = OrderedDict()
+_backend_models: dict[tuple, OpenAIModel] = {}
+_active = 0
+
+
+def _io_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-io", daemon=True).start()
+            _loop = loop
+    llm_router.start_health_checks(_loop)
+    return _loop
+
+
+class _DrainingStream(httpx.AsyncByteStream):
+    def __init__(self, stream):
+        self._stream = stream
+        self._chunks = None
+
+    async def __aiter__(self):
+        self._chunks = self._stream.__aiter__()
+        async for chunk in self._chunks:
+            yield chunk
+
+    async def _drain(self):
+        read = 0
+        async for chunk in self._chunks:
+            read += len(chunk)
+            if read > DRAIN_BYTES:
+                raise httpx.ReadError("response still streaming")
+
+    async def aclose(self):
+        if self._chunks is not None:
+            try:
+                await asyncio.wait_for(self._drain(), DRAIN_TIMEOUT)
+            except (Exception, asyncio.TimeoutError):
+                pass  # still generating (an aborted request): drop the connection
+        await self._stream.aclose()
+
+
+class _DrainingTransport(httpx.AsyncBaseTransport):
+    """Transport that finishes reading a response body before closing it."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        response.stream = _DrainingStream(response.stream)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def _client(base_url: str, api_key: str) -> openai.AsyncOpenAI:
+    key = (base_url, api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            async def _count_connects(request: httpx.Request):
+                async def trace(event: str, info: dict):
+                    if event == "connection.connect_tcp.complete":
+                        _connections.inc(server=base_url)
+                request.extensions["trace"] = trace
+
+            cfg = config.llm
+            transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+                max_connections=cfg.pool_connections, max_keepalive_connections=cfg.pool_connections,
+                keepalive_expiry=cfg.pool_keepalive))
+            http = openai.DefaultAsyncHttpxClient(transport=_DrainingTransport(transport),
+                                                  event_hooks={"request": [_count_connects]})
+            # With several backends, llm_router retries elsewhere instead of on the same server
+            retries = 0 if len(llm_router.backends()) > 1 else openai.DEFAULT_MAX_RETRIES
+            client = _clients[key] = openai.AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http,
+                                                        max_retries=retries)
+            logger.info("Created pooled LLM client for %s", base_url)
+        return client
+
+
+async def _pump(events, put):
+    """Run a model's async generator on the I/O loop, handing each event to put()."""
+    try:
+        async for event in events:
+            put(("event", event))
+        put(("end", None))
+    except BaseException as e:  # includes CancelledError, so the caller never hangs
+        put(("error", e))
+        if not isinstance(e, Exception):
+            raise
+    finally:
+        await events.aclose()
+
+
+def _on_io_loop(method):
+    """Wrap an async-generator model method so it runs on the shared I/O loop."""
+    async def relay(*args, **kwargs):
+        global _active
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # the caller's loop is gone (an abandoned sub-agent)
+
+        future = asyncio.run_coroutine_threadsafe(_pump(method(*args, **kwargs), put), _io_loop())
+        with _lock:
+            _active += 1
+        try:
+            while True:
+                kind, value = await queue.get()
+                if kind == "end":
+                    return
+                if kind == "error":
+                    if isinstance(value, asyncio.CancelledError):
+                        raise ConnectionError("LLM request was cancelled")
+                    raise value
+                yield value
+        finally:
+            future.cancel()  # no-op once finished; otherwise aborts the HTTP request
+            with _lock:
+                _active -= 1
+
+    return relay
+
+
+def _backend_model(backend: llm_router.Backend, model_id: str, params: dict) -> OpenAIModel:
+    """The model that sends requests straight to one backend."""
+    key = (backend.url, backend.api_key, model_id, json.dumps(params, sort_keys=True))
+    with _lock:
+        model = _backend_models.get(key)
+    if model is None:
+        model = OpenAIModel(client=_client(backend.url, backend.api_key), model_id=model_id, params=dict(params))
+        model.stream = _on_io_loop(model.stream)
+        model.structured_output = _on_io_loop(model.structured_output)
+        with _lock:
+            model = _backend_models.setdefault(key, model)
+    return model
+
+
+def _routed(model: OpenAIModel, method: str, pin_slots: bool = False):
+    """Wrap a model method so each call runs on the backend llm_router picks.
+
+    With pin_slots, a call inside shaping.pinned() goes to its conversation's slot.
+    """
+    async def routed(*args, **kwargs):
+        cfg = model.get_config()
+        model_id, params = cfg["model_id"], cfg.get("params") or {}
+
+        def call(backend: llm_router.Backend):
+            # Runs in the caller's context, where the pinned conversation is set
+            extra = shaping.slot_params(backend) if pin_slots else {}
+            return getattr(_backend_model(backend, model_id, {**params, **extra}), method)(*args, **kwargs)
+
+        events = llm_router.route(model_id, call)
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+
+    return routed
+
+
+def get_model(model_id: str, temperature: float, max_tokens: int, base_url: str | None = None,
+              api_key: str | None = None, checkpoints: bool = True, cache: str | None = None,
+              pin_slots: bool = False) -> OpenAIModel:
+    """Return the shared model for this configuration, creating it on first use.
+
+    Without base_url, requests are spread over the configured backends
+    (see llm_router). The model records LLM metrics, and with
+    checkpoints=True every request is also a cancellation checkpoint (see
+    cancellation.checkpointed). With cache set to a skill name, responses
+    go through the response cache (see llm_cache.cached). pin_slots keeps
+    requests made inside shaping.pinned() on their conversation's server
+    slot; tool schemas are always sent in a stable order.
+    """
+    from cancellation import checkpointed
+    from llm_cache import cached
+    from llm_metrics import metered
+
+    api_key = api_key or config.llm.api_key
+    key = (base_url, api_key, model_id, temperature, max_tokens, checkpoints, cache, pin_slots)
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            _models.move_to_end(key)
+            return model
+
+    params = {"temperature": temperature, "max_tokens": max_tokens}
+    if base_url:
+        model = OpenAIModel(client=_client(base_url, api_key), model_id=model_id, params=params)
+        model.stream = _on_io_loop(model.stream)
+        model.structured_output = _on_io_loop(model.structured_output)
+    else:
+        primary = llm_router.backends()[0]
+        model = OpenAIModel(client=_client(primary.url, primary.api_key), model_id=model_id, params=params)
+        model.stream = _routed(model, "stream", pin_slots)
+        model.structured_output = _routed(model, "structured_output", pin_slots)
+    model = shaping.shaped(metered(model))
+    if cache:
+        model = cached(model, cache)
+    if checkpoints:
+        model = checkpointed(model)
+
+    with _lock:
+        model = _models.setdefault(key, model)
+        _models.move_to_end(key)
+        while len(_models) > MAX_MODELS:
+            _models.popitem(last=False)
+    return model
+
+
+def stats() -> dict:
+    """Pool size and usage, for /stats."""
+    with _lock:
+        return {"clients": len(_clients), "models": len(_models), "active": _active,
+                "connections": int(sum(v for _, v in _connections.samples()))}
+
+
+_streams.set_function(lambda: _active)
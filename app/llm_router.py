@@ -0,0 +1,259 @@
+"""Routing of LLM requests over several OpenAI-compatible backends.
+
+LLM_BACKENDS lists the servers (two LM Studio hosts and a llama.cpp
+server, say); without it the only backend is LLM_BASE_URL. Models from
+config.make_model() pick a backend per request, so skills and sessions
+spread over all of them without knowing they exist.
+
+A request goes to the backend with the lowest (in-flight + 1) × recent
+latency, where latency is a moving average of the time to the first
+token. Only backends allowed to serve the model (LLM_BACKEND_MODELS) are
+considered, and those whose /v1/models lists it are preferred. A backend
+that is loading or reloading a model on this bot's behalf is skipped
+while it does (draining()).
+
+If a request fails before anything has been streamed back — connection
+refused, a 5xx, model not found, throttled — it is retried on the next
+best backend. LLM_BACKEND_MAX_FAILURES failures in a row mark a backend
+down; with several backends, a health check polls every backend's
+/v1/models each LLM_HEALTH_INTERVAL seconds and brings it back once it
+answers. When every backend is down, requests still go to the best of
+them rather than failing outright.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import httpx
+import openai
+from strands.types.exceptions import ModelThrottledException
+
+import config
+from metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+LATENCY_ALPHA = 0.2  # weight of the newest sample in the latency average
+INITIAL_LATENCY = 1.0  # seconds, until a backend has served a request
+HEALTH_TIMEOUT = 5.0
+
+# Failures that say nothing about the request itself, so another backend may succeed
+RETRYABLE = (openai.APIConnectionError, openai.InternalServerError, openai.NotFoundError,
+             openai.RateLimitError, ModelThrottledException, httpx.TransportError)
+
+_requests = counter("bot_llm_backend_requests_total", "LLM requests per backend and status")
+_failovers = counter("bot_llm_backend_failovers_total", "LLM requests retried on another backend, by failed backend")
+_inflight = gauge("bot_llm_backend_inflight", "LLM requests in flight per backend")
+_healthy = gauge("bot_llm_backend_healthy", "1 if the backend is taking requests")
+_latency = gauge("bot_llm_backend_latency_seconds", "Moving average of time to first token per backend")
+
+
+@dataclass(eq=False)
+class Backend:
+    """One OpenAI-compatible server and what the router knows about it."""
+
+    name: str
+    url: str
+    api_key: str
+    allowed: frozenset[str] = frozenset()  # models it may serve; empty = any
+    served: frozenset[str] | None = None  # models its /v1/models listed at the last health check
+    inflight: int = 0
+    latency: float = INITIAL_LATENCY
+    healthy: bool = True
+    failures: int = 0
+    draining: int = 0
+    last_error: str = ""
+    requests: int = 0
+    slots: int = 0  # server slots conversations are pinned to (0 = the server picks)
+
+    def accepts(self, model_id: str) -> bool:
+        return not self.allowed or model_id in self.allowed
+
+    def score(self) -> float:
+        return (self.inflight + 1) * self.latency
+
+
+_lock = threading.Lock()
+_backends: list[Backend] | None = None
+_health_task = None
+
+
+def _normalize(url: str) -> str:
+    return url.rstrip("/")
+
+
+def backends() -> list[Backend]:
+    """The configured backends (parsed on first use)."""
+    global _backends
+    with _lock:
+        if _backends is None:
+            cfg = config.llm
+            urls = cfg.backends or {"default": cfg.base_url}
+            _backends = []
+            for name, url in urls.items():
+                models = cfg.backend_models.get(name, "")
+                allowed = frozenset(m.strip() for m in models.split(";") if m.strip() and m.strip() != "*")
+                backend = Backend(name, _normalize(url), cfg.backend_keys.get(name, cfg.api_key), allowed,
+                                  slots=int(cfg.backend_slots.get(name, cfg.slots)))
+                _backends.append(backend)
+                _inflight.set_function(lambda b=backend: b.inflight, backend=name)
+                _healthy.set_function(lambda b=backend: int(b.healthy and not b.draining), backend=name)
+                _latency.set_function(lambda b=backend: b.latency, backend=name)
+            if cfg.backends:
+                logger.info("LLM backends: %s", ", ".join(f"{b.name}={b.url}" for b in _backends))
+        return _backends
+
+
+def pick(model_id: str, exclude: tuple[Backend, ...] = ()) -> Backend | None:
+    """Best backend for a request, or None if every candidate was excluded.
+
+    A model no backend is configured for may go to any of them.
+    """
+    eligible = [b for b in backends() if b.accepts(model_id)] or backends()
+    candidates = [b for b in eligible if b not in exclude]
+    if not candidates:
+        return None
+    with _lock:
+        up = [b for b in candidates if b.healthy and not b.draining] or candidates
+        serving = [b for b in up if b.served is None or model_id in b.served] or up
+        return min(serving, key=Backend.score)
+
+
+def _succeeded(backend: Backend, latency: float):
+    with _lock:
+        backend.latency += LATENCY_ALPHA * (latency - backend.latency)
+        backend.failures = 0
+        backend.healthy = True
+
+
+def _failed(backend: Backend, error: Exception):
+    with _lock:
+        backend.failures += 1
+        backend.last_error = f"{type(error).__name__}: {error}"[:200]
+        if backend.healthy and backend.failures >= config.llm.max_failures:
+            backend.healthy = False
+            logger.warning("LLM backend %s marked down after %d failures: %s",
+                           backend.name, backend.failures, backend.last_error)
+
+
+async def route(model_id: str, call):
+    """Stream call(backend)'s events from the best backend, failing over on errors.
+
+    call(backend) returns the request's async generator on that backend.
+    Once an event has been passed on, errors are raised as they are.
+    """
+    tried: tuple[Backend, ...] = ()
+    last_error: Exception | None = None
+    while True:
+        backend = pick(model_id, tried)
+        if backend is None:
+            raise last_error
+        tried += (backend,)
+        with _lock:
+            backend.inflight += 1
+            backend.requests += 1
+        started = time.monotonic()
+        first = None
+        passed = False
+        status = "error"
+        events = call(backend)
+        try:
+            async for event in events:
+                if first is None and ("contentBlockDelta" in event or "messageStop" in event):
+                    first = time.monotonic() - started
+                passed = True
+                yield event
+            status = "ok"
+            _succeeded(backend, first if first is not None else time.monotonic() - started)
+            return
+        except RETRYABLE as e:
+            _failed(backend, e)
+            if passed or pick(model_id, tried) is None:
+                raise
+            _failovers.inc(backend=backend.name)
+            logger.warning("LLM backend %s failed (%s), retrying elsewhere", backend.name, e)
+            last_error = e
+        except GeneratorExit:
+            status = "aborted"
+            raise
+        finally:
+            await events.aclose()
+            with _lock:
+                backend.inflight -= 1
+            _requests.inc(backend=backend.name, status=status)
+
+
+@contextmanager
+def draining(url: str):
+    """Keep requests away from the backend at `url` while the block runs (a model load)."""
+    url = _normalize(url)
+    matched = [b for b in backends() if b.url == url]
+    with _lock:
+        for b in matched:
+            b.draining += 1
+    try:
+        yield
+    finally:
+        with _lock:
+            for b in matched:
+                b.draining -= 1
+
+
+def has_model(model_id: str) -> bool:
+    """True if a healthy backend other than LLM_BASE_URL's listed the model at its last check."""
+    primary = _normalize(config.llm.base_url)
+    candidates = backends()
+    with _lock:
+        return any(b.healthy and b.url != primary and b.served and model_id in b.served for b in candidates)
+
+
+# ── Health checks ────────────────────────────────────────────
+
+async def _check(http: httpx.AsyncClient, backend: Backend):
+    try:
+        resp = await http.get(f"{backend.url}/models", headers={"Authorization": f"Bearer {backend.api_key}"})
+        resp.raise_for_status()
+        served = frozenset(m["id"] for m in resp.json().get("data", []))
+    except Exception as e:
+        with _lock:
+            backend.last_error = f"health check: {type(e).__name__}: {e}"[:200]
+            if backend.healthy:
+                logger.warning("LLM backend %s failed its health check: %s", backend.name, e)
+            backend.healthy = False
+        return
+    with _lock:
+        if not backend.healthy:
+            logger.info("LLM backend %s is back", backend.name)
+        backend.healthy = True
+        backend.failures = 0
+        backend.served = served
+
+
+async def _health_loop():
+    async with httpx.AsyncClient(timeout=HEALTH_TIMEOUT) as http:
+        while True:
+            await asyncio.gather(*(_check(http, b) for b in backends()))
+            await asyncio.sleep(config.llm.health_interval)
+
+
+def start_health_checks(loop: asyncio.AbstractEventLoop):
+    """Start polling the backends on `loop`, once, if there is more than one."""
+    global _health_task
+    with _lock:
+        if _health_task is not None:
+            return
+        _health_task = True
+    if len(backends()) > 1 and config.llm.health_interval > 0:
+        _health_task = asyncio.run_coroutine_threadsafe(_health_loop(), loop)
+
+
+def stats() -> list[dict]:
+    """Per-backend state, for /stats."""
+    candidates = backends()
+    with _lock:
+        return [{"name": b.name, "url": b.url, "healthy": b.healthy, "draining": b.draining > 0, "inflight": b.inflight,
+                 "latency": b.latency, "requests": b.requests, "error": b.last_error} for b in candidates]
@@ -0,0 +1,274 @@
+"""In-process metrics registry.
+
+Modules register their counters, gauges and histograms once at import
+time and update them as they work. The /stats slash command reads
+everything back, and serve() exposes the same registry over HTTP in the
+Prometheus text format for scraping.
+
+    from metrics import counter
+    _sends = counter("signal_sends_total", "Messages sent to Signal")
+    _sends.inc(status="ok")
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets (seconds) suited to LLM-bound work: sub-second sends up to multi-minute skills
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+class _Metric:
+    """Base class: a named set of samples keyed by label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+
+    @staticmethod
+    def _key(labels: dict) -> tuple:
+        return tuple(sorted(labels.items()))
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[tuple[dict, float]]:
+        """Return (labels, value) pairs for every label combination seen."""
+        with self._lock:
+            return [(dict(k), v) for k, v in self._values.items()]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed on read."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str):
+        super().__init__(name, help)
+        self._fns: dict[tuple, object] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+            self._fns.pop(self._key(labels), None)
+
+    def set_function(self, fn, **labels):
+        """Compute the value for these labels by calling fn() whenever it is read."""
+        with self._lock:
+            self._fns[self._key(labels)] = fn
+
+    def samples(self) -> list[tuple[dict, float]]:
+        with self._lock:
+            fns = list(self._fns.items())
+        computed = []
+        for key, fn in fns:
+            try:
+                computed.append((dict(key), float(fn())))
+            except Exception:
+                continue
+        return super().samples() + computed
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, plus sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+        self._hists: dict[tuple, list] = {}  # labels → [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            hist = self._hists.get(key)
+            if hist is None:
+                hist = self._hists[key] = [0] * len(self.buckets) + [0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                hist[index] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def samples(self) -> list[tuple[dict, float]]:
+        """Return (labels, count) pairs, like a counter of observations."""
+        with self._lock:
+            return [(dict(k), h[-1]) for k, h in self._hists.items()]
+
+    def series(self) -> list[tuple[dict, list[tuple[float, int]], float, int]]:
+        """Return (labels, [(upper bound, cumulative count)], sum, count) per label set."""
+        with self._lock:
+            hists = [(dict(k), list(h)) for k, h in self._hists.items()]
+        out = []
+        for labels, hist in hists:
+            cumulative, running = [], 0
+            for bound, n in zip(self.buckets, hist):
+                running += n
+                cumulative.append((bound, running))
+            cumulative.append((math.inf, hist[-1]))
+            out.append((labels, cumulative, hist[-2], hist[-1]))
+        return out
+
+
+_registry: dict[str, _Metric] = {}
+_registry_lock = threading.Lock()
+
+
+def _get_or_create(cls, name: str, help: str):
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = cls(name, help)
+            _registry[name] = metric
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric '{name}' already registered as {metric.kind}")
+        return metric
+
+
+def counter(name: str, help: str) -> Counter:
+    """Return the counter registered under name, creating it if needed."""
+    return _get_or_create(Counter, name, help)
+
+
+def gauge(name: str, help: str) -> Gauge:
+    """Return the gauge registered under name, creating it if needed."""
+    return _get_or_create(Gauge, name, help)
+
+
+def histogram(name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+    """Return the histogram registered under name, creating it if needed."""
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = Histogram(name, help, buckets)
+            _registry[name] = metric
+        elif not isinstance(metric, Histogram):
+            raise ValueError(f"Metric '{name}' already registered as {metric.kind}")
+        return metric
+
+
+def collect() -> list[_Metric]:
+    """Return all registered metrics, sorted by name."""
+    with _registry_lock:
+        return sorted(_registry.values(), key=lambda m: m.name)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+
+
+def format_summary() -> str:
+    """Human-readable dump of all metrics (for the /stats command)."""
+    lines = []
+    for metric in collect():
+        samples = metric.samples()
+        if not samples:
+            continue
+        if isinstance(metric, Histogram):
+            for labels, _, total, count in sorted(metric.series(), key=lambda s: _format_labels(s[0])):
+                lines.append(f"{metric.name}{_format_labels(labels)} = {count} obs, avg {total / count:.3g}")
+            continue
+        for labels, value in sorted(samples, key=lambda s: _format_labels(s[0])):
+            shown = int(value) if float(value).is_integer() else round(value, 3)
+            lines.append(f"{metric.name}{_format_labels(labels)} = {shown}")
+    return "\n".join(lines) if lines else "No metrics recorded yet."
+
+
+# ── Prometheus exposition ────────────────────────────────────────────
+
+def _prom_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    def _escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def _prom_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def format_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in collect():
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        if isinstance(metric, Histogram):
+            for labels, buckets, total, count in metric.series():
+                for bound, n in buckets:
+                    le = _prom_value(bound) if math.isinf(bound) else repr(float(bound))
+                    lines.append(f"{metric.name}_bucket{_prom_labels({**labels, 'le': le})} {n}")
+                lines.append(f"{metric.name}_sum{_prom_labels(labels)} {_prom_value(total)}")
+                lines.append(f"{metric.name}_count{_prom_labels(labels)} {count}")
+            continue
+        for labels, value in metric.samples():
+            lines.append(f"{metric.name}{_prom_labels(labels)} {_prom_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+async def _handle_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        request = await asyncio.wait_for(reader.readline(), timeout=10)
+        while (await asyncio.wait_for(reader.readline(), timeout=10)) not in (b"\r\n", b"\n", b""):
+            pass  # headers are not needed
+        parts = request.decode("latin-1").split()
+        path = parts[1].split("?")[0] if len(parts) > 1 else ""
+        if parts and parts[0] == "GET" and path in ("/metrics", "/"):
+            body, status = format_prometheus().encode(), "200 OK"
+            ctype = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body, status, ctype = b"Not found\n", "404 Not Found", "text/plain"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int) -> asyncio.AbstractServer:
+    """Serve GET /metrics on the running event loop."""
+    server = await asyncio.start_server(_handle_http, host, port)
+    logger.info("Metrics endpoint listening on http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,113 @@
+"""Outbound message dispatcher for Signal.
+
+Every send goes through a per-recipient queue drained by one task per
+recipient, so messages to the same chat are delivered strictly in order
+while different chats send in parallel over the shared connection pool.
+
+When several messages are waiting for the same recipient (skills-used,
+reply and debug block at the end of an agent turn, say), they are packed
+into as few API calls as possible: each message is split at CHUNK_SIZE,
+then adjacent pieces are merged while they fit in one Signal message.
+
+send() returns a future that resolves to True once every piece of that
+message was delivered. Callers that want adjacent messages merged queue
+them without awaiting and await only the last one.
+"""
+
+import asyncio
+import logging
+import time
+
+import tracing
+from metrics import counter, histogram
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000  # max chars per Signal message
+
+_messages = counter("bot_signal_messages_total", "Messages queued for sending")
+_calls = counter("bot_signal_send_calls_total", "Send API calls made (one per delivered piece)")
+_merged = counter("bot_signal_messages_merged_total", "Messages that shared an API call with an earlier one")
+_latency = histogram("bot_signal_send_latency_seconds", "Seconds from queueing a message to its delivery")
+
+
+def _pack(messages: list[str]) -> list[tuple[str, list[int]]]:
+    """Split messages into sendable pieces and merge adjacent small ones.
+
+    Returns (text, indices of the messages it carries) per API call.
+    """
+    pieces: list[tuple[str, list[int]]] = []
+    for i, message in enumerate(messages):
+        for start in range(0, len(message), CHUNK_SIZE):
+            chunk = message[start : start + CHUNK_SIZE]
+            if pieces and len(pieces[-1][0]) + 2 + len(chunk) <= CHUNK_SIZE:
+                text, owners = pieces[-1]
+                pieces[-1] = (f"{text}\n\n{chunk}", owners + [i])
+            else:
+                pieces.append((chunk, [i]))
+    return pieces
+
+
+class Outbox:
+    """Per-recipient ordered send queues with message packing."""
+
+    def __init__(self, deliver):
+        self._deliver = deliver  # async def deliver(recipient, text) -> bool (one API call)
+        # Per recipient: (message, future, queued at, span of the request that sent it)
+        self._queues: dict[str, list[tuple[str, asyncio.Future, float, tracing.Span | None]]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+
+    def send(self, recipient: str, message: str) -> asyncio.Future:
+        """Queue a message; the returned future resolves to True when delivered."""
+        future = asyncio.get_running_loop().create_future()
+        if not message:
+            future.set_result(True)
+            return future
+        self._queues.setdefault(recipient, []).append((message, future, time.monotonic(), tracing.current()))
+        _messages.inc()
+        if recipient not in self._tasks:
+            self._tasks[recipient] = asyncio.create_task(self._drain(recipient))
+        return future
+
+    def pending(self) -> int:
+        """Number of messages waiting to be sent."""
+        return sum(len(q) for q in self._queues.values())
+
+    async def flush(self):
+        """Wait until every queued message has been sent or given up on."""
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _drain(self, recipient: str):
+        try:
+            while self._queues.get(recipient):
+                batch = self._queues.pop(recipient)
+                await self._send_batch(recipient, batch)
+        finally:
+            self._tasks.pop(recipient, None)
+
+    async def _send_batch(self, recipient: str, batch: list[tuple[str, asyncio.Future, float, tracing.Span | None]]):
+        ok = [True] * len(batch)
+        try:
+            pieces = _pack([message for message, *_ in batch])
+            _merged.inc(len(batch) - len({owners[0] for _, owners in pieces}))
+            for text, owners in pieces:
+                if not any(ok[i] for i in owners):
+                    continue  # an earlier piece of this message already failed
+                _calls.inc()
+                # The send shows up in the trace of the request its first message came from
+                with tracing.span("signal.send", parent=batch[owners[0]][3], chars=len(text),
+                                  messages=len(set(owners))):
+                    delivered = await self._deliver(recipient, text)
+                if not delivered:
+                    for i in owners:
+                        ok[i] = False
+        except Exception:
+            logger.exception("Unexpected error sending to %s", recipient)
+            ok = [False] * len(batch)
+        finally:
+            now = time.monotonic()
+            for (_, future, queued_at, _), delivered in zip(batch, ok):
+                _latency.observe(now - queued_at)
+                if not future.done():
+                    future.set_result(delivered)
@@ -0,0 +1,154 @@
+"""Per-sender and per-group rate limiting with token buckets.
+
+Each sender (and each group, with a larger allowance) has two buckets:
+one counting requests and one counting estimated LLM tokens. A request
+has to fit in every bucket it touches before it is queued:
+
+  fits now                 → allow
+  fits within max_defer s  → defer: queued now, runs once the buckets refill
+  otherwise                → reject, with the time until it would fit
+
+Deferred requests borrow from the future (the buckets go negative), so a
+sender who keeps pushing is pushed further back instead of jumping ahead.
+Token costs are estimates made before the LLM runs — see estimate_tokens().
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+
+from metrics import counter
+
+logger = logging.getLogger(__name__)
+
+ALLOW, DEFER, REJECT = "allow", "defer", "reject"
+
+# Rough prompt + completion cost of one request, by priority class,
+# on top of the user's own text (system prompt, tool schemas, answer)
+BASE_TOKEN_COST = {"interactive": 1500, "long_running": 6000, "background": 1500}
+PRUNE_ABOVE = 1000  # buckets kept before idle, full ones are dropped
+
+_limited = counter("bot_rate_limited_total", "Requests deferred or rejected by per-sender rate limits")
+
+
+def estimate_tokens(text: str, priority: str = "interactive") -> int:
+    """Estimate the LLM tokens a request will use (~4 chars per token)."""
+    return BASE_TOKEN_COST.get(priority, BASE_TOKEN_COST["interactive"]) + len(text) // 4
+
+
+class TokenBucket:
+    """Classic token bucket; the level may go negative to record debt."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate  # tokens per second
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (call refill() first)."""
+        if self.level >= amount:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+
+@dataclass
+class Decision:
+    """Outcome of RateLimiter.acquire()."""
+    action: str          # ALLOW, DEFER or REJECT
+    delay: float = 0.0   # seconds to wait (DEFER) or until it would fit (REJECT)
+    limit: str = ""      # which bucket decided: "requests" or "tokens"
+
+
+class RateLimiter:
+    """Token-bucket limits on requests and estimated LLM tokens per key."""
+
+    def __init__(self, requests_per_minute: float, request_burst: float,
+                 tokens_per_minute: float, token_burst: float,
+                 group_multiplier: float = 3.0, max_defer: float = 60.0):
+        self.requests_per_minute = requests_per_minute
+        self.request_burst = request_burst
+        self.tokens_per_minute = tokens_per_minute
+        self.token_burst = token_burst
+        self.group_multiplier = group_multiplier
+        self.max_defer = max_defer
+        self._buckets: dict[tuple[str, str], TokenBucket] = {}
+
+    def _bucket(self, key: str, limit: str, scale: float) -> TokenBucket:
+        bucket = self._buckets.get((key, limit))
+        if bucket is None:
+            if limit == "requests":
+                bucket = TokenBucket(self.request_burst * scale, self.requests_per_minute * scale / 60)
+            else:
+                bucket = TokenBucket(self.token_burst * scale, self.tokens_per_minute * scale / 60)
+            self._buckets[(key, limit)] = bucket
+        return bucket
+
+    def _scopes(self, sender: str, group: str | None) -> list[tuple[str, float]]:
+        scopes = [(sender, 1.0)]
+        if group:
+            scopes.append((f"group:{group}", self.group_multiplier))
+        return scopes
+
+    def acquire(self, sender: str, group: str | None, tokens: int) -> Decision:
+        """Charge one request of `tokens` estimated tokens to the sender (and group)."""
+        now = time.monotonic()
+        charges = []
+        worst = Decision(ALLOW)
+        for key, scale in self._scopes(sender, group):
+            for limit, amount in (("requests", 1), ("tokens", tokens)):
+                bucket = self._bucket(key, limit, scale)
+                bucket.refill(now)
+                wait = bucket.wait_time(amount)
+                if wait > worst.delay:
+                    worst = Decision(DEFER, wait, limit)
+                charges.append((bucket, amount))
+
+        if worst.delay > self.max_defer:
+            worst.action = REJECT
+        else:
+            for bucket, amount in charges:
+                bucket.take(amount)
+
+        if worst.action != ALLOW:
+            _limited.inc(action=worst.action, limit=worst.limit)
+            logger.info("Rate limit (%s) for %s%s: %s, %.0fs", worst.limit, sender,
+                        f" in group {group}" if group else "", worst.action, worst.delay)
+        self._prune(now)
+        return worst
+
+    def status(self, sender: str, group: str | None = None) -> dict[str, dict[str, tuple[float, float]]]:
+        """Return {scope: {limit: (available, capacity)}} for a sender and, in a group, the group.
+
+        Read-only: a scope with no bucket yet reports its full allowance.
+        """
+        now = time.monotonic()
+        out = {}
+        for key, scale in self._scopes(sender, group):
+            levels = {}
+            for limit, burst in (("requests", self.request_burst), ("tokens", self.token_burst)):
+                bucket = self._buckets.get((key, limit))
+                if bucket is None:
+                    levels[limit] = (burst * scale, burst * scale)
+                else:
+                    level = min(bucket.capacity, bucket.level + (now - bucket.updated) * bucket.rate)
+                    levels[limit] = (level, bucket.capacity)
+            out["group" if key.startswith("group:") else "sender"] = levels
+        return out
+
+    def _prune(self, now: float):
+        if len(self._buckets) <= PRUNE_ABOVE:
+            return
+        for key, bucket in list(self._buckets.items()):
+            bucket.refill(now)
+            if bucket.level >= bucket.capacity:
+                del self._buckets[key]
@@ -15,6 +15,7 @@ class RuntimeState:
         self._markdown = False
         self._debug = False
         self._max_tokens: int | None = None  # None = use config default
+        self._stream: bool | None = None  # None = use config default
 
     @property
     def markdown(self) -> bool:
@@ -46,6 +47,19 @@ class RuntimeState:
         with self._lock:
             self._max_tokens = value
 
+    @property
+    def stream(self) -> bool:
+        with self._lock:
+            if self._stream is None:
+                import config
+                return config.stream.enabled
+            return self._stream
+
+    @stream.setter
+    def stream(self, value: bool):
+        with self._lock:
+            self._stream = value
+
 
 # Singleton
 state = RuntimeState()
@@ -1,8 +1,10 @@
 """Proactive scheduler — runs agent tasks on cron schedules.
 
 Reads YAML job files from the schedules/ directory and executes them
-when their cron expression matches. Runs as a daemon thread alongside
-the main polling loop.
+when their cron expression matches. Runs as an asyncio task alongside
+the main receive loop; each due job runs in its own task, but only does
+its work while holding a background-class slot from the bot's Admission
+controller, so cron bursts queue up behind interactive chats.
 
 Job file format (schedules/*.yaml):
   name: morning_weather
@@ -12,8 +14,8 @@ Job file format (schedules/*.yaml):
   enabled: true
 """
 
+import asyncio
 import logging
-import threading
 import time
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
@@ -22,6 +24,13 @@ from pathlib import Path
 import yaml
 from croniter import croniter
 
+import cancellation
+import config
+import tracing
+from admission import BACKGROUND, Admission, AdmissionFull
+from cancellation import DEADLINE, CancelToken, Cancelled, until_cancelled
+from metrics import counter, histogram
+
 logger = logging.getLogger(__name__)
 
 SCHEDULES_DIR = Path("schedules")
@@ -96,84 +105,116 @@ def _is_due(job: ScheduledJob, now: datetime) -> bool:
 MAX_JOB_RETRIES = 3
 JOB_RETRY_DELAY = 15  # seconds between retries
 
+_job_runs = counter("bot_scheduled_jobs_total", "Scheduled job runs by outcome (ok, error, timeout, skipped)")
+_job_seconds = histogram("bot_scheduled_job_seconds", "Seconds from a scheduled job firing to its reply, retries included")
+
 
-def _run_job(job: ScheduledJob, agent, signal_client):
+async def _run_job(job: ScheduledJob, signal_client, admission: Admission):
     """Execute a single scheduled job with retries.
 
     If the job has a 'command' field, it calls the registered skill directly.
     Otherwise, it sends the prompt through the LLM agent.
-    If the job specifies a 'model', a dedicated agent is created for it.
+    Each run gets a fresh agent so scheduled prompts never mix with chat
+    sessions. If the job specifies a 'model', a dedicated agent is created for it.
     Retries up to MAX_JOB_RETRIES times on failure (gives LLM server time to load).
+    Each attempt waits for a background slot; the slot is not held between retries.
+    An attempt that runs past the job's deadline is stopped and not retried.
     """
     logger.info("Running scheduled job: %s → %s", job.name, job.recipient)
+    with tracing.trace("scheduled.job", job=job.name, recipient=job.recipient):
+        started = time.monotonic()
+        outcome = "ok"
+
+        for attempt in range(1, MAX_JOB_RETRIES + 1):
+            token = CancelToken(_timeout(job), armed=False)
+            try:
+                with cancellation.scope(token):
+                    async with admission.slot(BACKGROUND):
+                        token.arm()
+                        reply = await until_cancelled(token, _execute(job))
+                # Success — break out of retry loop
+                break
+
+            except Cancelled:
+                token.cancel(DEADLINE)  # stops skill threads at their next checkpoint
+                logger.warning("Scheduled job '%s' timed out after %.0fs", job.name, token.elapsed())
+                reply = f"[Scheduled: {job.name}] Stopped: took longer than {token.deadline - token.started:.0f}s."
+                outcome = "timeout"
+                break
+
+            except AdmissionFull:
+                logger.warning("Scheduled job '%s' skipped: too many background jobs waiting", job.name)
+                _job_runs.inc(job=job.name, outcome="skipped")
+                return
 
+            except Exception as e:
+                logger.warning("Scheduled job '%s' attempt %d/%d failed: %s",
+                               job.name, attempt, MAX_JOB_RETRIES, e)
+                if attempt < MAX_JOB_RETRIES:
+                    await asyncio.sleep(JOB_RETRY_DELAY)
+                else:
+                    logger.exception("Scheduled job '%s' failed after %d attempts", job.name, MAX_JOB_RETRIES)
+                    reply = f"[Scheduled: {job.name}] Error after {MAX_JOB_RETRIES} attempts: {e}"
+                    outcome = "error"
+
+        _job_runs.inc(job=job.name, outcome=outcome)
+        _job_seconds.observe(time.monotonic() - started, job=job.name)
+        await signal_client.send(job.recipient, f"📅 {job.name}\n\n{reply}")
+        logger.info("Scheduled job '%s' sent to %s (%d chars)", job.name, job.recipient, len(reply))
+
+
+def _timeout(job: ScheduledJob) -> float:
+    """Deadline in seconds for one attempt: the command's own, or the config default."""
+    if job.command:
+        from agent import get_registry
+        cmd = job.command.lower() if job.command.startswith("/") else f"/{job.command.lower()}"
+        dc = get_registry().commands.get(cmd)
+        if dc is not None and dc.timeout is not None:
+            return float(dc.timeout)
+        return config.worker.command_timeout
+    return config.worker.agent_timeout
+
+
+async def _execute(job: ScheduledJob) -> str:
+    """Run one attempt of a job and return the reply text."""
     # Warm up: ensure the model is loaded before running the job
     from agent import ensure_model_loaded
-    ensure_model_loaded(job.model)
-
-    for attempt in range(1, MAX_JOB_RETRIES + 1):
-        try:
-            if job.command:
-                from agent import get_registry
-                registry = get_registry()
-                cmd = job.command.lower() if job.command.startswith("/") else f"/{job.command.lower()}"
-
-                if cmd not in registry.commands:
-                    reply = f"[Scheduled: {job.name}] Command '{cmd}' not found in registry."
-                    break
-                dc = registry.commands[cmd]
-                if dc.arg_name and job.command_args:
-                    result = dc.func(**{dc.arg_name: job.command_args})
-                elif dc.arg_name:
-                    result = dc.func(**{dc.arg_name: ""})
-                else:
-                    result = dc.func()
-                reply = str(result) if result else "(no output)"
-            else:
-                job_agent = agent
-                if job.model:
-                    from strands import Agent
-                    from strands.models.openai import OpenAIModel
-                    import config
-                    model = OpenAIModel(
-                        client_args={
-                            "base_url": config.llm.base_url,
-                            "api_key": config.llm.api_key,
-                        },
-                        model_id=job.model,
-                        params={
-                            "temperature": config.llm.temperature,
-                            "max_tokens": config.llm.max_tokens,
-                        },
-                    )
-                    job_agent = Agent(model=model, system_prompt="You are a helpful assistant. Use plain text for outputs (no markdown) and avoid using markdown-like symbols (asterisks for bold, hashes for sections etc.).")
-                    logger.info("Job '%s' using model override: %s", job.name, job.model)
-
-                result = job_agent(job.prompt)
-                reply = str(result)
-
-            # Success — break out of retry loop
-            break
-
-        except Exception as e:
-            logger.warning("Scheduled job '%s' attempt %d/%d failed: %s",
-                           job.name, attempt, MAX_JOB_RETRIES, e)
-            if attempt < MAX_JOB_RETRIES:
-                time.sleep(JOB_RETRY_DELAY)
-            else:
-                logger.exception("Scheduled job '%s' failed after %d attempts", job.name, MAX_JOB_RETRIES)
-                reply = f"[Scheduled: {job.name}] Error after {MAX_JOB_RETRIES} attempts: {e}"
-
-    signal_client.send(job.recipient, f"📅 {job.name}\n\n{reply}")
-    logger.info("Scheduled job '%s' sent to %s (%d chars)", job.name, job.recipient, len(reply))
-
-
-def start_scheduler(agent, signal_client):
-    """Start the scheduler as a daemon thread.
+    await asyncio.to_thread(ensure_model_loaded, job.model)
+
+    if job.command:
+        from agent import get_registry
+        registry = get_registry()
+        cmd = job.command.lower() if job.command.startswith("/") else f"/{job.command.lower()}"
+
+        if cmd not in registry.commands:
+            return f"[Scheduled: {job.name}] Command '{cmd}' not found in registry."
+        dc = registry.commands[cmd]
+        if dc.arg_name and job.command_args:
+            result = await asyncio.to_thread(dc.func, **{dc.arg_name: job.command_args})
+        elif dc.arg_name:
+            result = await asyncio.to_thread(dc.func, **{dc.arg_name: ""})
+        else:
+            result = await asyncio.to_thread(dc.func)
+        return str(result) if result else "(no output)"
+
+    if not job.model:
+        from agent import build_agent
+        job_agent = build_agent()
+    else:
+        from strands import Agent
+        job_agent = Agent(model=config.make_model(job.model), system_prompt="You are a helpful assistant. Use plain text for outputs (no markdown) and avoid using markdown-like symbols (asterisks for bold, hashes for sections etc.).")
+        logger.info("Job '%s' using model override: %s", job.name, job.model)
+
+    result = await job_agent.invoke_async(job.prompt)
+    return str(result)
+
+
+def start_scheduler(signal_client, admission: Admission) -> asyncio.Task | None:
+    """Start the scheduler as a background task on the running event loop.
 
     Args:
-        agent: The Strands Agent instance.
-        signal_client: The SignalClient for sending messages.
+        signal_client: The AsyncSignalClient for sending messages.
+        admission: The bot's Admission controller; jobs run as background work.
     """
     jobs = _load_jobs()
     if not jobs:
@@ -182,24 +223,22 @@ def start_scheduler(agent, signal_client):
 
     logger.info("Scheduler started with %d job(s)", len(jobs))
 
-    def _loop():
+    running: set[asyncio.Task] = set()
+
+    async def _loop():
         while True:
             try:
                 now = datetime.now()
                 for job in jobs:
                     if _is_due(job, now):
                         job.last_run = now
-                        # Run in a separate thread so scheduler doesn't block
-                        t = threading.Thread(
-                            target=_run_job,
-                            args=(job, agent, signal_client),
-                            daemon=True,
-                        )
-                        t.start()
+                        # Run in its own task so the scheduler doesn't block
+                        task = asyncio.create_task(_run_job(job, signal_client, admission), name=f"job-{job.name}")
+                        running.add(task)
+                        task.add_done_callback(running.discard)
             except Exception:
                 logger.exception("Scheduler tick error")
 
-            time.sleep(30)  # check every 30 seconds
+            await asyncio.sleep(30)  # check every 30 seconds
 
-    thread = threading.Thread(target=_loop, daemon=True, name="scheduler")
-    thread.start()
+    return asyncio.create_task(_loop(), name="scheduler")
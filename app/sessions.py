@@ -0,0 +1,133 @@
+"""Per-conversation agent sessions.
+
+Each conversation (a 1:1 sender or a group id) gets its own Strands Agent
+so message histories never mix. Agents are created lazily on first use
+and evicted when the process holds more than `max_sessions` of them
+(least recently used first) or when a session has been idle longer than
+`idle_ttl` seconds. An evicted conversation simply starts fresh.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+_live = gauge("bot_sessions_live", "Agent sessions currently held in memory")
+_history = gauge("bot_session_history_messages", "Messages in each session's history")
+_evictions = counter("bot_session_evictions_total", "Sessions evicted, by reason")
+
+
+@dataclass
+class Session:
+    """One conversation's agent plus bookkeeping."""
+    key: str
+    agent: object
+    created: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    turns: int = 0
+
+
+class SessionManager:
+    """LRU + idle-time bounded map of conversation key → Session."""
+
+    def __init__(self, factory, max_sessions: int = 50, idle_ttl: float = 3600):
+        self._factory = factory
+        self.max_sessions = max(1, max_sessions)
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        _live.set_function(lambda: len(self._sessions))
+
+    @contextmanager
+    def session(self, key: str):
+        """Yield the agent for a conversation, creating it if needed.
+
+        Usage:
+            with sessions.session(reply_to) as agent:
+                result = agent(text)
+        """
+        sess = self._acquire(key)
+        try:
+            yield sess.agent
+        finally:
+            sess.last_used = time.monotonic()
+            sess.turns += 1
+            _history.set(len(sess.agent.messages), session=key)
+
+    def _acquire(self, key: str) -> Session:
+        with self._lock:
+            self._evict_idle_locked()
+            sess = self._sessions.get(key)
+            if sess is not None:
+                self._sessions.move_to_end(key)
+                sess.last_used = time.monotonic()
+                return sess
+
+        # Build outside the lock — agent construction is not free
+        agent = self._factory()
+        with self._lock:
+            sess = self._sessions.get(key)
+            if sess is None:
+                sess = Session(key=key, agent=agent)
+                self._sessions[key] = sess
+                logger.info("Created session for %s (%d live)", key, len(self._sessions))
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                old_key, _ = self._sessions.popitem(last=False)
+                self._forget(old_key, "lru")
+            return sess
+
+    def _evict_idle_locked(self):
+        if not self.idle_ttl:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        # OrderedDict is in LRU order, so stop at the first fresh session
+        while self._sessions:
+            key, sess = next(iter(self._sessions.items()))
+            if sess.last_used >= cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self._forget(key, "idle")
+
+    def _forget(self, key: str, reason: str):
+        _history.remove(session=key)
+        _evictions.inc(reason=reason)
+        logger.info("Evicted session %s (%s)", key, reason)
+
+    def evict_idle(self):
+        """Drop sessions idle longer than idle_ttl."""
+        with self._lock:
+            self._evict_idle_locked()
+
+    def clear(self, key: str | None = None):
+        """Drop one session, or all of them (e.g. after a model switch)."""
+        with self._lock:
+            keys = [key] if key is not None else list(self._sessions)
+            for k in keys:
+                if self._sessions.pop(k, None) is not None:
+                    self._forget(k, "reset")
+
+    def agents(self) -> list:
+        """Return all live agents (e.g. to update their system prompt)."""
+        with self._lock:
+            return [s.agent for s in self._sessions.values()]
+
+    def stats(self) -> list[dict]:
+        """Return a snapshot of live sessions, most recently used first."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "key": s.key,
+                    "messages": len(s.agent.messages),
+                    "turns": s.turns,
+                    "idle": now - s.last_used,
+                }
+                for s in reversed(self._sessions.values())
+            ]
@@ -0,0 +1,84 @@
+"""Request shaping that lets local servers reuse their prompt (KV) cache.
+
+llama.cpp and LM Studio keep the tokens of the last prompt each server
+slot processed and only prefill what follows the longest common prefix
+with the next prompt. A chat turn re-sends the system prompt, the tool
+schemas and the whole history, so nearly all of it can be reused — if
+the bytes up to the new message are identical and the request lands on
+the slot that processed the conversation's previous turn.
+
+Two things are kept stable here:
+
+- shaped() sends tool schemas in name order, so the tool block in the
+  rendered prompt does not depend on skill load or registration order.
+  System prompts and skill prompts put their fixed instructions before
+  anything variable for the same reason.
+- With LLM_SLOTS (or LLM_BACKEND_SLOTS) set, requests from the chat
+  agent inside pinned(conversation) carry llama.cpp's id_slot and
+  cache_prompt, so each conversation keeps to one slot. Slots go to the
+  most recently active conversations; with more conversations than
+  slots, the least recently active one gives up its slot. Skill
+  sub-agents are not pinned, so they do not overwrite a conversation's
+  cached prefix.
+
+Pinning is for llama.cpp-compatible servers (llama-server --parallel N);
+leave it off for servers that reject unknown request fields.
+"""
+
+import contextvars
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+_conversation: contextvars.ContextVar[str | None] = contextvars.ContextVar("conversation", default=None)
+
+_lock = threading.Lock()
+_assigned: dict[str, "OrderedDict[str, int]"] = {}  # backend name → conversation → slot (LRU)
+
+
+@contextmanager
+def pinned(conversation: str | None):
+    """Pin the chat agent's requests in the block to `conversation`'s server slot (None: unpin)."""
+    reset = _conversation.set(conversation)
+    try:
+        yield
+    finally:
+        _conversation.reset(reset)
+
+
+def slot_for(backend: str, slots: int, conversation: str) -> int:
+    """The slot of `backend` that `conversation` keeps to."""
+    with _lock:
+        owners = _assigned.setdefault(backend, OrderedDict())
+        slot = owners.get(conversation)
+        if slot is None:
+            if len(owners) < slots:
+                slot = min(set(range(slots)) - set(owners.values()))
+            else:
+                _, slot = owners.popitem(last=False)
+            owners[conversation] = slot
+        owners.move_to_end(conversation)
+        return slot
+
+
+def slot_params(backend) -> dict:
+    """Extra request parameters pinning the current conversation to a slot of `backend`."""
+    conversation = _conversation.get()
+    if conversation is None or backend.slots <= 0:
+        return {}
+    slot = slot_for(backend.name, backend.slots, conversation)
+    return {"extra_body": {"id_slot": slot, "cache_prompt": True}}
+
+
+def shaped(model):
+    """Send a Strands model's tool schemas in a stable order."""
+    stream = model.stream
+
+    async def _stream(messages, tool_specs=None, system_prompt=None, **kwargs):
+        if tool_specs:
+            tool_specs = sorted(tool_specs, key=lambda spec: spec["name"])
+        async for event in stream(messages, tool_specs, system_prompt, **kwargs):
+            yield event
+
+    model.stream = _stream
+    return model
@@ -1,36 +1,101 @@
-"""Thin client for the signal-cli-rest-api with retry logic."""
+"""Thin client for the signal-cli-rest-api with retry logic.
 
+Incoming messages can be received two ways:
+  - poll:      GET /v1/receive/<number> every few seconds (MODE=native/normal)
+  - websocket: a long-lived ws://…/v1/receive/<number> stream that pushes
+               each envelope as it arrives (MODE=json-rpc)
+
+stream() hides the difference: it yields batches of envelopes, reconnects
+dropped sockets, and falls back to polling while the socket is unavailable.
+
+AsyncSignalClient is built on httpx.AsyncClient, so retries and slow
+sends never block the bot's asyncio runtime. It routes sends through an
+Outbox (see outbox.py), which keeps per-recipient order and packs
+adjacent messages into fewer API calls.
+"""
+
+import asyncio
+import json
 import time
 import httpx
 import logging
 
+import tracing
+from metrics import counter
+from outbox import Outbox
+
 logger = logging.getLogger(__name__)
 
 MAX_RETRIES = 3
 RETRY_DELAYS = [2, 5, 10]  # seconds between retries
 
+WS_RECONNECT_DELAYS = [1, 2, 5, 10, 30]  # backoff between socket reconnects
+WS_FAILURES_BEFORE_FALLBACK = 3  # consecutive connect failures → poll for a while
+WS_FALLBACK_PERIOD = 60  # seconds to poll before retrying the socket
+WS_PING_INTERVAL = 30  # seconds of silence before checking the socket is alive
+WS_STABLE_AFTER = 60  # seconds a connection must last before its drop stops counting as a failure
+
+_api_errors = counter("bot_signal_api_errors_total", "Failed Signal API calls, including ones retried")
+_api_retries = counter("bot_signal_api_retries_total", "Signal API calls retried after a failure")
+_api_failures = counter("bot_signal_api_failures_total", "Signal API operations given up on after all retries")
+_ws_drops = counter("bot_signal_ws_reconnects_total", "Signal WebSocket connections lost or refused")
+
+
+def _record_failure(operation: str, exc: Exception, retrying: bool):
+    op = operation.split(" (")[0]  # "send (chunk 1/2)" → "send"
+    if isinstance(exc, httpx.HTTPStatusError):
+        error = str(exc.response.status_code)
+    else:
+        error = type(exc).__name__
+    _api_errors.inc(operation=op, error=error)
+    current = tracing.current()
+    if current is not None:
+        current.set(retries=current.attrs.get("retries", 0) + 1, last_error=error)
+    if retrying:
+        _api_retries.inc(operation=op)
+    else:
+        _api_failures.inc(operation=op)
+
+
+def _ws_receive_url(base_url: str, number: str) -> str:
+    scheme, rest = base_url.split("://", 1)
+    ws_scheme = "wss" if scheme == "https" else "ws"
+    return f"{ws_scheme}://{rest}/v1/receive/{number}"
+
+
+class AsyncSignalClient:
+    """Async client for the signal-cli-rest-api."""
 
-class SignalClient:
     def __init__(self, base_url: str, number: str):
         self.base_url = base_url.rstrip("/")
         self.number = number
-        self._http = httpx.Client(base_url=self.base_url, timeout=60)
+        # Keep connections alive between the pieces of a reply and across chats
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url, timeout=60,
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60),
+        )
+        self._outbox = Outbox(self._deliver)
+
+    async def aclose(self):
+        await self._outbox.flush()
+        await self._http.aclose()
 
-    def _retry(self, operation: str, func, *args, **kwargs):
-        """Execute a function with retries on failure."""
+    async def _retry(self, operation: str, func, *args, **kwargs):
+        """Await a coroutine function with retries; backoff sleeps don't block the loop."""
         last_exc = None
         for attempt in range(MAX_RETRIES):
             try:
-                return func(*args, **kwargs)
+                return await func(*args, **kwargs)
             except (httpx.HTTPError, httpx.TimeoutException) as exc:
                 last_exc = exc
+                _record_failure(operation, exc, retrying=attempt < MAX_RETRIES - 1)
                 if attempt < MAX_RETRIES - 1:
                     delay = RETRY_DELAYS[attempt]
                     logger.warning(
                         "Signal %s failed (attempt %d/%d): %s — retrying in %ds",
                         operation, attempt + 1, MAX_RETRIES, exc, delay,
                     )
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
                 else:
                     logger.error(
                         "Signal %s failed after %d attempts: %s",
@@ -39,48 +104,128 @@ class SignalClient:
         return last_exc
 
     # ── Receive ──────────────────────────────────────────────
-    def receive(self) -> list[dict]:
+    async def receive(self) -> list[dict]:
         """Poll for new incoming messages with retry."""
-        def _do():
-            resp = self._http.get(f"/v1/receive/{self.number}")
+        async def _do():
+            resp = await self._http.get(f"/v1/receive/{self.number}")
             resp.raise_for_status()
             return resp.json()
 
-        result = self._retry("receive", _do)
+        result = await self._retry("receive", _do)
         if isinstance(result, Exception):
             return []
         return result
 
-    # ── Send ─────────────────────────────────────────────────
-    def send(self, recipient: str, message: str) -> bool:
-        """Send a text message to a single recipient with retry.
+    async def _ws_messages(self):
+        """Yield envelopes from one WebSocket connection until it drops."""
+        from websockets.asyncio.client import connect
+
+        url = _ws_receive_url(self.base_url, self.number)
+        async with connect(url, open_timeout=10, max_size=None,
+                           ping_interval=WS_PING_INTERVAL, ping_timeout=10) as ws:
+            logger.info("Connected to Signal WebSocket at %s", url)
+            yield None  # signal a successful connect to the caller
+            async for frame in ws:
+                try:
+                    yield json.loads(frame)
+                except ValueError:
+                    logger.warning("Ignoring non-JSON WebSocket frame: %.80s", frame)
+
+    async def stream(self, mode: str = "websocket", poll_interval: float = 2):
+        """Yield batches of incoming envelopes forever.
 
-        Long messages are chunked at 2000 chars. Each chunk is retried
-        independently on failure.
+        In "websocket" mode each envelope is yielded as soon as it arrives.
+        Dropped or closed connections are retried with backoff; a connection
+        only resets the backoff once it has stayed up for WS_STABLE_AFTER
+        seconds, so a server that accepts and then closes the socket right
+        away counts as failing. After repeated failures the client polls
+        /v1/receive for WS_FALLBACK_PERIOD seconds before trying the socket
+        again. In "poll" mode it simply polls.
         """
-        chunks = [message[i : i + 2000] for i in range(0, len(message), 2000)]
-        for i, chunk in enumerate(chunks):
-            def _do(text=chunk):
-                resp = self._http.post(
-                    "/v2/send",
-                    json={
-                        "message": text,
-                        "number": self.number,
-                        "recipients": [recipient],
-                    },
-                )
-                resp.raise_for_status()
-                return True
-
-            result = self._retry(f"send (chunk {i+1}/{len(chunks)})", _do)
+        failures = 0
+        while True:
+            if mode == "websocket" and failures < WS_FAILURES_BEFORE_FALLBACK:
+                connected = None
+                try:
+                    async for envelope in self._ws_messages():
+                        if envelope is None:
+                            connected = time.monotonic()
+                            continue
+                        yield [envelope]
+                    reason = "closed by server"
+                except Exception as exc:
+                    reason = f"error: {exc or type(exc).__name__}"
+                _ws_drops.inc()
+                if connected is not None and time.monotonic() - connected >= WS_STABLE_AFTER:
+                    failures = 0
+                delay = WS_RECONNECT_DELAYS[min(failures, len(WS_RECONNECT_DELAYS) - 1)]
+                failures += 1
+                logger.warning("Signal WebSocket %s (%d/%d) — reconnecting in %ds",
+                               reason, failures, WS_FAILURES_BEFORE_FALLBACK, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            if mode == "websocket":
+                logger.warning("Signal WebSocket unavailable — polling for %ds", WS_FALLBACK_PERIOD)
+                deadline = time.monotonic() + WS_FALLBACK_PERIOD
+                failures = 0
+            else:
+                deadline = None
+
+            while deadline is None or time.monotonic() < deadline:
+                yield await self.receive()
+                await asyncio.sleep(poll_interval)
+
+    # ── Attachments ──────────────────────────────────────────
+    async def download_attachment(self, attachment_id: str) -> bytes:
+        """Fetch a received attachment's raw bytes."""
+        async def _do():
+            resp = await self._http.get(f"/v1/attachments/{attachment_id}", timeout=30)
+            resp.raise_for_status()
+            return resp.content
+
+        with tracing.span("signal.download", attachment=attachment_id) as span:
+            result = await self._retry("attachment download", _do)
             if isinstance(result, Exception):
-                return False
-        return True
+                raise result
+            if span is not None:
+                span.set(bytes=len(result))
+        return result
+
+    # ── Send ─────────────────────────────────────────────────
+    def send(self, recipient: str, message: str) -> asyncio.Future:
+        """Queue a text message for a single recipient.
+
+        Returns a future resolving to True once delivered (False if a piece
+        failed after retries). Messages queued back to back without awaiting
+        are packed together; long messages are chunked at 2000 chars.
+        """
+        return self._outbox.send(recipient, message)
+
+    def pending_sends(self) -> int:
+        return self._outbox.pending()
+
+    async def _deliver(self, recipient: str, text: str) -> bool:
+        """Make one /v2/send call (at most CHUNK_SIZE chars) with retry."""
+        async def _do():
+            resp = await self._http.post(
+                "/v2/send",
+                json={
+                    "message": text,
+                    "number": self.number,
+                    "recipients": [recipient],
+                },
+            )
+            resp.raise_for_status()
+            return True
+
+        result = await self._retry("send", _do)
+        return not isinstance(result, Exception)
 
     # ── Health ───────────────────────────────────────────────
-    def is_healthy(self) -> bool:
+    async def is_healthy(self) -> bool:
         try:
-            resp = self._http.get("/v1/about")
+            resp = await self._http.get("/v1/about")
             return resp.status_code == 200
         except httpx.HTTPError:
             return False
@@ -9,6 +9,7 @@ hands it to the next node. This prevents context overflow at merge points
 import logging
 from strands import Agent
 import config
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +38,7 @@ class CondensingAgent:
         self.messages = agent.messages
         self.state = agent.state
 
+    @tracing.traced("condense")
     def _condense(self, text: str) -> str:
         """Use a lightweight LLM call to compress the output."""
         if len(text.split()) <= self.max_words:
@@ -33,6 +33,7 @@ from skills.web_search.search import web_search
 from skills.brainstorm._youtube_search import youtube_search
 from skills.brainstorm._condenser import CondensingAgent
 import config
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -78,6 +79,7 @@ def _find_prior_brainstorms(topic: str, max_results: int = 3) -> str:
     return "\n".join(sections) if len(sections) > 1 else ""
 
 
+@tracing.traced("rss_context")
 def _get_rss_context(topic: str) -> str:
     """Pull recent articles from FreshRSS feeds if configured and relevant."""
     try:
@@ -393,7 +395,8 @@ def brainstorm_topic(topic: str, context: str = "") -> str:
 
     try:
         graph = _build_brainstorm_graph(topic, context)
-        result = graph(f"Brainstorm deeply on this topic: {topic}")
+        with tracing.span("brainstorm.graph"):
+            result = graph(f"Brainstorm deeply on this topic: {topic}")
 
         project_dir = _save_results(topic, context, result)
         logger.info("Brainstorm saved to %s", project_dir)
@@ -16,7 +16,9 @@ from datetime import datetime, timezone
 
 from strands import Agent, tool
 from ddgs import DDGS
+import cancellation
 import config
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +64,7 @@ def _gather_rss(max_items: int = 10) -> list[dict]:
     ]
 
 
+@tracing.traced("gather_web")
 def _gather_web(focus: str) -> list[dict]:
     """Search for recent developments in tech/cloud/AI."""
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
@@ -69,6 +72,7 @@ def _gather_web(focus: str) -> list[dict]:
         f"{focus} {today}" if focus else f"software engineering AI cloud news {today}",
     ]
     items = []
+    cancellation.check()
     try:
         with DDGS() as ddgs:
             for q in queries:
@@ -84,10 +88,12 @@ def _gather_web(focus: str) -> list[dict]:
     return items
 
 
+@tracing.traced("gather_youtube")
 def _gather_youtube(focus: str) -> list[dict]:
     """Search YouTube for recent tech/AI videos."""
     query = focus if focus else "software engineering AI cloud computing"
     items = []
+    cancellation.check()
     try:
         with DDGS() as ddgs:
             for r in ddgs.videos(f"{query} site:youtube.com", max_results=5):
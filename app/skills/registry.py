@@ -8,12 +8,15 @@ Scans two locations:
 import importlib
 import importlib.util
 import logging
+import re
 import sys
 from dataclasses import dataclass, field
 from pathlib import Path
 
 import yaml
 
+import llm_cache
+
 logger = logging.getLogger(__name__)
 
 BUILTIN_SKILLS_DIR = Path(__file__).parent
@@ -35,6 +38,23 @@ class SkillManifest:
     command_arg: str | None = None
     # Usage hint shown when command is called without args
     command_usage: str | None = None
+    # Name of the tool the command runs (default: the first one listed)
+    command_tool: str | None = None
+    # Scheduling class for the direct command: "interactive" or "long_running"
+    priority: str = "interactive"
+    # Deadline in seconds for the direct command (default: COMMAND_TIMEOUT)
+    timeout: float | None = None
+    # Seconds LLM responses of this skill are cached (default: LLM_CACHE_TTL, 0 = never)
+    cache_ttl: float | None = None
+    # 'module:NAME' of a regex; a plain message that is little more than a match
+    # goes straight to the direct command (see fastpath.py)
+    fast_path: str | None = None
+    # The fast-path classifier may route plain messages to the command; only for
+    # commands whose argument is free text (it gets the whole message) or that take none
+    classify: bool = False
+    # The agent hands this skill's tool output to the user as the reply, without
+    # another model call to restate it
+    return_direct: bool = False
 
 
 @dataclass
@@ -45,6 +65,10 @@ class DirectCommand:
     func: callable
     arg_name: str | None  # parameter name for user input, None = no args
     usage: str | None
+    priority: str = "interactive"
+    timeout: float | None = None
+    pattern: re.Pattern | None = None  # fast-path regex from skill.yaml
+    classify: bool = False  # the fast-path classifier may route to it
 
 
 @dataclass
@@ -54,6 +78,8 @@ class SkillRegistry:
     skills: list[SkillManifest] = field(default_factory=list)
     tools: list = field(default_factory=list)
     commands: dict[str, DirectCommand] = field(default_factory=dict)  # "/cmd" → DirectCommand
+    direct_tools: set[str] = field(default_factory=set)  # tools of return_direct skills
+    tool_skills: dict[str, SkillManifest] = field(default_factory=dict)  # tool name → its skill
 
     def summary(self) -> str:
         """Return a human-readable summary for the system prompt."""
@@ -94,6 +120,13 @@ def _load_manifest(skill_dir: Path) -> SkillManifest | None:
             command=data.get("command"),
             command_arg=data.get("command_arg"),
             command_usage=data.get("command_usage"),
+            command_tool=data.get("command_tool"),
+            priority=data.get("priority", "interactive"),
+            timeout=data.get("timeout"),
+            cache_ttl=data.get("cache_ttl"),
+            fast_path=data.get("fast_path"),
+            classify=bool(data.get("classify", False)),
+            return_direct=bool(data.get("return_direct", False)),
         )
     except Exception as e:
         logger.error("Failed to load manifest %s: %s", manifest_path, e)
@@ -160,18 +193,39 @@ def _scan_directory(base: Path, registry: SkillRegistry, is_external: bool = Fal
 
         registry.skills.append(manifest)
         registry.tools.extend(loaded_tools)
+        if manifest.cache_ttl is not None:
+            llm_cache.set_ttl(manifest.name, float(manifest.cache_ttl))
+        names = [getattr(t, "tool_name", getattr(t, "__name__", "")) for t in loaded_tools]
+        registry.tool_skills.update(dict.fromkeys(names, manifest))
+        if manifest.return_direct:
+            registry.direct_tools.update(names)
 
         # Register direct command if declared
         if manifest.command and loaded_tools:
             cmd = manifest.command if manifest.command.startswith("/") else f"/{manifest.command}"
-            registry.commands[cmd.lower()] = DirectCommand(
-                command=cmd.lower(),
-                skill_name=manifest.name,
-                func=loaded_tools[0],  # command invokes the first tool
-                arg_name=manifest.command_arg,
-                usage=manifest.command_usage,
-            )
-            logger.info("  Registered command: %s → %s", cmd, manifest.name)
+            # The command invokes the tool named by command_tool, else the first one
+            func = dict(zip(names, loaded_tools)).get(manifest.command_tool or names[0])
+            pattern = None
+            if manifest.fast_path:
+                pattern = _resolve_tool(child, manifest.fast_path, is_external=is_external)
+                if isinstance(pattern, str):
+                    pattern = re.compile(pattern)
+            if func is None:
+                logger.error("Skill '%s': command_tool '%s' is not one of its tools; %s not registered",
+                             manifest.name, manifest.command_tool, cmd)
+            else:
+                registry.commands[cmd.lower()] = DirectCommand(
+                    command=cmd.lower(),
+                    skill_name=manifest.name,
+                    func=func,
+                    arg_name=manifest.command_arg,
+                    usage=manifest.command_usage,
+                    priority=manifest.priority,
+                    timeout=manifest.timeout,
+                    pattern=pattern,
+                    classify=manifest.classify,
+                )
+                logger.info("  Registered command: %s → %s", cmd, manifest.name)
 
         logger.info("Loaded %s skill '%s' with %d tool(s)", label, manifest.name, len(loaded_tools))
 
@@ -12,15 +12,19 @@ from datetime import datetime, timezone
 
 from strands import Agent, tool
 from strands.models.openai import OpenAIModel
+import cancellation
 import config
+import tracing
 from skills.web_search.search import web_search as _raw_web_search
 from ddgs import DDGS
 
 logger = logging.getLogger(__name__)
 
 
+@tracing.traced("search", arg="query")
 def _search(query: str, max_results: int = 5) -> list[dict]:
     """Run a DuckDuckGo search and return raw result dicts."""
+    cancellation.check()
     try:
         with DDGS() as ddgs:
             return list(ddgs.text(query, max_results=max_results))
@@ -29,8 +33,10 @@ def _search(query: str, max_results: int = 5) -> list[dict]:
         return []
 
 
+@tracing.traced("news_search", arg="query")
 def _news_search(query: str, max_results: int = 5) -> list[dict]:
     """Run a DuckDuckGo news search for recent articles."""
+    cancellation.check()
     try:
         with DDGS() as ddgs:
             return list(ddgs.news(query, max_results=max_results))
@@ -95,7 +101,7 @@ def research_topic(topic: str) -> str:
 
     sources = _gather_sources(topic)
 
-    model = config.make_model()
+    model = config.make_model(cache="research")
     analyst = Agent(
         name="research_analyst",
         model=model,
@@ -117,9 +123,10 @@ def research_topic(topic: str) -> str:
     )
 
     prompt = (
+        "Produce a concise, sourced report on the research request below "
+        "from the raw search results that follow it.\n\n"
         f"Research request: {topic}\n\n"
-        f"Here are the raw search results:\n\n{sources}\n\n"
-        f"Produce a concise, sourced report."
+        f"Raw search results:\n\n{sources}"
     )
 
     try:
@@ -5,7 +5,9 @@ Uses the Google Reader-compatible API exposed by FreshRSS.
 
 import logging
 import httpx
+import cancellation
 import config
+import tracing
 from strands import Agent, tool
 from skills.summarize.summarize import _fetch_url
 
@@ -40,11 +42,12 @@ def _get_auth_token() -> str | None:
         logger.error("FreshRSS not configured in .env")
         return None
 
+    timeout = cancellation.http_timeout(15)
     try:
         resp = httpx.post(
             f"{cfg.url}/api/greader.php/accounts/ClientLogin",
             data={"Email": cfg.user, "Passwd": cfg.api_password},
-            timeout=15,
+            timeout=timeout,
         )
         for line in resp.text.strip().split("\n"):
             if line.startswith("Auth="):
@@ -54,6 +57,7 @@ def _get_auth_token() -> str | None:
     return None
 
 
+@tracing.traced("freshrss_unread")
 def _get_unread_items(auth: str, feed_ids: list[str], count: int = MAX_ARTICLES_PER_RUN) -> list[dict]:
     """Fetch unread items from specific feeds."""
     cfg = config.freshrss
@@ -62,11 +66,12 @@ def _get_unread_items(auth: str, feed_ids: list[str], count: int = MAX_ARTICLES_
         f"?output=json&n={count}&xt=user/-/state/com.google/read"
     )
 
+    timeout = cancellation.http_timeout(30)
     try:
         resp = httpx.get(
             url,
             headers={"Authorization": f"GoogleLogin auth={auth}"},
-            timeout=30,
+            timeout=timeout,
         )
         resp.raise_for_status()
         data = resp.json()
@@ -122,6 +127,7 @@ def _mark_as_read(auth: str, item_ids: list[str]):
         logger.error("Failed to mark items as read: %s", e)
 
 
+@tracing.traced("summarize_article", arg="url")
 def _summarize_article(title: str, url: str) -> str:
     """Fetch and summarize a single article."""
     if not url:
@@ -131,7 +137,7 @@ def _summarize_article(title: str, url: str) -> str:
     if content.startswith("[Failed") or content.startswith("[Could not"):
         return f"{title}\n{url}\n(could not fetch content)"
 
-    model = config.make_model()
+    model = config.make_model(cache="rss_digest")
     summarizer = Agent(
         name="rss_summarizer",
         model=model,
@@ -143,7 +149,7 @@ def _summarize_article(title: str, url: str) -> str:
     )
 
     try:
-        result = summarizer(f"Summarize this article titled '{title}':\n\n{content[:8000]}")
+        result = summarizer(f"Summarize the article below.\n\nTitle: {title}\n\n{content[:8000]}")
         return str(result)
     except Exception as e:
         logger.error("Summary failed for %s: %s", title, e)
@@ -48,8 +48,9 @@ CONVENTIONS YOU MUST FOLLOW:
    - Return a string
 
 5. For config access, import: `import config`
-   - `config.make_model()` creates an OpenAI-compatible model instance
+   - `config.make_model()` returns the shared OpenAI-compatible model (safe to call per request)
    - `config.formatting_instruction()` returns the current markdown toggle text
+   - In sub-agent prompts, put the fixed instruction first and fetched or user content after it
    - `config.llm`, `config.signal`, `config.whisper` for settings
 
 6. For web search, import: `from skills.web_search.search import web_search`
@@ -7,7 +7,9 @@ import httpx
 from bs4 import BeautifulSoup
 from markdownify import markdownify
 from strands import Agent, tool
+import cancellation
 import config
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +27,12 @@ _HEADERS = {
 }
 
 
+@tracing.traced("fetch_url", arg="url")
 def _fetch_url(url: str) -> str:
     """Fetch a URL and extract readable text content."""
+    timeout = cancellation.http_timeout(20)
     try:
-        resp = httpx.get(url, headers=_HEADERS, timeout=20, follow_redirects=True)
+        resp = httpx.get(url, headers=_HEADERS, timeout=timeout, follow_redirects=True)
         resp.raise_for_status()
     except Exception as e:
         return f"[Failed to fetch URL: {e}]"
@@ -99,7 +103,7 @@ def summarize_content(content: str) -> str:
 
     logger.info("Summarizing %s (%d chars)", source_label, len(source_text))
 
-    model = config.make_model()
+    model = config.make_model(cache="summarize")
     summarizer = Agent(
         name="summarizer",
         model=model,
@@ -115,8 +119,10 @@ def summarize_content(content: str) -> str:
         ),
     )
 
+    # Fixed instruction first, so servers can reuse its cached prefix
     prompt = (
-        f"Summarize the following content from {source_label}:\n\n"
+        "Summarize the content below.\n\n"
+        f"Source: {source_label}\n\n"
         f"---\n{source_text}\n---"
     )
 
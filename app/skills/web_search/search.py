@@ -2,9 +2,12 @@
 
 from strands import tool
 from ddgs import DDGS
+import cancellation
+import tracing
 
 
 @tool
+@tracing.traced("web_search", arg="query")
 def web_search(query: str, max_results: int = 5) -> str:
     """Search the web for information using DuckDuckGo.
 
@@ -15,6 +18,7 @@ def web_search(query: str, max_results: int = 5) -> str:
         query: The search query string.
         max_results: Maximum number of results to return.
     """
+    cancellation.check()
     try:
         with DDGS() as ddgs:
             results = list(ddgs.text(query, max_results=max_results))
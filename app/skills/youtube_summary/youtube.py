@@ -6,7 +6,9 @@ import tempfile
 from pathlib import Path
 
 from strands import Agent, tool
+import cancellation
 import config
+import tracing
 
 logger = logging.getLogger(__name__)
 
@@ -23,10 +25,12 @@ def _extract_url(text: str) -> str | None:
     return m.group(0) if m else None
 
 
+@tracing.traced("youtube_captions", arg="url")
 def _get_transcript_captions(url: str) -> str | None:
     """Try to get subtitles/captions via yt-dlp (no audio download)."""
     import yt_dlp
 
+    cancellation.check()
     with tempfile.TemporaryDirectory() as tmp:
         out_path = str(Path(tmp) / "subs")
         opts = {
@@ -66,11 +70,13 @@ def _get_transcript_captions(url: str) -> str | None:
     return None
 
 
+@tracing.traced("youtube_transcribe", arg="url")
 def _transcribe_audio(url: str) -> str:
     """Download audio and transcribe with Whisper."""
     import yt_dlp
     from transcribe import transcribe_audio
 
+    cancellation.check()
     with tempfile.TemporaryDirectory() as tmp:
         out_path = str(Path(tmp) / "audio.%(ext)s")
         opts = {
@@ -115,9 +121,10 @@ def _chunk_text(text: str, size: int = CHUNK_SIZE) -> list[str]:
     return chunks
 
 
+@tracing.traced("summarize_text")
 def _summarize_text(text: str, context: str = "") -> str:
     """Summarize a piece of text using a sub-agent."""
-    model = config.make_model()
+    model = config.make_model(cache="youtube_summary")
     agent = Agent(
         name="yt-summarizer",
         model=model,
@@ -128,7 +135,10 @@ def _summarize_text(text: str, context: str = "") -> str:
             + config.formatting_instruction()
         ),
     )
-    prompt = f"{context}Summarize this transcript section:\n\n{text}"
+    prompt = "Summarize the transcript section below.\n\n"
+    if context:
+        prompt += f"{context.strip()}\n\n"
+    prompt += text
     return str(agent(prompt))
 
 
@@ -0,0 +1,96 @@
+"""Streaming delivery of agent replies.
+
+Instead of waiting for the whole answer, text deltas from the agent's
+stream are collected and sent as soon as a paragraph-sized chunk is
+complete. Sends are rate limited: chunks that become ready while the
+previous send is still inside `min_interval` are merged into the next
+message, so a fast model never turns into a burst of Signal API calls.
+
+  agent.stream_async ──feed()──► buffer ──paragraph──► ready ──pump──► send()
+"""
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ReplyStreamer:
+    """Turn a stream of text deltas into rate-limited paragraph messages."""
+
+    def __init__(self, send, min_chars: int = 300, min_interval: float = 2.0):
+        self._send = send  # async def send(message: str)
+        self.min_chars = min_chars
+        self.min_interval = min_interval
+        self.started = time.monotonic()
+        self.first_content: float | None = None  # seconds until the first chunk was sent
+        self.sends = 0
+        self.chars = 0
+        self._buffer = ""
+        self._ready: list[str] = []
+        self._wake = asyncio.Event()
+        self._done = False
+        self._task = asyncio.create_task(self._pump())
+
+    def feed(self, text: str):
+        """Add a text delta; queue everything up to the last complete paragraph."""
+        self._buffer += text
+        cut = self._boundary()
+        if cut:
+            self._queue(self._buffer[:cut])
+            self._buffer = self._buffer[cut:]
+
+    def end_message(self):
+        """Mark the end of one assistant message (e.g. text before a tool call)."""
+        if self._buffer.strip():
+            self._buffer = self._buffer.rstrip() + "\n\n"
+            self.feed("")
+
+    async def finish(self):
+        """Send whatever is left and wait for delivery to complete."""
+        self._queue(self._buffer)
+        self._buffer = ""
+        self._done = True
+        self._wake.set()
+        await self._task
+
+    def cancel(self):
+        """Stop sending; unsent text is discarded."""
+        self._task.cancel()
+
+    def _boundary(self) -> int:
+        idx = self._buffer.rfind("\n\n")
+        if idx < self.min_chars:
+            return 0
+        if self._buffer[:idx].count("```") % 2:
+            return 0  # don't split inside a code block
+        return idx + 2
+
+    def _queue(self, chunk: str):
+        chunk = chunk.strip()
+        if chunk:
+            self._ready.append(chunk)
+            self._wake.set()
+
+    async def _pump(self):
+        last_send = 0.0
+        while True:
+            await self._wake.wait()
+            wait = last_send + self.min_interval - time.monotonic()
+            if wait > 0 and not self._done:
+                await asyncio.sleep(wait)
+            self._wake.clear()
+
+            chunks, self._ready = self._ready, []
+            if chunks:
+                message = "\n\n".join(chunks)
+                await self._send(message)
+                last_send = time.monotonic()
+                if self.first_content is None:
+                    self.first_content = last_send - self.started
+                self.sends += 1
+                self.chars += len(message)
+
+            if self._done and not self._ready:
+                return
@@ -0,0 +1,214 @@
+"""Lightweight span tracing from Signal envelope to LLM call to reply.
+
+Every incoming envelope starts a trace. Spans nest through a context
+variable, so they follow the work into executor threads, skill helpers
+and sub-agents; the trace id is also stored with queued jobs so the
+worker that picks a job up continues the same trace.
+
+    with tracing.trace("signal.envelope", sender=sender):
+        ...
+        with tracing.span("fetch_url", url=url):
+            ...
+
+span() outside a trace does nothing, so instrumented helpers cost almost
+nothing when called from scripts or the receive loop. Finished spans are
+appended to a JSONL file (one span per line) and the most recent traces
+are kept in memory for the /trace command.
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import config
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACES = 200  # traces kept in memory for /trace
+MAX_SPANS_PER_TRACE = 500
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    name: str
+    start: float  # epoch seconds
+    attrs: dict = field(default_factory=dict)
+    duration: float | None = None
+    status: str = "ok"
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start": round(self.start, 6), "duration": round(self.duration or 0.0, 6),
+            "status": self.status, "attrs": self.attrs,
+        }
+
+
+_current: contextvars.ContextVar[Span | None] = contextvars.ContextVar("trace_span", default=None)
+
+_recent: "OrderedDict[str, list[dict]]" = OrderedDict()
+_lock = threading.Lock()
+_sink = None
+
+
+def _new_id(nbytes: int) -> str:
+    return secrets.token_hex(nbytes)
+
+
+def _open_sink():
+    global _sink
+    path = Path(config.tracing.path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists() and path.stat().st_size > config.tracing.max_bytes:
+        os.replace(path, path.with_suffix(path.suffix + ".1"))
+    _sink = open(path, "a", encoding="utf-8", buffering=1)
+
+
+def _export(span: Span):
+    record = span.to_dict()
+    line = json.dumps(record, default=str)
+    with _lock:
+        spans = _recent.get(span.trace_id)
+        if spans is None:
+            spans = _recent[span.trace_id] = []
+            while len(_recent) > MAX_TRACES:
+                _recent.popitem(last=False)
+        if len(spans) < MAX_SPANS_PER_TRACE:
+            spans.append(record)
+        try:
+            if _sink is None or _sink.tell() > config.tracing.max_bytes:
+                if _sink is not None:
+                    _sink.close()
+                _open_sink()
+            _sink.write(line + "\n")
+        except OSError as e:
+            logger.warning("Could not write trace span: %s", e)
+
+
+@contextmanager
+def _run(span: Span):
+    reset = _current.set(span)
+    try:
+        yield span
+    except (GeneratorExit, asyncio.CancelledError):
+        span.status = "cancelled"
+        raise
+    except BaseException as e:
+        span.status = "error"
+        span.attrs.setdefault("error", f"{type(e).__name__}: {e}"[:200])
+        raise
+    finally:
+        try:
+            _current.reset(reset)
+        except ValueError:
+            pass  # closed from another context (an abandoned async generator)
+        span.duration = time.perf_counter() - span._started
+        _export(span)
+
+
+@contextmanager
+def trace(name: str, parent: dict | None = None, **attrs):
+    """Start a span that is always recorded: a new trace, or a continuation of
+    the trace described by `parent` (see carrier())."""
+    if not config.tracing.enabled:
+        yield None
+        return
+    if parent and parent.get("trace_id"):
+        trace_id, parent_id = parent["trace_id"], parent.get("span_id")
+    else:
+        trace_id, parent_id = _new_id(16), None
+    with _run(Span(trace_id, _new_id(8), parent_id, name, time.time(), attrs)) as span:
+        yield span
+
+
+@contextmanager
+def span(name: str, parent: Span | None = None, **attrs):
+    """Record a child span of `parent` (default: the current span); no-op outside a trace."""
+    parent = parent or _current.get()
+    if parent is None:
+        yield None
+        return
+    with _run(Span(parent.trace_id, _new_id(8), parent.span_id, name, time.time(), attrs)) as child:
+        yield child
+
+
+def record(name: str, start: float, end: float, **attrs):
+    """Record an already finished child span of the current span (epoch times)."""
+    parent = _current.get()
+    if parent is None:
+        return
+    child = Span(parent.trace_id, _new_id(8), parent.span_id, name, start, attrs)
+    child.duration = max(0.0, end - start)
+    _export(child)
+
+
+def traced(name: str | None = None, arg: str | None = None):
+    """Decorator: run the function in a span, optionally recording one argument."""
+    def decorate(func):
+        span_name = name or func.__name__
+        param = None
+        if arg:
+            param = list(inspect.signature(func).parameters).index(arg)
+
+        def _attrs(args, kwargs):
+            if arg is None:
+                return {}
+            value = kwargs.get(arg, args[param] if param < len(args) else None)
+            return {arg: str(value)[:200]}
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **_attrs(args, kwargs)):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **_attrs(args, kwargs)):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def current() -> Span | None:
+    return _current.get()
+
+
+def set_attrs(**attrs):
+    """Add attributes to the current span, if any."""
+    current_span = _current.get()
+    if current_span is not None:
+        current_span.set(**attrs)
+
+
+def carrier() -> dict | None:
+    """The current trace position, for storing with queued work."""
+    current_span = _current.get()
+    if current_span is None:
+        return None
+    return {"trace_id": current_span.trace_id, "span_id": current_span.span_id}
+
+
+def get_trace(trace_id: str) -> list[dict]:
+    """Finished spans of a recent trace (empty if it has been evicted)."""
+    with _lock:
+        return list(_recent.get(trace_id, []))
@@ -1,13 +1,29 @@
-"""Voice message transcription using faster-whisper (local, no cloud)."""
+"""Voice message transcription using faster-whisper (local, no cloud).
 
+Whisper decoding is CPU-bound, so the bot never runs it in its own
+process: transcribe_async() submits audio to a pool of WHISPER_WORKERS
+worker processes, each of which loads its own WhisperModel once at
+startup. The event loop (and the GIL) stay free for other conversations
+while a long voice note decodes. Workers send their log records back over
+a queue, so only the bot process writes the log file.
+
+transcribe_audio() is the in-process, blocking variant used by skills.
+"""
+
+import asyncio
 import logging
+import logging.handlers
+import multiprocessing
 import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
-import httpx
 from faster_whisper import WhisperModel
 
 import config
+from metrics import counter, histogram
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +32,17 @@ _model: WhisperModel | None = None
 
 AUDIO_CONTENT_TYPES = {"audio/aac", "audio/mp4", "audio/mpeg", "audio/ogg", "audio/x-m4a"}
 
+# Created on first use; each worker process preloads the model
+_pool: ProcessPoolExecutor | None = None
+_log_listener: logging.handlers.QueueListener | None = None
+
+# Worker processes have their own (unread) registry, so timings are
+# measured there and recorded here in the bot process
+_rtf = histogram("bot_whisper_real_time_factor", "Whisper processing time divided by audio duration",
+                 buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 3, 5))
+_audio_seconds = counter("bot_whisper_audio_seconds_total", "Seconds of audio transcribed")
+_processing_seconds = counter("bot_whisper_processing_seconds_total", "Seconds spent transcribing")
+
 
 def _get_model() -> WhisperModel:
     global _model
@@ -28,27 +55,93 @@ def _get_model() -> WhisperModel:
     return _model
 
 
-def transcribe_audio(audio_path: str) -> str:
-    """Transcribe an audio file to text."""
+def _transcribe_timed(audio_path: str) -> tuple[str, float, float]:
+    """Transcribe an audio file; returns (text, audio seconds, processing seconds)."""
     model = _get_model()
+    started = time.monotonic()
     segments, info = model.transcribe(audio_path)
-    text = " ".join(s.text for s in segments).strip()
-    logger.info("Transcribed %s: lang=%s (%.0f%%), %d chars",
-                audio_path, info.language, info.language_probability * 100, len(text))
-    return text
+    text = " ".join(s.text for s in segments).strip()  # decoding happens while iterating
+    elapsed = time.monotonic() - started
+    logger.info("Transcribed %s: lang=%s (%.0f%%), %d chars, %.1fs audio in %.1fs",
+                audio_path, info.language, info.language_probability * 100, len(text),
+                info.duration, elapsed)
+    return text, info.duration, elapsed
+
+
+def _record(audio: float, elapsed: float):
+    _audio_seconds.inc(audio)
+    _processing_seconds.inc(elapsed)
+    if audio > 0:
+        _rtf.observe(elapsed / audio)
 
 
-def download_and_transcribe(signal_api_url: str, attachment_id: str) -> str:
-    """Download an attachment from signal-cli-rest-api and transcribe it."""
-    url = f"{signal_api_url.rstrip('/')}/v1/attachments/{attachment_id}"
+def transcribe_audio(audio_path: str) -> str:
+    """Transcribe an audio file to text."""
+    text, audio, elapsed = _transcribe_timed(audio_path)
+    _record(audio, elapsed)
+    return text
+
 
+def _transcribe_bytes(data: bytes) -> tuple[str, float, float]:
+    """Write audio bytes to a temp file and transcribe it (runs in a pool worker)."""
     with tempfile.NamedTemporaryFile(suffix=".m4a", delete=False) as tmp:
         tmp_path = tmp.name
         try:
-            resp = httpx.get(url, timeout=30)
-            resp.raise_for_status()
-            tmp.write(resp.content)
+            tmp.write(data)
             tmp.flush()
-            return transcribe_audio(tmp_path)
+            return _transcribe_timed(tmp_path)
         finally:
             Path(tmp_path).unlink(missing_ok=True)
+
+
+def _init_worker(log_queue):
+    """Process pool initializer: route logging to the bot, then load the model."""
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+    _get_model()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool, _log_listener
+    if _pool is None:
+        workers = max(1, config.whisper.workers)
+        logger.info("Starting %d Whisper worker process(es)", workers)
+        # spawn: never fork the bot's event loop, threads or CUDA state
+        context = multiprocessing.get_context("spawn")
+        log_queue = context.Queue()
+        _log_listener = logging.handlers.QueueListener(
+            log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+        _log_listener.start()
+        _pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(log_queue,),
+        )
+    return _pool
+
+
+def shutdown():
+    """Stop the worker processes (pending transcriptions are cancelled)."""
+    global _pool, _log_listener
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+async def transcribe_async(data: bytes) -> str:
+    """Transcribe audio bytes in the Whisper process pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    try:
+        text, audio, elapsed = await loop.run_in_executor(_get_pool(), _transcribe_bytes, data)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory) — start a fresh pool next time
+        logger.error("Whisper worker pool crashed; restarting it")
+        shutdown()
+        raise
+    _record(audio, elapsed)
+    return text
@@ -0,0 +1,267 @@
+"""Durable work queue backed by SQLite (WAL mode).
+
+Every acked request is written to data/queue.db before the user sees
+"⏳ Got it", so a restart or crash never silently drops work:
+
+  put()    → row in `jobs`, visible immediately
+  claim()  → oldest visible job for a conversation; hidden for
+             `visibility_timeout` seconds while a worker runs it
+  ack()    → done, row deleted
+  requeue()→ step done, row rewritten as the next kind of work
+  nack()   → attempt failed; retried after a short delay, or moved to
+             `dead_letters` once `max_attempts` is reached
+  recover()→ on startup, make jobs claimed by the previous process
+             visible again so they resume
+
+Delivery is at-least-once: a job that was running when the process died
+runs again after restart. Every claim counts as an attempt, so a job that
+keeps crashing the process (and never gets nacked) is dead-lettered by
+recover() or claim() once it has used up `max_attempts`.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 5  # seconds before a failed job becomes visible again
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    conversation TEXT    NOT NULL,
+    kind         TEXT    NOT NULL,
+    payload      TEXT    NOT NULL,
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    claimed      INTEGER NOT NULL DEFAULT 0,
+    visible_at   REAL    NOT NULL,
+    enqueued_at  REAL    NOT NULL,
+    last_error   TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_conversation ON jobs (conversation, id);
+
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id           INTEGER PRIMARY KEY,
+    conversation TEXT    NOT NULL,
+    kind         TEXT    NOT NULL,
+    payload      TEXT    NOT NULL,
+    attempts     INTEGER NOT NULL,
+    error        TEXT,
+    enqueued_at  REAL    NOT NULL,
+    failed_at    REAL    NOT NULL
+);
+"""
+
+
+@dataclass
+class Job:
+    """A claimed unit of work."""
+    id: int
+    conversation: str
+    kind: str
+    payload: dict
+    attempts: int
+    enqueued_at: float
+
+
+class WorkQueue:
+    """SQLite-backed, per-conversation FIFO with visibility timeouts and a dead-letter table."""
+
+    def __init__(self, path: str | Path, visibility_timeout: float = 1800, max_attempts: int = 3):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def put(self, conversation: str, kind: str, payload: dict, delay: float = 0) -> int:
+        """Append a job to a conversation's queue. Returns the job id.
+
+        A delay keeps the job (and everything behind it) hidden that long.
+        """
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO jobs (conversation, kind, payload, visible_at, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (conversation, kind, json.dumps(payload), now + delay, now),
+            )
+            return cur.lastrowid
+
+    def claim(self, conversation: str) -> Job | None:
+        """Claim the oldest job for a conversation, if it is visible.
+
+        Jobs are strictly ordered: if the head of the conversation's queue is
+        hidden (running or waiting to retry), nothing is returned.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._db.execute(
+                        "SELECT id, kind, payload, attempts, visible_at, enqueued_at FROM jobs "
+                        "WHERE conversation = ? ORDER BY id LIMIT 1",
+                        (conversation,),
+                    ).fetchone()
+                    if row is None or row[4] > now:
+                        self._db.execute("COMMIT")
+                        return None
+                    job_id, kind, payload, attempts, _, enqueued_at = row
+                    if attempts < self.max_attempts:
+                        break
+                    # Its last attempt timed out without an ack or nack
+                    self._dead_letter_locked(job_id, "attempt timed out", now)
+                self._db.execute(
+                    "UPDATE jobs SET claimed = 1, attempts = attempts + 1, visible_at = ? WHERE id = ?",
+                    (now + self.visibility_timeout, job_id),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return Job(job_id, conversation, kind, json.loads(payload), attempts + 1, enqueued_at)
+
+    def extend(self, job_id: int):
+        """Push a running job's visibility timeout forward (heartbeat)."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET visible_at = ? WHERE id = ? AND claimed = 1",
+                (time.time() + self.visibility_timeout, job_id),
+            )
+
+    def requeue(self, job_id: int, kind: str, payload: dict):
+        """Turn a claimed job into a different kind of work and release it.
+
+        The job keeps its place at the head of its conversation and is
+        claimable again straight away; the finished step does not count
+        as an attempt.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET kind = ?, payload = ?, claimed = 0, visible_at = ?, "
+                "attempts = MAX(0, attempts - 1) WHERE id = ?",
+                (kind, json.dumps(payload), time.time(), job_id),
+            )
+
+    def ack(self, job_id: int):
+        """Mark a job as done."""
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def nack(self, job_id: int, error: str = "") -> bool:
+        """Record a failed attempt.
+
+        Returns True if the job will be retried, False if it was moved to
+        the dead-letter table.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT conversation, kind, payload, attempts, enqueued_at FROM jobs WHERE id = ?",
+                    (job_id,),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return False
+                conversation, kind, payload, attempts, enqueued_at = row
+                if attempts >= self.max_attempts:
+                    self._dead_letter_locked(job_id, error, now)
+                    retry = False
+                else:
+                    self._db.execute(
+                        "UPDATE jobs SET claimed = 0, visible_at = ?, last_error = ? WHERE id = ?",
+                        (now + RETRY_DELAY, error, job_id),
+                    )
+                    retry = True
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return retry
+
+    def _dead_letter_locked(self, job_id: int, error: str, now: float):
+        """Move a job to the dead-letter table (inside the caller's transaction)."""
+        conversation, kind, attempts = self._db.execute(
+            "SELECT conversation, kind, attempts FROM jobs WHERE id = ?", (job_id,),
+        ).fetchone()
+        self._db.execute(
+            "INSERT OR REPLACE INTO dead_letters "
+            "(id, conversation, kind, payload, attempts, error, enqueued_at, failed_at) "
+            "SELECT id, conversation, kind, payload, attempts, ?, enqueued_at, ? FROM jobs WHERE id = ?",
+            (error, now, job_id),
+        )
+        self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        logger.error("Job %d (%s for %s) dead-lettered after %d attempts: %s",
+                     job_id, kind, conversation, attempts, error)
+
+    def recover(self) -> list[str]:
+        """Release jobs claimed by a previous process.
+
+        A job that was on its last attempt is dead-lettered instead: it may
+        well be what took the process down. Returns the conversations that
+        have pending work, oldest first, so the caller can schedule them.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                exhausted = [r[0] for r in self._db.execute(
+                    "SELECT id FROM jobs WHERE claimed = 1 AND attempts >= ?", (self.max_attempts,),
+                ).fetchall()]
+                for job_id in exhausted:
+                    self._dead_letter_locked(job_id, "interrupted on its last attempt", now)
+                released = self._db.execute(
+                    "UPDATE jobs SET claimed = 0, visible_at = ? WHERE claimed = 1", (now,),
+                ).rowcount
+                rows = self._db.execute(
+                    "SELECT conversation FROM jobs GROUP BY conversation ORDER BY MIN(id)"
+                ).fetchall()
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if released:
+            logger.warning("Recovered %d job(s) interrupted by the last shutdown", released)
+        return [r[0] for r in rows]
+
+    def pending(self, conversation: str | None = None) -> int:
+        """Number of jobs not yet acked, overall or for one conversation."""
+        with self._lock:
+            if conversation is None:
+                row = self._db.execute("SELECT COUNT(*) FROM jobs").fetchone()
+            else:
+                row = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE conversation = ?", (conversation,),
+                ).fetchone()
+        return row[0]
+
+    def next_visible_in(self, conversation: str) -> float | None:
+        """Seconds until the head of a conversation's queue becomes claimable (None if empty)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT visible_at FROM jobs WHERE conversation = ? ORDER BY id LIMIT 1",
+                (conversation,),
+            ).fetchone()
+        if row is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def dead_letter_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
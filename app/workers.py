@@ -0,0 +1,183 @@
+"""Per-conversation worker pool.
+
+Work items are sharded by conversation key (the reply_to address — a phone
+number for 1:1 chats, a group id for groups). Items for the same
+conversation are processed strictly in order, while different
+conversations run concurrently on up to `size` worker coroutines.
+
+  submit(key, ...) ──► WorkQueue (SQLite, per-key FIFO) ──► ready queue ──► worker N
+
+Pending items live in the durable WorkQueue, so they survive restarts;
+the pool only tracks which conversations have work and which are being
+processed. A conversation is only ever handed to one worker at a time, so
+a long-running /brainstorm in one chat never blocks replies in another.
+Workers are asyncio tasks; all bookkeeping happens on the event loop thread.
+
+Kinds of work that don't need a worker's full turn, like transcribing a
+voice note, can be offloaded: the worker that claims such a job hands it
+to a separate stage with its own concurrency limit and moves on. The job
+stays at the head of its conversation, so nothing behind it runs early.
+When the stage is done it requeue()s the job as the next kind of work
+(the transcript as an agent turn), which goes back through the workers.
+
+Each job runs in its own task, and the worker that claimed it waits for
+it. A job that is about to wait for something else that bounds it — an
+admission slot — calls detach() to give its worker back first. Otherwise
+four /brainstorm jobs, two running and two queued for a long_running
+slot, would hold every worker while a chat message that admission would
+let straight in waits for one.
+"""
+
+import asyncio
+import contextvars
+import logging
+from contextlib import nullcontext
+
+from work_queue import WorkQueue
+
+logger = logging.getLogger(__name__)
+
+# Set by the current job to give its worker back
+_detached: contextvars.ContextVar[asyncio.Event | None] = contextvars.ContextVar("worker_detached", default=None)
+
+
+def detach():
+    """Release the current job's worker; the job carries on without one (no-op outside a job)."""
+    event = _detached.get()
+    if event is not None:
+        event.set()
+
+
+class ShardFullError(Exception):
+    """Raised when a conversation already has the maximum number of pending items."""
+
+
+class WorkerPool:
+    """Fixed-size pool of worker coroutines that preserves per-key ordering."""
+
+    def __init__(self, handler, store: WorkQueue, size: int = 4, max_depth: int = 10,
+                 offload: dict[str, int] | None = None):
+        self._handler = handler  # async def handler(job: Job)
+        self._store = store
+        self.size = max(1, size)
+        self.max_depth = max(1, max_depth)
+        # job kind → how many of them run at once outside the workers
+        self._offload = {kind: asyncio.Semaphore(max(1, n)) for kind, n in (offload or {}).items()}
+        self._scheduled: set[str] = set()   # keys waiting in _ready, delayed, or being processed
+        self._running: set[str] = set()     # keys a worker or offload stage is processing right now
+        self._requeued: set[int] = set()    # jobs handed back to the queue instead of finished
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self._jobs: set[asyncio.Task] = set()
+
+    def start(self):
+        """Resume persisted work and spawn the worker tasks (call from the running loop)."""
+        resumed = self._store.recover()
+        for key in resumed:
+            self._schedule(key)
+        for i in range(self.size):
+            self._tasks.append(asyncio.create_task(self._run(), name=f"worker-{i}"))
+        logger.info("Worker pool started: %d worker(s), max %d pending per conversation, "
+                    "%d conversation(s) resumed", self.size, self.max_depth, len(resumed))
+
+    async def stop(self):
+        """Cancel the worker tasks; unfinished jobs stay in the queue for next start."""
+        tasks = self._tasks + list(self._jobs)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def submit(self, key: str, kind: str, payload: dict, delay: float = 0) -> int:
+        """Persist and queue a work item for a conversation.
+
+        Returns the item's position in that conversation (1 = runs next).
+        A delay defers the item (e.g. for rate limiting) without holding a worker.
+        Raises ShardFullError if the conversation's queue is full.
+        """
+        pending = self._store.pending(key)  # includes the item currently running
+        if pending >= self.max_depth:
+            raise ShardFullError(key)
+        self._store.put(key, kind, payload, delay=delay)
+        self._schedule(key)
+        return pending + 1
+
+    def requeue(self, job_id: int, kind: str, payload: dict):
+        """Finish a running job's step by queueing it as the next kind of work.
+
+        Call from the handler; the job is not acked when the handler returns.
+        """
+        self._store.requeue(job_id, kind, payload)
+        self._requeued.add(job_id)
+
+    def pending(self, key: str | None = None) -> int:
+        """Return the number of unfinished items, overall or for one key."""
+        return self._store.pending(key)
+
+    def active(self) -> int:
+        """Return the number of conversations currently being processed."""
+        return len(self._running)
+
+    def _schedule(self, key: str):
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+
+    async def _heartbeat(self, job_id: int):
+        """Keep a long-running job hidden from other consumers."""
+        interval = max(1.0, self._store.visibility_timeout / 3)
+        while True:
+            await asyncio.sleep(interval)
+            self._store.extend(job_id)
+
+    async def _run(self):
+        while True:
+            key = await self._ready.get()
+            job = self._store.claim(key)
+            if job is None:
+                delay = self._store.next_visible_in(key)
+                if delay is None:
+                    self._scheduled.discard(key)
+                else:
+                    # Head of the queue is waiting to be retried — check back later
+                    asyncio.get_running_loop().call_later(delay, self._ready.put_nowait, key)
+                continue
+
+            detached = asyncio.Event()
+            task = asyncio.create_task(self._execute(job, detached), name=f"{job.kind}-{job.id}")
+            self._jobs.add(task)
+            task.add_done_callback(self._jobs.discard)
+            if job.kind in self._offload:
+                continue
+            # Hold this worker until the job is done or detaches
+            released = asyncio.create_task(detached.wait())
+            try:
+                await asyncio.wait({task, released}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                released.cancel()
+
+    async def _execute(self, job, detached: asyncio.Event):
+        key = job.conversation
+        _detached.set(detached)
+        limit = self._offload.get(job.kind)
+        self._running.add(key)
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            async with limit or nullcontext():
+                await self._handler(job)
+        except Exception as e:
+            logger.exception("Worker error (conversation %s, job %d)", key, job.id)
+            self._store.nack(job.id, repr(e))
+        else:
+            if job.id not in self._requeued:
+                self._store.ack(job.id)
+        finally:
+            heartbeat.cancel()
+            self._requeued.discard(job.id)
+            self._running.discard(key)
+            if self._store.pending(key):
+                # More work for this conversation — go to the back of the
+                # line so other conversations get a fair turn.
+                self._ready.put_nowait(key)
+            else:
+                self._scheduled.discard(key)
@@ -0,0 +1,483 @@
+"""In-process stand-ins for signal-cli-rest-api and an OpenAI-compatible server.
+
+Both run on a background thread (stdlib http.server) and record what the
+bot does to them, so benchmarks can run the real bot end to end without
+Signal or LM Studio.
+
+    signal = FakeSignal()                     # GET /v1/receive, POST /v2/send, ...
+    llm = FakeLLM(latency=0.2, token_rate=40)  # POST /v1/chat/completions
+    signal.push("+15550001", "hello")
+
+FakeSignal serves both receive modes: polling (GET /v1/receive/<number>)
+and the json-rpc WebSocket (the same path with an Upgrade header). It
+also serves attachments registered with add_attachment() and a filler
+article under /pages/ for skills that fetch links.
+
+FakeLLM streams its replies at a configurable token rate, reports usage,
+and answers a share of requests with a tool call, so the agent loop makes
+a second LLM round trip. Like llama.cpp, each of its slots remembers the
+last prompt it processed and only prefills what follows the common
+prefix (at prefill_rate tokens/s); requests go to the slot named by
+id_slot, or else to the least recently used idle one. Any `bench-<n>` tags in the last user message
+are echoed at the end of the reply, which lets the load test match each
+reply to the message that caused it.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TAG = re.compile(r"bench-\d+")
+
+_PAGE = (
+    "<html><head><title>Article {name}</title></head><body><article><h1>Article {name}</h1>"
+    + "<p>" + "The quick brown fox jumps over the lazy dog. " * 40 + "</p>"
+    + "</article></body></html>"
+)
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+# ── WebSocket framing (just enough of RFC 6455) ──────────────────────
+
+def _ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    n = len(payload)
+    if n < 126:
+        header = bytes([0x80 | opcode, n])
+    elif n < 65536:
+        header = bytes([0x80 | opcode, 126]) + n.to_bytes(2, "big")
+    else:
+        header = bytes([0x80 | opcode, 127]) + n.to_bytes(8, "big")
+    return header + payload
+
+
+def _ws_read(rfile) -> tuple[int, bytes]:
+    head = rfile.read(2)
+    if len(head) < 2:
+        raise ConnectionError("WebSocket closed")
+    opcode, n = head[0] & 0x0F, head[1] & 0x7F
+    if n == 126:
+        n = int.from_bytes(rfile.read(2), "big")
+    elif n == 127:
+        n = int.from_bytes(rfile.read(8), "big")
+    mask = rfile.read(4) if head[1] & 0x80 else b""
+    data = rfile.read(n)
+    if mask:
+        data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+    return opcode, data
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _body(self) -> dict:
+        n = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(n) or b"{}")
+
+    def _json(self, obj, code: int = 200):
+        data = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _Server:
+    def __init__(self, handler, fake):
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = fake
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+# ── Signal ───────────────────────────────────────────────────────────
+
+class _SignalHandler(_Handler):
+    def do_GET(self):
+        fake: FakeSignal = self.server.fake
+        if self.path.startswith("/v1/about"):
+            return self._json({"versions": ["v1", "v2"], "mode": "json-rpc"})
+        if self.path.startswith("/v1/receive"):
+            if self.headers.get("Upgrade", "").lower() == "websocket":
+                return self._websocket(fake)
+            return self._json(fake._take())
+        if self.path.startswith("/pages/"):
+            data = _PAGE.format(name=self.path.rsplit("/", 1)[-1]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if self.path.startswith("/v1/attachments/"):
+            data = fake.attachments.get(self.path.rsplit("/", 1)[-1])
+            if data is None:
+                return self._json({"error": "not found"}, 404)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        fake: FakeSignal = self.server.fake
+        if self.path.startswith("/v2/send"):
+            body = self._body()
+            if fake.send_latency:
+                time.sleep(fake.send_latency)
+            fake._record_send(body)
+            return self._json({"timestamp": str(int(time.time() * 1000))}, 201)
+        self._json({"error": "not found"}, 404)
+
+    def _websocket(self, fake: "FakeSignal"):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        write_lock = threading.Lock()
+        closed = threading.Event()
+
+        def write(frame: bytes):
+            with write_lock:
+                self.wfile.write(frame)
+                self.wfile.flush()
+
+        def reader():
+            # Answer the client's keepalive pings until it goes away
+            try:
+                while True:
+                    opcode, data = _ws_read(self.rfile)
+                    if opcode == 0x9:
+                        write(_ws_frame(data, 0xA))
+                    elif opcode == 0x8:
+                        write(_ws_frame(data[:2], 0x8))
+                        break
+            except (ConnectionError, OSError, ValueError):
+                pass
+            closed.set()
+
+        threading.Thread(target=reader, daemon=True).start()
+        with fake._cond:
+            fake.ws_connections += 1
+            fake._cond.notify_all()
+        try:
+            while not closed.is_set():
+                with fake._cond:
+                    fake._cond.wait_for(lambda: fake._inbox or closed.is_set(), timeout=1)
+                    batch = fake._take_locked()
+                for envelope in batch:
+                    write(_ws_frame(json.dumps(envelope).encode()))
+        except OSError:
+            pass
+
+
+class FakeSignal:
+    """signal-cli-rest-api stand-in: queue envelopes with push(), read sends from .sent."""
+
+    def __init__(self, send_latency: float = 0.0):
+        self.send_latency = send_latency
+        self.sent: list[tuple[float, dict]] = []  # (monotonic time, /v2/send body)
+        self.attachments: dict[str, bytes] = {}
+        self.polls = 0
+        self.ws_connections = 0
+        self.on_send = None  # optional callback(time, body)
+        self._inbox: list[dict] = []
+        self._last_timestamp = 0
+        self._cond = threading.Condition()
+        self._server = _Server(_SignalHandler, self)
+        self.url = f"http://127.0.0.1:{self._server.port}"
+
+    @property
+    def connected(self) -> bool:
+        """Whether the bot has started receiving (polled or opened the WebSocket)."""
+        return self.polls > 0 or self.ws_connections > 0
+
+    def push(self, source: str, text: str = "", group_id: str | None = None,
+             attachments: list[dict] | None = None, timestamp: int | None = None) -> int:
+        """Queue an incoming message; returns its envelope timestamp."""
+        timestamp = timestamp or self.next_timestamp()
+        data = {"message": text or None, "timestamp": timestamp}
+        if group_id:
+            data["groupInfo"] = {"groupId": group_id, "type": "DELIVER"}
+        if attachments:
+            data["attachments"] = attachments
+        self.push_envelope({"envelope": {"source": source, "sourceNumber": source,
+                                         "timestamp": timestamp, "dataMessage": data}})
+        return timestamp
+
+    def next_timestamp(self) -> int:
+        """A millisecond timestamp like Signal's, unique so de-duplication keeps every message."""
+        with self._cond:
+            self._last_timestamp = max(self._last_timestamp + 1, int(time.time() * 1000))
+            return self._last_timestamp
+
+    def push_envelope(self, envelope: dict):
+        """Queue a raw envelope exactly as signal-cli-rest-api would return it."""
+        with self._cond:
+            self._inbox.append(envelope)
+            self._cond.notify_all()
+
+    def add_attachment(self, attachment_id: str, data: bytes, content_type: str) -> dict:
+        """Serve data at /v1/attachments/<id>; returns the envelope entry to push."""
+        self.attachments[attachment_id] = data
+        return {"id": attachment_id, "contentType": content_type, "size": len(data)}
+
+    def page_url(self, name: str) -> str:
+        """URL of a small article page served by the fake, for skills that fetch links."""
+        return f"{self.url}/pages/{name}"
+
+    def close(self):
+        self._server.close()
+
+    def _take(self) -> list[dict]:
+        with self._cond:
+            self.polls += 1
+            return self._take_locked()
+
+    def _take_locked(self) -> list[dict]:
+        batch, self._inbox = self._inbox, []
+        return batch
+
+    def _record_send(self, body: dict):
+        now = time.monotonic()
+        with self._cond:
+            self.sent.append((now, body))
+        if self.on_send:
+            self.on_send(now, body)
+
+
+# ── LLM ──────────────────────────────────────────────────────────────
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+class _LLMHandler(_Handler):
+    def setup(self):
+        super().setup()
+        fake: FakeLLM = self.server.fake
+        with fake._lock:
+            fake.connections += 1
+
+    def do_GET(self):
+        fake: FakeLLM = self.server.fake
+        if fake.failing:
+            return self._json({"error": {"message": "server unavailable"}}, 503)
+        if self.path.rstrip("/").endswith("/models"):
+            return self._json({"object": "list", "data": [{"id": fake.model, "object": "model"}]})
+        self._json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        fake: FakeLLM = self.server.fake
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._json({"error": "not found"}, 404)
+        body = self._body()
+        if fake.failing:
+            return self._json({"error": {"message": "server unavailable"}}, 503)
+        slot = fake._acquire(body.get("id_slot"))
+        fake._started(body)
+        try:
+            self._complete(fake, body, slot)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # the client aborted the stream
+        finally:
+            fake._finished()
+            fake._release(slot)
+
+    def _complete(self, fake: "FakeLLM", body: dict, slot: int):
+        messages = body.get("messages", [])
+        prompt_tokens, cached_tokens = fake._prefill(slot, body)
+        tool = fake._pick_tool(body)
+        words = [] if tool else fake._reply(messages).split(" ")
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": max(1, len(words)),
+                 "total_tokens": prompt_tokens + max(1, len(words)),
+                 "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+        time.sleep(fake.latency)
+        if not body.get("stream"):
+            message = {"role": "assistant", "content": " ".join(words) or None}
+            if tool:
+                message["tool_calls"] = [tool]
+            return self._json({
+                "id": "chatcmpl-fake", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model"), "usage": usage,
+                "choices": [{"index": 0, "message": message,
+                             "finish_reason": "tool_calls" if tool else "stop"}],
+            })
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model")}
+
+        def send(obj):
+            data = f"data: {obj if isinstance(obj, str) else json.dumps(obj)}\n\n".encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def delta(d: dict, finish=None):
+            send({**base, "choices": [{"index": 0, "delta": d, "finish_reason": finish}]})
+
+        if tool:
+            delta({"role": "assistant", "tool_calls": [{"index": 0, **tool}]})
+            delta({}, "tool_calls")
+        else:
+            for i, word in enumerate(words):
+                if fake.token_rate:
+                    time.sleep(1 / fake.token_rate)
+                delta({"role": "assistant", "content": word if i == 0 else " " + word})
+            delta({}, "stop")
+        send({**base, "choices": [], "usage": usage})
+        # The last event and the end of the chunked body go out in one write, as
+        # real servers do; clients that stop reading at [DONE] can reuse the connection
+        done = b"data: [DONE]\n\n"
+        self.wfile.write(f"{len(done):x}\r\n".encode() + done + b"\r\n0\r\n\r\n")
+        self.wfile.flush()
+
+
+class FakeLLM:
+    """OpenAI-compatible chat completions with controllable speed.
+
+    latency: seconds before the first token (prompt processing)
+    token_rate: streamed tokens per second (0 = as fast as possible)
+    reply_words: length of each answer
+    tool_ratio: share of user turns answered with a call to tool_name
+        (when the request offers that tool)
+    slots: requests served in parallel; the rest wait, like a local server
+    prefill_rate: prompt tokens processed per second; cached prefix tokens
+        are free (0 = prompts cost nothing but latency)
+
+    Set failing to answer every request with a 503, like a server that is
+    down or busy loading a model.
+    """
+
+    def __init__(self, latency: float = 0.05, token_rate: float = 0, reply_words: int = 30,
+                 tool_ratio: float = 0.0, tool_name: str = "list_notes", slots: int = 4,
+                 prefill_rate: float = 0, model: str = "bench-model"):
+        self.latency = latency
+        self.token_rate = token_rate
+        self.reply_words = reply_words
+        self.tool_ratio = tool_ratio
+        self.tool_name = tool_name
+        self.model = model
+        self.requests = 0
+        self.connections = 0  # TCP connections accepted
+        self.tool_calls = 0
+        self.active = 0
+        self.peak_active = 0
+        self.prefill_rate = prefill_rate
+        self.prefill_tokens = 0  # prompt tokens processed
+        self.cached_tokens = 0  # prompt tokens reused from a slot's cache
+        self.prefill_seconds = 0.0
+        self.failing = False
+        self._lock = threading.Lock()
+        self._slot_free = threading.Condition(self._lock)
+        self._slot_busy = [False] * max(1, slots)
+        self._slot_used = [0.0] * max(1, slots)
+        self._slot_prompts = [""] * max(1, slots)
+        self._server = _Server(_LLMHandler, self)
+        self.url = f"http://127.0.0.1:{self._server.port}/v1"
+
+    def close(self):
+        self._server.close()
+
+    def _started(self, body: dict):
+        with self._lock:
+            self.requests += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def _finished(self):
+        with self._lock:
+            self.active -= 1
+
+    def _acquire(self, wanted) -> int:
+        """Wait for slot `wanted` (id_slot), or for the least recently used idle slot."""
+        n = len(self._slot_busy)
+        with self._slot_free:
+            while True:
+                if isinstance(wanted, int) and 0 <= wanted < n:
+                    idle = [wanted] if not self._slot_busy[wanted] else []
+                else:
+                    idle = [i for i in range(n) if not self._slot_busy[i]]
+                if idle:
+                    slot = min(idle, key=lambda i: self._slot_used[i])
+                    self._slot_busy[slot] = True
+                    return slot
+                self._slot_free.wait()
+
+    def _release(self, slot: int):
+        with self._slot_free:
+            self._slot_busy[slot] = False
+            self._slot_used[slot] = time.monotonic()
+            self._slot_free.notify_all()
+
+    def _prefill(self, slot: int, body: dict) -> tuple[int, int]:
+        """Process the prompt on `slot`; returns (prompt tokens, tokens reused from its cache)."""
+        messages = body.get("messages", [])
+        # Rendered the way chat templates lay prompts out: system, tools, then the turns
+        prompt = (json.dumps(messages[:1]) + json.dumps(body.get("tools") or [])
+                  + "".join(json.dumps(m) for m in messages[1:]))
+        with self._lock:
+            previous = self._slot_prompts[slot]
+            self._slot_prompts[slot] = prompt
+        total = max(1, len(prompt) // 4)
+        cached = min(total, len(os.path.commonprefix([previous, prompt])) // 4)
+        seconds = (total - cached) / self.prefill_rate if self.prefill_rate else 0.0
+        with self._lock:
+            self.prefill_tokens += total - cached
+            self.cached_tokens += cached
+            self.prefill_seconds += seconds
+        time.sleep(seconds)
+        return total, cached
+
+    def _pick_tool(self, body: dict) -> dict | None:
+        messages = body.get("messages", [])
+        if not self.tool_ratio or not messages or messages[-1].get("role") != "user":
+            return None
+        names = {t.get("function", {}).get("name") for t in body.get("tools") or []}
+        if self.tool_name not in names:
+            return None
+        # Deterministic per message, so runs are comparable
+        if zlib.crc32(_text(messages[-1].get("content")).encode()) % 1000 >= self.tool_ratio * 1000:
+            return None
+        with self._lock:
+            self.tool_calls += 1
+            call_id = f"call_{self.tool_calls}"
+        return {"id": call_id, "type": "function", "function": {"name": self.tool_name, "arguments": "{}"}}
+
+    def _reply(self, messages: list[dict]) -> str:
+        last_user = next((_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"), "")
+        tags = TAG.findall(last_user)
+        filler = ["lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "adipiscing", "elit"]
+        words = [filler[i % len(filler)] for i in range(max(0, self.reply_words - len(tags)))]
+        return " ".join(words + [f"({' '.join(tags)})" if tags else "."])
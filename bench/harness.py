@@ -0,0 +1,209 @@
+"""Shared plumbing for the end-to-end benchmarks (load_test.py, replay.py).
+
+Starts the fakes, runs app/bot.py against them as a subprocess in a
+scratch directory (so its queue, traces and notes start empty), matches
+replies to the messages that caused them and prints the report.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from fakes import TAG, FakeLLM, FakeSignal
+
+APP = Path(__file__).resolve().parent.parent / "app"
+BOT_NUMBER = "+15550000000"
+
+
+def add_arguments(parser):
+    """Options for the fakes, the bot and how long to wait for replies."""
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--token-rate", type=float, default=50, help="tokens/s per stream (0 = instant)")
+    parser.add_argument("--reply-words", type=int, default=40)
+    parser.add_argument("--tool-ratio", type=float, default=0.3, help="share of turns that call a tool")
+    parser.add_argument("--llm-slots", type=int, default=4, help="requests the fake LLM serves at once")
+    parser.add_argument("--prefill-rate", type=float, default=0,
+                        help="uncached prompt tokens/s the fake LLM processes (0 = free)")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="seconds per /v2/send")
+    parser.add_argument("--receive-mode", choices=["poll", "websocket"], default="poll")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra bot setting (repeatable)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for all replies")
+    parser.add_argument("--idle", type=float, default=15,
+                        help="give up on missing replies after this many seconds without a send")
+    parser.add_argument("--settle", type=float, default=0.5)
+    parser.add_argument("--startup-timeout", type=float, default=60)
+    parser.add_argument("--json", help="also write the results to this file")
+    parser.add_argument("--keep-log", help="copy the bot's log here")
+
+
+def _pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def make_fakes(args) -> tuple[FakeSignal, FakeLLM]:
+    signal = FakeSignal(send_latency=args.send_latency)
+    llm = FakeLLM(latency=args.llm_latency, token_rate=args.token_rate, reply_words=args.reply_words,
+                  tool_ratio=args.tool_ratio, slots=args.llm_slots, prefill_rate=args.prefill_rate)
+    return signal, llm
+
+
+def _bot_env(args, signal: FakeSignal, llm: FakeLLM) -> dict:
+    env = {
+        **os.environ,
+        "PYTHONUNBUFFERED": "1",
+        "SIGNAL_API_URL": signal.url,
+        "SIGNAL_NUMBER": BOT_NUMBER,
+        "ALLOWED_NUMBERS": "",
+        "SIGNAL_RECEIVE_MODE": args.receive_mode,
+        "SIGNAL_POLL_INTERVAL": str(args.poll_interval),
+        "LLM_BASE_URL": llm.url,
+        "LLM_API_KEY": "bench",
+        "LLM_MODEL": llm.model,
+        "COALESCE_WINDOW": "0",
+        "RATE_LIMIT_ENABLED": "false",
+        "METRICS_PORT": "0",
+        "CAPTURE_PATH": "",
+        # A classifier learning mid-run would turn tagged chat into untagged commands
+        "FAST_PATH_LOG": "",
+    }
+    for item in args.env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+@contextmanager
+def running_bot(args, signal: FakeSignal, llm: FakeLLM):
+    """Run the bot until the block exits; yields its startup time in seconds."""
+    with tempfile.TemporaryDirectory(prefix="bot-bench-") as workdir:
+        log_path = Path(workdir) / "bot.log"
+        with open(log_path, "wb") as log:
+            bot = subprocess.Popen([sys.executable, str(APP / "bot.py")], cwd=workdir,
+                                   env=_bot_env(args, signal, llm), stdout=log, stderr=subprocess.STDOUT)
+            try:
+                started = time.monotonic()
+                while not signal.connected:
+                    if bot.poll() is not None or time.monotonic() - started > args.startup_timeout:
+                        raise SystemExit("bot did not start:\n" + log_path.read_text()[-3000:])
+                    time.sleep(0.05)
+                yield time.monotonic() - started
+            finally:
+                bot.terminate()
+                try:
+                    bot.wait(10)
+                except subprocess.TimeoutExpired:
+                    bot.kill()
+                signal.close()
+                llm.close()
+        if args.keep_log:
+            Path(args.keep_log).write_bytes(log_path.read_bytes())
+
+
+def sleep_until(deadline: float):
+    delay = deadline - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+
+class Tracker:
+    """Matches sends to injected messages by their bench-<n> tag."""
+
+    _expected = 0
+
+    def __init__(self, signal: FakeSignal):
+        self.signal = signal
+        self.injected: dict[str, float] = {}
+        self.answered: dict[str, float] = {}
+        self.started = time.monotonic()
+        self.last_injected = self.started
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        signal.on_send = self._on_send
+
+    def injecting(self, tag: str):
+        """Note that the message tagged `tag` is being sent now."""
+        with self._lock:
+            self.last_injected = self.injected[tag] = time.monotonic()
+
+    def _on_send(self, now: float, body: dict):
+        with self._lock:
+            for tag in TAG.findall(body.get("message") or ""):
+                if tag in self.injected and tag not in self.answered:
+                    self.answered[tag] = now
+            if self._expected and len(self.answered) >= self._expected:
+                self._done.set()
+
+    def wait(self, expected: int, args):
+        """Wait until `expected` messages are answered or the bot goes quiet."""
+        with self._lock:
+            self._expected = expected
+            if len(self.answered) >= expected:
+                self._done.set()
+        # Rejected or failed messages never get a tagged reply
+        while not self._done.wait(0.2):
+            quiet_since = max([self.last_injected] + [t for t, _ in self.signal.sent[-1:]])
+            now = time.monotonic()
+            if now - quiet_since > args.idle or now - self.started > args.timeout:
+                break
+        if args.settle:
+            time.sleep(args.settle)  # let trailing sends (errors, notices) arrive
+
+
+def report(tracker: Tracker, llm: FakeLLM, startup: float, expected: int, settings: dict) -> dict:
+    answered, injected = tracker.answered, tracker.injected
+    t0 = tracker.started
+    latencies = [answered[tag] - injected[tag] for tag in answered]
+    finished = max(answered.values(), default=tracker.last_injected)
+    sent = tracker.signal.sent
+    replies = sum(1 for _, body in sent if TAG.search(body.get("message") or ""))
+    return {
+        "messages": expected,
+        "answered": len(answered),
+        "missing": expected - len(answered),
+        "startup_seconds": round(startup, 2),
+        "inject_seconds": round(tracker.last_injected - t0, 3),
+        "duration_seconds": round(finished - t0, 3),
+        "messages_per_second": round(len(answered) / max(finished - t0, 1e-9), 2),
+        "latency_seconds": {
+            "p50": round(_pct(latencies, 0.50), 3) if latencies else None,
+            "p95": round(_pct(latencies, 0.95), 3) if latencies else None,
+            "p99": round(_pct(latencies, 0.99), 3) if latencies else None,
+            "max": round(max(latencies), 3) if latencies else None,
+        },
+        "sends": {"total": len(sent), "replies": replies, "other": len(sent) - replies},
+        "llm": {"requests": llm.requests, "connections": llm.connections, "tool_calls": llm.tool_calls,
+                "peak_parallel": llm.peak_active, "prefill_tokens": llm.prefill_tokens,
+                "cached_tokens": llm.cached_tokens, "prefill_seconds": round(llm.prefill_seconds, 3)},
+        "settings": {k: v for k, v in settings.items() if k not in ("json", "keep_log")},
+    }
+
+
+def print_report(result: dict, args):
+    lat = result["latency_seconds"]
+    sends = result["sends"]
+    llm = result["llm"]
+    print(f"{result['messages']} messages, {result['answered']} answered, {result['missing']} missing "
+          f"(bot started in {result['startup_seconds']}s)")
+    print(f"  throughput   {result['messages_per_second']:.2f} msg/s over {result['duration_seconds']:.2f}s "
+          f"(injected in {result['inject_seconds']:.2f}s)")
+    if lat["p50"] is not None:
+        print(f"  latency      p50 {lat['p50']:.3f}s   p95 {lat['p95']:.3f}s   "
+              f"p99 {lat['p99']:.3f}s   max {lat['max']:.3f}s")
+    print(f"  sends        {sends['total']} total: {sends['replies']} replies, {sends['other']} other "
+          f"(acks, notices, errors)")
+    print(f"  llm          {llm['requests']} requests over {llm['connections']} connections, "
+          f"{llm['tool_calls']} tool calls, {llm['peak_parallel']} at most in parallel")
+    prompt = llm["prefill_tokens"] + llm["cached_tokens"]
+    print(f"  prefill      {llm['prefill_tokens']} of {prompt} prompt tokens processed "
+          f"({llm['cached_tokens'] / max(prompt, 1):.0%} from cache), {llm['prefill_seconds']:.2f}s")
+    if args.json:
+        Path(args.json).write_text(json.dumps(result, indent=2) + "\n")
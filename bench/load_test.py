@@ -0,0 +1,77 @@
+"""Load-test the whole bot against fake Signal and LLM servers.
+
+Starts the fakes from bench/fakes.py in this process, runs app/bot.py as a
+subprocess pointed at them (see harness.py), injects synthetic chat
+traffic and times every message from injection to the reply that
+answers it.
+
+Usage (from the repo root):
+    python bench/load_test.py [--messages 200] [--senders 20] [--rate 0]
+        [--llm-latency 0.2] [--token-rate 50] [--tool-ratio 0.3]
+        [--env WORKER_POOL_SIZE=8] [--json results.json]
+
+--rate 0 injects everything at once; --env passes any bot setting through,
+so two runs that differ only in one setting can be compared directly.
+"""
+
+import argparse
+import base64
+import random
+
+import harness
+from harness import Tracker
+
+PROMPTS = [
+    "What is a good name for a cat?",
+    "Give me three ideas for dinner tonight.",
+    "Explain what a token bucket is in one paragraph.",
+    "Can you check my notes?",
+    "Write a haiku about queues.",
+    "What should I pack for a weekend hike?",
+]
+
+
+def _traffic(args) -> list[tuple[str, str | None, str]]:
+    """(sender, group id, text) for every message, in send order."""
+    rng = random.Random(args.seed)
+    senders = [f"+1555{i:07d}" for i in range(1, args.senders + 1)]
+    groups = [base64.b64encode(f"load-test group {i}".encode()).decode() for i in range(args.groups)]
+    messages = []
+    for i in range(args.messages):
+        sender = rng.choice(senders)
+        group = rng.choice(groups) if groups and rng.random() < args.group_share else None
+        text = f"{rng.choice(PROMPTS)} bench-{i}"
+        if group:
+            text = f"@bot {text}"
+        messages.append((sender, group, text))
+    return messages
+
+
+def run(args) -> dict:
+    signal, llm = harness.make_fakes(args)
+    traffic = _traffic(args)
+
+    with harness.running_bot(args, signal, llm) as startup:
+        tracker = Tracker(signal)
+        for i, (sender, group, text) in enumerate(traffic):
+            if args.rate:
+                harness.sleep_until(tracker.started + i / args.rate)
+            tracker.injecting(f"bench-{i}")
+            signal.push(sender, text, group_id=group)
+        tracker.wait(len(traffic), args)
+
+    return harness.report(tracker, llm, startup, len(traffic), vars(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--senders", type=int, default=20, help="distinct 1:1 senders")
+    parser.add_argument("--groups", type=int, default=0, help="group chats the senders also write in")
+    parser.add_argument("--group-share", type=float, default=0.3, help="share of messages sent to a group")
+    parser.add_argument("--rate", type=float, default=0, help="messages per second (0 = all at once)")
+    parser.add_argument("--seed", type=int, default=1)
+    harness.add_arguments(parser)
+    args = parser.parse_args()
+
+    harness.print_report(run(args), args)
@@ -0,0 +1,101 @@
+"""Measure prompt prefill saved by pinning conversations to server slots.
+
+Runs the bot twice against the fake LLM from bench/fakes.py, which keeps
+a prompt cache per slot the way llama.cpp does: once with LLM_SLOTS=0
+(the server picks a slot per request) and once with LLM_SLOTS set to the
+fake's slot count (each conversation keeps to its own slot, see
+app/shaping.py). Both runs replay the same interleaved multi-turn chats,
+one message per conversation per round in shuffled order, and report
+how many prompt tokens the server had to prefill and how long that took.
+
+Usage (from the repo root):
+    python bench/prefix_bench.py [--conversations 4] [--turns 8]
+        [--llm-slots 4] [--prefill-rate 1500] [--json results.json]
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+import harness
+from harness import Tracker
+
+PROMPTS = [
+    "Let's plan a weekend trip. Where could I go by train from here?",
+    "What should I pack for it?",
+    "Can you check my notes for anything I wrote about trains?",
+    "Summarize what we decided so far.",
+    "Give me three ideas for dinner on the first evening.",
+    "Which of those is quickest to cook?",
+    "Write a short packing checklist.",
+    "Anything I forgot?",
+]
+
+
+def _wait_round(tracker: Tracker, tags: list[str], args):
+    deadline = time.monotonic() + args.timeout
+    while time.monotonic() < deadline:
+        if all(tag in tracker.answered for tag in tags):
+            return
+        if time.monotonic() - max(tracker.injected[t] for t in tags) > args.idle:
+            return  # some message was turned away; move on
+        time.sleep(0.05)
+
+
+def _run(args, slots: int) -> dict:
+    run_args = argparse.Namespace(**vars(args))
+    # A context window large enough that history compaction stays out of the comparison
+    run_args.env = ["LLM_CONTEXT_LENGTH=131072", *args.env, f"LLM_SLOTS={slots}"]
+    signal, llm = harness.make_fakes(run_args)
+    senders = [f"+1555{i:07d}" for i in range(1, args.conversations + 1)]
+    total = args.conversations * args.turns
+
+    rng = random.Random(args.seed)
+
+    with harness.running_bot(run_args, signal, llm) as startup:
+        tracker = Tracker(signal)
+        for turn in range(args.turns):
+            tags = []
+            for c in rng.sample(range(len(senders)), len(senders)):
+                sender = senders[c]
+                tag = f"bench-{turn * len(senders) + c}"
+                tracker.injecting(tag)
+                signal.push(sender, f"{PROMPTS[turn % len(PROMPTS)]} {tag}")
+                tags.append(tag)
+            _wait_round(tracker, tags, args)
+        if args.settle:
+            time.sleep(args.settle)
+
+    return harness.report(tracker, llm, startup, total, {**vars(run_args), "slots": slots})
+
+
+def _line(label: str, result: dict) -> str:
+    llm, lat = result["llm"], result["latency_seconds"]
+    prompt = llm["prefill_tokens"] + llm["cached_tokens"]
+    return (f"  {label:<10} {llm['prefill_tokens']:>8} of {prompt:>8} prompt tokens prefilled "
+            f"({llm['cached_tokens'] / max(prompt, 1):>4.0%} cached), {llm['prefill_seconds']:>7.2f}s prefill, "
+            f"reply p50 {lat['p50'] or 0:.2f}s, {result['answered']}/{result['messages']} answered")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=4, help="chats running side by side")
+    parser.add_argument("--turns", type=int, default=8, help="messages per chat")
+    parser.add_argument("--seed", type=int, default=1)
+    harness.add_arguments(parser)
+    parser.set_defaults(prefill_rate=1500, tool_ratio=0.2, idle=30)
+    args = parser.parse_args()
+
+    unpinned = _run(args, 0)
+    pinned = _run(args, args.llm_slots)
+    saved = unpinned["llm"]["prefill_seconds"] - pinned["llm"]["prefill_seconds"]
+    print(f"{args.conversations} conversations × {args.turns} turns, {args.llm_slots} server slots, "
+          f"prefill at {args.prefill_rate:g} tokens/s")
+    print(_line("unpinned", unpinned))
+    print(_line("pinned", pinned))
+    share = saved / max(unpinned["llm"]["prefill_seconds"], 1e-9)
+    print(f"  saved      {saved:.2f}s of prefill ({share:.0%})")
+    if args.json:
+        Path(args.json).write_text(json.dumps({"unpinned": unpinned, "pinned": pinned}, indent=2) + "\n")
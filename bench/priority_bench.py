@@ -0,0 +1,72 @@
+"""Check that a chat message goes ahead of queued long-running work.
+
+Runs the bot's WorkerPool, WorkQueue and Admission with the default
+sizes (4 workers, 4 LLM slots, 2 of them for long_running work). Several
+/brainstorm-like jobs are queued in separate chats, then one chat
+message. Jobs follow the bot's path: detach() from the worker, then wait
+for an admission slot. The chat message should be answered after about
+one unit of work, not after the long-running jobs ahead of it in the
+queue. Exits non-zero if it is not. --no-detach keeps every job on its
+worker while it waits, for comparison.
+
+Usage (from the repo root):
+    PYTHONPATH=app python bench/priority_bench.py [--long-running 4] [--seconds 1]
+        [--workers 4] [--no-detach]
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from admission import Admission, INTERACTIVE, LONG_RUNNING
+from work_queue import WorkQueue
+from workers import WorkerPool, detach
+
+
+async def run(args) -> bool:
+    admission = Admission(4, {INTERACTIVE: 4, LONG_RUNNING: 2, "background": 1})
+    finished: dict[str, float] = {}
+    started = time.monotonic()
+
+    async def handler(job):
+        if not args.no_detach:
+            detach()
+        async with admission.slot(job.kind, job.conversation):
+            await asyncio.sleep(args.seconds if job.kind == LONG_RUNNING else args.seconds / 10)
+        finished[job.conversation] = time.monotonic() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = WorkQueue(Path(tmp) / "queue.db")
+        pool = WorkerPool(handler, store, size=args.workers)
+        pool.start()
+        for i in range(args.long_running):
+            pool.submit(f"brainstorm-{i}", LONG_RUNNING, {})
+        await asyncio.sleep(0.05)  # let the workers pick them up first
+        pool.submit("chat", INTERACTIVE, {})
+        while store.pending():
+            await asyncio.sleep(0.01)
+        await pool.stop()
+        store.close()
+
+    chat = finished["chat"]
+    long_running = sorted(v for k, v in finished.items() if k != "chat")
+    print(f"{args.long_running} long_running jobs of {args.seconds:g}s, then one chat message "
+          f"({args.workers} workers, {'no detach' if args.no_detach else 'detach before admission'})")
+    print(f"  chat answered after       {chat:.2f}s")
+    print(f"  long_running finished at  {', '.join(f'{v:.2f}s' for v in long_running)}")
+    ok = chat < args.seconds
+    print(f"  chat ahead of queued long_running work: {'yes' if ok else 'NO'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--long-running", type=int, default=4, help="long_running jobs queued before the chat")
+    parser.add_argument("--seconds", type=float, default=1, help="duration of one long_running job")
+    parser.add_argument("--workers", type=int, default=4, help="WORKER_POOL_SIZE")
+    parser.add_argument("--no-detach", action="store_true", help="wait for admission on the worker")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
@@ -0,0 +1,57 @@
+"""Benchmark the durable work queue's per-message overhead.
+
+Measures put → claim → ack round trips against a throwaway SQLite file,
+spread over a number of conversations like the bot's real traffic.
+
+Usage (from the repo root):
+    PYTHONPATH=app python bench/queue_bench.py [--messages 5000] [--conversations 50]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from work_queue import WorkQueue
+
+
+def _pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(messages: int, conversations: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        q = WorkQueue(Path(tmp) / "queue.db")
+        keys = [f"+1555000{i:04d}" for i in range(conversations)]
+        payload = {"text": "summarize https://example.com/some/article please"}
+
+        put_times, cycle_times = [], []
+        for i in range(messages):
+            key = keys[i % conversations]
+
+            t0 = time.perf_counter()
+            q.put(key, "agent", payload)
+            t1 = time.perf_counter()
+            job = q.claim(key)
+            q.ack(job.id)
+            t2 = time.perf_counter()
+
+            put_times.append((t1 - t0) * 1000)
+            cycle_times.append((t2 - t0) * 1000)
+
+        q.close()
+
+    print(f"{messages} messages over {conversations} conversations")
+    for label, values in (("enqueue", put_times), ("enqueue+claim+ack", cycle_times)):
+        print(f"  {label:<18} mean {statistics.mean(values):.3f} ms   "
+              f"p50 {_pct(values, 0.50):.3f} ms   p99 {_pct(values, 0.99):.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--conversations", type=int, default=50)
+    args = parser.parse_args()
+    run(args.messages, args.conversations)
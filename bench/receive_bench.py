@@ -0,0 +1,95 @@
+"""Measure how quickly an incoming Signal message reaches the bot.
+
+Runs the bot's AsyncSignalClient.stream() against the fake
+signal-cli-rest-api from bench/fakes.py and times each message from
+push() on the fake until stream() hands its envelope to the caller,
+which is the point where the bot's receive loop starts handling it.
+WebSocket mode is checked against the delivery target (100 ms by
+default); polling is measured alongside for comparison. Exits non-zero
+if the WebSocket latency misses the target.
+
+Usage (from the repo root):
+    PYTHONPATH=app python bench/receive_bench.py [--messages 50] [--target-ms 100]
+        [--poll-interval 2]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from fakes import FakeSignal
+from signal_client import AsyncSignalClient
+
+BOT_NUMBER = "+15550000000"
+
+
+def _pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def _measure(mode: str, messages: int, poll_interval: float, gap: float) -> list[float]:
+    """Push-to-handle latency in ms for each message."""
+    signal = FakeSignal()
+    client = AsyncSignalClient(signal.url, BOT_NUMBER)
+    pushed: dict[int, float] = {}
+    latencies: list[float] = []
+    stream = client.stream(mode, poll_interval)
+
+    async def _push():
+        while not signal.connected:
+            await asyncio.sleep(0.01)
+        for _ in range(messages):
+            # Random gaps, so polling is not measured in step with its interval
+            await asyncio.sleep(random.uniform(0, gap))
+            timestamp = signal.next_timestamp()
+            pushed[timestamp] = time.monotonic()
+            signal.push("+15550000001", "hello", timestamp=timestamp)
+
+    pusher = asyncio.create_task(_push())
+    try:
+        async for batch in stream:
+            now = time.monotonic()
+            for envelope in batch:
+                started = pushed.get(envelope.get("envelope", {}).get("timestamp"))
+                if started is not None:
+                    latencies.append((now - started) * 1000)
+            if len(latencies) >= messages:
+                break
+    finally:
+        pusher.cancel()
+        await stream.aclose()
+        await client.aclose()
+        signal.close()
+    return latencies
+
+
+def _line(label: str, values: list[float]) -> str:
+    return (f"  {label:<10} p50 {_pct(values, 0.50):>8.1f} ms   p95 {_pct(values, 0.95):>8.1f} ms   "
+            f"max {max(values):>8.1f} ms")
+
+
+async def run(args) -> bool:
+    ws = await _measure("websocket", args.messages, args.poll_interval, args.gap)
+    poll = await _measure("poll", args.poll_messages, args.poll_interval, args.gap)
+
+    print(f"Push-to-handle latency, {args.messages} messages (poll: {args.poll_messages}, "
+          f"every {args.poll_interval:g}s)")
+    print(_line("websocket", ws))
+    print(_line("poll", poll))
+    ok = _pct(ws, 0.95) <= args.target_ms
+    print(f"  target     websocket p95 ≤ {args.target_ms:g} ms: {'met' if ok else 'MISSED'}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=50, help="messages sent over the WebSocket")
+    parser.add_argument("--poll-messages", type=int, default=10, help="messages sent while polling")
+    parser.add_argument("--poll-interval", type=float, default=2, help="SIGNAL_POLL_INTERVAL to compare against")
+    parser.add_argument("--gap", type=float, default=0.2, help="maximum seconds between messages")
+    parser.add_argument("--target-ms", type=float, default=100)
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
@@ -0,0 +1,152 @@
+"""Replay captured Signal traffic against the bot and the fake LLM.
+
+Reads a capture written with CAPTURE_PATH (see app/capture.py) and feeds
+its envelopes to the bot through the fake Signal server with the
+recorded timing, scaled by --speed (1 = real time, 10 = ten times
+faster, 0 = as fast as possible). Long quiet stretches are shortened to
+--max-gap seconds first, so a day's capture replays in minutes.
+
+Chat messages the bot will answer get a bench-<n> tag appended so their
+replies can be timed; slash commands, voice notes and other attachments
+are replayed as they are but not timed. Links are pointed at a filler
+page on the fake server (YouTube links are left alone), and attachments
+are served as silence (audio) or zero bytes of the recorded size.
+
+Usage (from the repo root):
+    PYTHONPATH=app python bench/replay.py data/capture.jsonl [--speed 10]
+        [--max-gap 30] [--env WORKER_POOL_SIZE=8] [--json results.json]
+"""
+
+import argparse
+import copy
+import io
+import re
+import time
+import wave
+import zlib
+from collections import Counter
+
+import harness
+from capture import read
+from harness import Tracker
+
+_URL = re.compile(r"https?://\S+")
+_YOUTUBE = re.compile(r"https?://(?:www\.|m\.)?(?:youtube\.com|youtu\.be)/", re.IGNORECASE)
+MAX_ATTACHMENT_BYTES = 5_000_000
+
+
+def _silence(seconds: float = 1.0, rate: int = 16000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(b"\0\0" * int(rate * seconds))
+    return buf.getvalue()
+
+
+def _schedule(batches: list[tuple[float, list]], speed: float, max_gap: float) -> list[tuple[float, list]]:
+    """Offsets in seconds from the start of the replay for each batch."""
+    out, offset, previous = [], 0.0, None
+    for t, envelopes in batches:
+        if previous is not None:
+            offset += min(max(0.0, t - previous), max_gap)
+        previous = t
+        out.append((offset / speed if speed else 0.0, envelopes))
+    return out
+
+
+class Replayer:
+    """Rewrites captured envelopes for the fake server and classifies them."""
+
+    def __init__(self, signal, tracker: Tracker, group_prefix: str, local_urls: bool):
+        self.signal = signal
+        self.tracker = tracker
+        self.group_prefix = group_prefix.lower()
+        self.local_urls = local_urls
+        self.kinds = Counter()
+        self.tagged = 0
+        self._silence = _silence()
+
+    def push(self, wrapper: dict):
+        wrapper = copy.deepcopy(wrapper)
+        envelope = wrapper.setdefault("envelope", {})
+        envelope["timestamp"] = self.signal.next_timestamp()
+        data = envelope.get("dataMessage")
+        if not data:
+            self.kinds["other"] += 1
+            self.signal.push_envelope(wrapper)
+            return
+        data["timestamp"] = envelope["timestamp"]
+
+        for attachment in data.get("attachments") or []:
+            content_type = attachment.get("contentType") or ""
+            blob = (self._silence if content_type.startswith("audio/")
+                    else b"\0" * min(int(attachment.get("size") or 0), MAX_ATTACHMENT_BYTES))
+            self.signal.add_attachment(attachment["id"], blob, content_type)
+
+        text = data.get("message") or ""
+        if self.local_urls:
+            text = _URL.sub(lambda m: m.group(0) if _YOUTUBE.match(m.group(0))
+                            else self.signal.page_url(f"{zlib.crc32(m.group(0).encode()):08x}"), text)
+        group = bool(data.get("groupInfo"))
+        words = text.split()[1:] if group else text.split()
+        if group and not text.lower().startswith(self.group_prefix):
+            self.kinds["group chatter"] += 1
+        elif data.get("attachments"):
+            self.kinds["attachment"] += 1
+        elif words and words[0].startswith("/"):
+            self.kinds["command"] += 1
+        elif text:
+            tag = f"bench-{self.tagged}"
+            self.tagged += 1
+            text = f"{text} {tag}"
+            self.kinds["chat"] += 1
+            self.tracker.injecting(tag)
+        if text:
+            data["message"] = text
+        self.signal.push_envelope(wrapper)
+
+
+def run(args) -> dict:
+    batches = list(read(args.capture))
+    if args.limit:
+        batches = batches[:args.limit]
+    if not batches:
+        raise SystemExit(f"{args.capture} holds no traffic")
+    schedule = _schedule(batches, args.speed, args.max_gap)
+    signal, llm = harness.make_fakes(args)
+
+    with harness.running_bot(args, signal, llm) as startup:
+        tracker = Tracker(signal)
+        replayer = Replayer(signal, tracker, args.group_prefix, not args.keep_urls)
+        for offset, envelopes in schedule:
+            harness.sleep_until(tracker.started + offset)
+            for wrapper in envelopes:
+                replayer.push(wrapper)
+        tracker.last_injected = time.monotonic()
+        tracker.wait(replayer.tagged, args)
+
+    result = harness.report(tracker, llm, startup, replayer.tagged, vars(args))
+    result["replayed"] = {"batches": len(batches), "envelopes": sum(replayer.kinds.values()),
+                          "kinds": dict(replayer.kinds)}
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("capture", help="capture file (CAPTURE_PATH)")
+    parser.add_argument("--speed", type=float, default=1, help="1 = real time, 10 = 10x, 0 = max")
+    parser.add_argument("--max-gap", type=float, default=30, help="cap quiet stretches at this many seconds")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N batches")
+    parser.add_argument("--group-prefix", default="@bot", help="the bot's BOT_GROUP_PREFIX")
+    parser.add_argument("--keep-urls", action="store_true", help="leave links pointing at the real sites")
+    harness.add_arguments(parser)
+    args = parser.parse_args()
+
+    result = run(args)
+    replayed = result["replayed"]
+    kinds = ", ".join(f"{n} {kind}" for kind, n in sorted(replayed["kinds"].items()))
+    print(f"replayed {replayed['batches']} batches, {replayed['envelopes']} envelopes ({kinds}) "
+          f"at speed {args.speed or 'max'}")
+    harness.print_report(result, args)